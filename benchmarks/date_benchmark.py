@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark del parseo de fechas de los listados
+Desarrollado por Sergie Code
+
+Uso: python benchmarks/date_benchmark.py [--dates N] [--repeat N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scraper.dates import parse_date
+
+# Formatos que aparecen en las páginas de eventos
+SAMPLE_FORMATS = (
+    '{d}/{m:02d}/{y}',
+    '{y}-{m:02d}-{d:02d}',
+    '{y}-{m:02d}-{d:02d}T20:00:00+02:00',
+    '{d} de {month} de {y}',
+    'Sábado, {d} de {month} de {y}',
+    '{d} {abbr}. {y}',
+    'Sin fecha confirmada',
+)
+
+MONTH_NAMES = ('enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio',
+               'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre')
+
+def legacy_parse_date(date_string: str) -> str:
+    """Implementación anterior (strptime con reemplazo de meses), como referencia"""
+    if not date_string:
+        return ""
+    formats = ["%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%d de %B de %Y", "%d %B %Y"]
+    months_es = {
+        'enero': 'January', 'febrero': 'February', 'marzo': 'March',
+        'abril': 'April', 'mayo': 'May', 'junio': 'June',
+        'julio': 'July', 'agosto': 'August', 'septiembre': 'September',
+        'octubre': 'October', 'noviembre': 'November', 'diciembre': 'December'
+    }
+    date_clean = date_string.lower()
+    for es, en in months_es.items():
+        date_clean = date_clean.replace(es, en)
+    for fmt in formats:
+        for test_string in [date_string, date_clean]:
+            try:
+                return datetime.strptime(test_string, fmt).strftime("%Y-%m-%d")
+            except ValueError:
+                continue
+    return date_string
+
+def build_dates(count: int, distinct: int) -> list:
+    """Lista de fechas con ``distinct`` valores distintos, repetidos como en un listado"""
+    rng = random.Random(42)
+    pool = []
+    for _ in range(distinct):
+        month = rng.randint(1, 12)
+        pool.append(rng.choice(SAMPLE_FORMATS).format(
+            d=rng.randint(1, 28), m=month, y=rng.choice((2025, 2026)),
+            month=MONTH_NAMES[month - 1], abbr=MONTH_NAMES[month - 1][:3]
+        ))
+    return [rng.choice(pool) for _ in range(count)]
+
+def bench(parse, values: list, repeat: int) -> float:
+    """Tiempo medio (µs) por fecha"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for value in values:
+            parse(value)
+    return (time.perf_counter() - start) / (repeat * len(values)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dates', type=int, default=10000, help="Fechas por medición")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por medición")
+    args = parser.parse_args()
+
+    print(f"{'distintas':>10} {'anterior':>12} {'sin caché':>12} {'con caché':>12}")
+    for distinct in (50, 1000, args.dates):
+        values = build_dates(args.dates, distinct)
+        legacy = bench(legacy_parse_date, values, args.repeat)
+        uncached = bench(parse_date.__wrapped__, values, args.repeat)
+        parse_date.cache_clear()
+        cached = bench(parse_date, values, args.repeat)
+        print(f"{distinct:>10} {legacy:>10.2f}µs {uncached:>10.2f}µs {cached:>10.2f}µs")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los backends de parseo HTML por tamaño de página
+Desarrollado por Sergie Code
+
+Uso: python benchmarks/parse_benchmark.py [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scraper.parsing import make_soup, available_parsers, SubtreeStrainer
+
+# Solo los contenedores de eventos, como declaran los scrapers
+EVENT_STRAINER = SubtreeStrainer(classes=('evento',))
+
+# Número de eventos de cada página sintética
+PAGE_SIZES = (10, 100, 1000)
+
+EVENT_HTML = """
+<div class="evento card">
+  <h3 class="title">Batalla de Freestyle {i}</h3>
+  <time datetime="2025-10-{day:02d}">{day} de octubre</time>
+  <span class="location">Madrid, España</span>
+  <p class="description">Descripción de la batalla número {i} con <b>invitados</b> y jurado.</p>
+  <a href="/eventos/{i}">Ver evento</a>
+</div>
+"""
+
+def build_page(events: int) -> bytes:
+    """Página con cabecera, scripts, SVG y pie como las reales, más N eventos"""
+    body = ''.join(EVENT_HTML.format(i=i, day=i % 28 + 1) for i in range(events))
+    page = f"""<!DOCTYPE html>
+<html><head><title>Eventos</title>
+<script>{'var x = 1;' * 500}</script>
+<style>{'.a {{ color: red; }}' * 200}</style>
+</head><body>
+<header><nav>{'<a href="#">Menú</a>' * 50}</nav></header>
+<svg>{'<path d="M0 0 L10 10"/>' * 200}</svg>
+<main>{body}</main>
+<footer>{'<p>Pie de página</p>' * 50}</footer>
+</body></html>"""
+    return page.encode('utf-8')
+
+def bench(content: bytes, parser: str, repeat: int, strainer=None) -> float:
+    """Tiempo medio (ms) de parsear y extraer los títulos"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        soup = make_soup(content, parser=parser, fallback=False, parse_only=strainer)
+        soup.select('.evento h3')
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10, help="Repeticiones por medición")
+    args = parser.parse_args()
+
+    # html5lib no admite parse_only
+    runs = [(backend, None) for backend in available_parsers()]
+    runs += [(backend, EVENT_STRAINER) for backend in available_parsers() if backend != 'html5lib']
+    
+    names = [backend + ('+strainer' if strainer else '') for backend, strainer in runs]
+    print(f"{'eventos':>8} {'KB':>8} " + ' '.join(f"{name:>20}" for name in names))
+    for size in PAGE_SIZES:
+        content = build_page(size)
+        times = [bench(content, backend, args.repeat, strainer) for backend, strainer in runs]
+        print(f"{size:>8} {len(content) / 1024:>8.0f} " +  ' '.join(f"{t:>18.1f}ms" for t in times))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Presupuestos de tiempo para las descargas de cada scraper
+Desarrollado por Sergie Code
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import requests
+
+class BudgetExceededError(requests.exceptions.Timeout):
+    """Se agotó el presupuesto de tiempo: la petición no llega a enviarse"""
+
+class TimeBudget:
+    """Tiempo disponible para una ejecución o para un scraper.
+
+    Las sesiones consultan el presupuesto activo antes de cada petición:
+    si ya se agotó la petición falla al instante con BudgetExceededError y,
+    si no, su timeout se recorta al tiempo que queda. El scraper sigue con
+    lo que ya ha parseado y ``exhausted`` indica que el resultado es parcial.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+        self.exhausted = False
+
+    def remaining(self) -> Optional[float]:
+        """Segundos que quedan (None si no hay límite)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        """Indica si ya no queda tiempo"""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def child(self, seconds: Optional[float] = None) -> 'TimeBudget':
+        """Presupuesto de ``seconds`` segundos que no termina después que este"""
+        remaining = self.remaining()
+        if remaining is None:
+            return TimeBudget(seconds)
+        return TimeBudget(remaining if seconds is None else min(seconds, remaining))
+
+    def check(self, url: str, timeout=None):
+        """Devuelve el timeout recortado al tiempo restante, o lanza BudgetExceededError"""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+
+        if remaining <= 0:
+            self.exhausted = True
+            raise BudgetExceededError(f"Presupuesto de tiempo agotado, no se pide {url}")
+
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, (int, float)):
+            return min(timeout, remaining)
+        return timeout
+
+_current_budget = contextvars.ContextVar('scraper_time_budget', default=None)
+
+def current_budget() -> Optional[TimeBudget]:
+    """Presupuesto activo en este hilo o tarea, si lo hay"""
+    return _current_budget.get()
+
+@contextmanager
+def budget_scope(budget: Optional[TimeBudget]):
+    """Activa ``budget`` para las peticiones hechas dentro del bloque"""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
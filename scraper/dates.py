@@ -0,0 +1,87 @@
+"""
+Parseo rápido de fechas de los listados de eventos (español e inglés)
+Desarrollado por Sergie Code
+"""
+
+import re
+from datetime import date
+from functools import lru_cache
+
+# Meses en español e inglés, con sus abreviaturas habituales
+MONTHS = {
+    'enero': 1, 'ene': 1, 'january': 1, 'jan': 1,
+    'febrero': 2, 'feb': 2, 'february': 2,
+    'marzo': 3, 'mar': 3, 'march': 3,
+    'abril': 4, 'abr': 4, 'april': 4, 'apr': 4,
+    'mayo': 5, 'may': 5,
+    'junio': 6, 'jun': 6, 'june': 6,
+    'julio': 7, 'jul': 7, 'july': 7,
+    'agosto': 8, 'ago': 8, 'august': 8, 'aug': 8,
+    'septiembre': 9, 'setiembre': 9, 'sept': 9, 'sep': 9, 'set': 9, 'september': 9,
+    'octubre': 10, 'oct': 10, 'october': 10,
+    'noviembre': 11, 'nov': 11, 'november': 11,
+    'diciembre': 12, 'dic': 12, 'december': 12, 'dec': 12,
+}
+
+# Días de la semana que pueden preceder a la fecha ("Sábado, 15 de marzo de 2025")
+WEEKDAYS = (
+    'lunes', 'martes', 'miércoles', 'miercoles', 'jueves', 'viernes', 'sábado', 'sabado', 'domingo',
+    'lun', 'mar', 'mié', 'mie', 'jue', 'vie', 'sáb', 'sab', 'dom',
+    'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
+    'mon', 'tues', 'tue', 'wed', 'thurs', 'thur', 'thu', 'fri', 'sat', 'sun',
+)
+
+def _alternation(words) -> str:
+    """Alternativa regex con las palabras más largas primero"""
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+_MONTH = rf'(?P<month>{_alternation(MONTHS)})\.?'
+_WEEKDAY = rf'(?:(?:{_alternation(WEEKDAYS)})\.?,?\s+)?'
+
+# 2025-03-15, también con hora y zona como en los atributos datetime
+ISO_RE = re.compile(
+    r'(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})'
+    r'(?:[T ]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?'
+)
+
+# 15/03/2025, 15-03-2025, 15.03.2025
+NUMERIC_RE = re.compile(r'(?P<day>\d{1,2})(?P<sep>[/.-])(?P<month>\d{1,2})(?P=sep)(?P<year>\d{4})')
+
+# 15 de marzo de 2025, sábado 15 mar. 2025, 15 March 2025
+DAY_MONTH_RE = re.compile(
+    rf'{_WEEKDAY}(?P<day>\d{{1,2}})(?:º|°)?\s+(?:de\s+)?{_MONTH},?\s+(?:de(?:l)?\s+)?(?P<year>\d{{4}})',
+    re.IGNORECASE
+)
+
+# March 15, 2025, Sat, Mar 15 2025
+MONTH_DAY_RE = re.compile(
+    rf'{_WEEKDAY}{_MONTH}\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<year>\d{{4}})',
+    re.IGNORECASE
+)
+
+DATE_PATTERNS = (ISO_RE, NUMERIC_RE, DAY_MONTH_RE, MONTH_DAY_RE)
+
+# Tamaño de la caché: las fechas se repiten mucho dentro de un mismo listado
+CACHE_SIZE = 4096
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date(date_string: str) -> str:
+    """Fecha en formato YYYY-MM-DD, o el texto original si no se reconoce"""
+    if not date_string:
+        return ""
+
+    text = ' '.join(date_string.split())
+    for pattern in DATE_PATTERNS:
+        match = pattern.fullmatch(text)
+        if match is None:
+            continue
+
+        month = match.group('month')
+        month = int(month) if month.isdigit() else MONTHS[month.lower()]
+        try:
+            return date(int(match.group('year')), month, int(match.group('day'))).isoformat()
+        except ValueError:
+            # Día o mes fuera de rango (31/02/2025)
+            return date_string
+
+    return date_string
@@ -0,0 +1,139 @@
+"""
+Búsqueda de contenedores de eventos y extracción declarativa de sus campos
+Desarrollado por Sergie Code
+"""
+
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional
+
+import soupsieve
+from bs4 import Tag
+
+from .utils import ScrapingUtils
+
+@lru_cache(maxsize=64)
+def _compile(selectors: tuple):
+    """Compila la lista de selectores como un único selector CSS"""
+    return soupsieve.compile(', '.join(selectors))
+
+def compile_selectors(selectors: Iterable[str]):
+    """Selector compilado (y cacheado) que coincide con cualquiera de la lista"""
+    return _compile(tuple(selectors))
+
+def find_containers(root, selectors: Iterable[str], limit: Optional[int] = None) -> List[Tag]:
+    """Contenedores que coinciden con alguno de los selectores, en orden del documento
+
+    Recorre el árbol una sola vez, así que cada nodo se evalúa (y cada
+    contenedor se devuelve) una única vez aunque coincida con varios
+    selectores. Las coincidencias anidadas no se devuelven por separado:
+
+    - si dentro de un contenedor hay una sola coincidencia, forma parte del
+      mismo evento y se devuelve solo el contenedor exterior;
+    - si hay dos o más, el exterior es un envoltorio (una lista o una
+      sección de la página) y se devuelven los contenedores interiores.
+    """
+    matcher = compile_selectors(selectors)
+    found = []
+
+    # Pila de (nodo, hijos pendientes, coincide, lista donde acumula)
+    stack = [(root, iter(root.children), False, found)]
+    while stack:
+        node, children, matched, results = stack[-1]
+        child = next(children, None)
+
+        if child is None:
+            stack.pop()
+            if matched:
+                parent_results = stack[-1][3]
+                if len(results) >= 2:
+                    parent_results.extend(results)
+                else:
+                    parent_results.append(node)
+            continue
+
+        if not isinstance(child, Tag):
+            continue
+
+        if matcher.match(child):
+            stack.append((child, iter(child.children), True, []))
+        else:
+            # Los nodos que no coinciden acumulan directamente en la lista del padre
+            stack.append((child, iter(child.children), False, results))
+
+    return found[:limit] if limit is not None else found
+
+def class_contains(tags: Iterable[str], *fragments: str) -> str:
+    """Selector equivalente a find(tags, class_=re.compile('a|b')): etiqueta con 'a' o 'b' en class"""
+    return ', '.join(f'{tag}[class*="{fragment}"]' for tag in tags for fragment in fragments)
+
+def min_length(length: int) -> Callable[[str], bool]:
+    """Validador: texto no vacío de más de ``length`` caracteres"""
+    return lambda value: bool(value) and len(value) > length
+
+class FieldSpec:
+    """Cómo extraer un campo de un contenedor de evento
+
+    Los selectores se prueban en orden de prioridad; de cada uno se toma el
+    primer elemento del contenedor. El valor es el atributo ``attribute`` (si
+    existe y no está vacío) o, si ``text`` está activado, el texto limpio del
+    elemento. Se devuelve el primer valor que pasa ``validator``; si ninguno
+    lo pasa, el del último selector que encontró algo, y None si no encontró
+    nada. Un selector con comas ('h1, h2') toma el primero en orden del
+    documento, como ``element.find(['h1', 'h2'])``.
+    """
+
+    def __init__(self, selectors: Iterable[str], attribute: Optional[str] = None,
+                 text: bool = True, validator: Callable[[str], bool] = bool):
+        self.selectors = tuple(selectors)
+        self.attribute = attribute
+        self.text = text
+        self.validator = validator
+
+    def value_of(self, element: Tag) -> str:
+        """Valor del campo en un elemento"""
+        if self.attribute:
+            value = element.get(self.attribute)
+            if value:
+                return value
+        return ScrapingUtils.clean_text(element.get_text()) if self.text else ''
+
+    def pick(self, first: Dict[str, Tag]) -> Optional[str]:
+        """Elige el valor a partir del primer elemento encontrado por cada selector"""
+        value = None
+        for selector in self.selectors:
+            element = first.get(selector)
+            if element is None:
+                continue
+            value = self.value_of(element)
+            if self.validator(value):
+                return value
+        return value
+
+class FieldSpecs:
+    """Conjunto de FieldSpec de un scraper, con los selectores compilados una vez
+
+    ``extract`` recorre el contenedor una sola vez con la unión de todos los
+    selectores y anota el primer elemento de cada uno; después cada campo
+    elige su valor sin volver a buscar en el árbol.
+    """
+
+    def __init__(self, fields: Dict[str, FieldSpec]):
+        self.fields = dict(fields)
+        selectors = list(dict.fromkeys(selector for spec in self.fields.values()
+                                       for selector in spec.selectors))
+        self._compiled = {selector: soupsieve.compile(selector) for selector in selectors}
+        self._any = compile_selectors(selectors)
+
+    def extract(self, element: Tag) -> Dict[str, Optional[str]]:
+        """Valores de todos los campos en el contenedor"""
+        first = {}
+        pending = dict(self._compiled)
+        for tag in self._any.iselect(element):
+            for selector, compiled in list(pending.items()):
+                if compiled.match(tag):
+                    first[selector] = tag
+                    del pending[selector]
+            if not pending:
+                break
+
+        return {name: spec.pick(first) for name, spec in self.fields.items()}
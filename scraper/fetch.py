@@ -0,0 +1,100 @@
+"""
+Capa de descarga asíncrona compartida por todos los scrapers
+Desarrollado por Sergie Code
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .session import ScraperSession, create_session, DEFAULT_PER_HOST_LIMIT
+
+# Hosts distintos cuyas conexiones keep-alive se mantienen en el pool
+DEFAULT_POOL_HOSTS = 32
+
+# Hilos que ejecutan las peticiones (requests es bloqueante)
+DEFAULT_MAX_WORKERS = 16
+
+# Timeout por defecto de cada petición, en segundos
+DEFAULT_TIMEOUT = 10
+
+class AsyncFetcher:
+    """Descargas concurrentes sobre una única sesión HTTP compartida.
+
+    Todos los scrapers usan la misma ScraperSession (con su caché HTTP y
+    su limitador por dominio) montada sobre un pool de conexiones
+    keep-alive, así que una conexión abierta por un scraper la reutiliza
+    cualquier otro que pida al mismo host. ``fetch`` es una corrutina que
+    ejecuta la petición en un pool de hilos; ``fetch_all`` lanza muchas a
+    la vez y ``fetch_many`` hace lo mismo desde código síncrono. El límite
+    de peticiones en vuelo por host lo aplica la sesión, así que lo
+    comparten estas descargas y las que los scrapers hacen directamente con
+    ``session.get``; ``per_host_limit`` solo se usa si no se pasa sesión.
+
+    requests solo habla HTTP/1.1: la reutilización de conexiones viene del
+    keep-alive del pool, no de la multiplexación de HTTP/2.
+    """
+
+    def __init__(self, session: Optional[ScraperSession] = None,
+                 per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 pool_hosts: int = DEFAULT_POOL_HOSTS):
+        if per_host_limit < 1 or max_workers < 1:
+            raise ValueError("per_host_limit y max_workers deben ser >= 1")
+
+        self.session = session if session is not None else create_session(per_host_limit=per_host_limit)
+        self.per_host_limit = self.session.per_host_limit
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=self.per_host_limit)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Pool de hilos de las descargas (se crea al primer uso)"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='fetch')
+            return self._executor
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Petición GET bloqueante (la sesión respeta el límite del host)"""
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+        return self.session.get(url, **kwargs)
+
+    async def fetch(self, url: str, **kwargs) -> requests.Response:
+        """Descarga una URL sin bloquear el bucle de eventos"""
+        loop = asyncio.get_running_loop()
+        # El hilo del pool hereda el contexto (p. ej. el presupuesto de tiempo activo)
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._get_executor(),
+                                          functools.partial(context.run, self.get, url, **kwargs))
+
+    async def fetch_all(self, urls: Iterable[str], **kwargs) -> List:
+        """Descarga varias URLs a la vez; devuelve respuestas o excepciones en el mismo orden"""
+        return await asyncio.gather(*(self.fetch(url, **kwargs) for url in urls),
+                                    return_exceptions=True)
+
+    def fetch_many(self, urls: Iterable[str], **kwargs) -> List:
+        """fetch_all para código síncrono (los scrapers o sus hilos)"""
+        return asyncio.run(self.fetch_all(list(urls), **kwargs))
+
+    def close(self):
+        """Cierra el pool de hilos y las conexiones (se vuelven a abrir si hace falta)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.session.close()
+
+# Descargador compartido por todos los scrapers
+fetcher = AsyncFetcher()
@@ -0,0 +1,123 @@
+"""
+Huellas de páginas para no volver a parsear contenido sin cambios
+Desarrollado por Sergie Code
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional, Callable
+
+from .gazetteer import gazetteer
+
+# Cambiar este valor invalida todas las huellas guardadas (p. ej. si cambia el formato).
+# Los cambios del gazetteer no necesitan subirlo: su resumen ya forma parte de la huella
+FORMAT_VERSION = 5
+
+_WHITESPACE_RE = re.compile(rb'\s+')
+
+class PageFingerprintStore:
+    """Guarda el hash del cuerpo normalizado de cada página junto a sus eventos.
+
+    Si una página llega con el mismo hash que en la ejecución anterior se
+    devuelven los eventos guardados sin construir el DOM.
+    """
+
+    def __init__(self, db_path: str = "data/page_fingerprints.db"):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Abre la base de datos en el primer uso (con el lock tomado)"""
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS huellas (
+                    scraper TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    eventos TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (scraper, url)
+                )
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def fingerprint(body: bytes) -> str:
+        """Hash del cuerpo con los espacios en blanco normalizados
+
+        Incluye FORMAT_VERSION y el resumen del gazetteer, porque los eventos
+        guardados llevan ciudad, país y venue ya resueltos con él.
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        normalized = _WHITESPACE_RE.sub(b' ', body or b'').strip()
+        digest = hashlib.sha256(f"{FORMAT_VERSION}:{gazetteer.digest}".encode('ascii'))
+        digest.update(normalized)
+        return digest.hexdigest()
+
+    def lookup(self, scraper: str, url: str, digest: str) -> Optional[List[Dict[str, Any]]]:
+        """Devuelve los eventos guardados si la huella coincide, o None"""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT hash, eventos FROM huellas WHERE scraper = ? AND url = ?',
+                (scraper, url)
+            ).fetchone()
+        if row is None or row[0] != digest:
+            return None
+        return json.loads(row[1])
+
+    def save(self, scraper: str, url: str, digest: str, events: List[Dict[str, Any]]):
+        """Guarda la huella de la página y los eventos extraídos de ella"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO huellas (scraper, url, hash, eventos, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (scraper, url, digest, json.dumps(events, ensure_ascii=False), time.time())
+            )
+            conn.commit()
+
+    def get_or_parse(self, scraper: str, url: str, body: bytes,
+                     parse: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Devuelve los eventos guardados si la página no cambió; si no, parsea y guarda"""
+        digest = self.fingerprint(body)
+        events = self.lookup(scraper, url, digest)
+        if events is not None:
+            self.hits += 1
+            print(f"  ♻️ Página sin cambios, reutilizando {len(events)} eventos: {url}")
+            return events
+
+        self.misses += 1
+        events = parse()
+        self.save(scraper, url, digest, events)
+        return events
+
+    def clear(self):
+        """Elimina todas las huellas"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM huellas')
+            conn.commit()
+
+    def close(self):
+        """Cierra la conexión con la base de datos de huellas"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Almacén compartido por todos los scrapers
+fingerprint_store = PageFingerprintStore()
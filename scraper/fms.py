@@ -3,15 +3,32 @@ Scraper para eventos de FMS (Freestyle Master Series)
 Desarrollado por Sergie Code
 """
 
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any
+from .parsing import make_soup, SubtreeStrainer
+from typing import List, Dict, Any, Iterator
 import re
 from .utils import ScrapingUtils, log_scraping_result, validate_event
+from .fetch import fetcher
+from .fingerprint import fingerprint_store
+from .extraction import find_containers, FieldSpec, FieldSpecs, min_length
+from .gazetteer import gazetteer
+
+# Subárboles que se construyen al parsear el calendario (cubren event_selectors)
+CALENDAR_STRAINER = SubtreeStrainer(
+    tags=('article',),
+    classes=('event', 'calendario-item', 'fixture', 'card', 'evento')
+)
 
 class FMSScraper:
     """Scraper para eventos de Freestyle Master Series (FMS)"""
     
+    # Campos de cada evento del calendario (selectores en orden de prioridad)
+    EVENT_FIELDS = FieldSpecs({
+        'title': FieldSpec(['h1', 'h2', 'h3', 'h4', '.title', '.evento-titulo', 'a'], validator=min_length(3)),
+        'date': FieldSpec(['time', '.date', '.fecha', '[datetime]', '.day'], attribute='datetime'),
+        'location': FieldSpec(['.location', '.venue', '.liga', '.country']),
+        'link': FieldSpec(['a'], attribute='href', text=False)
+    })
+    
     def __init__(self):
         self.base_url = "https://fms.tv"
         self.calendar_url = "https://fms.tv/calendario"
@@ -20,28 +37,28 @@ class FMSScraper:
             'twitter': 'https://twitter.com/FMSWorldSeries',
             'youtube': 'https://www.youtube.com/c/FMSWorldSeries'
         }
-        self.session = requests.Session()
-        self.session.headers.update(ScrapingUtils.get_headers())
+        self.fetcher = fetcher
+        self.session = fetcher.session
+        self.fingerprints = fingerprint_store
+    
+    def iter_events(self) -> Iterator[Dict[str, Any]]:
+        """Genera los eventos de FMS a medida que se parsean (sin validar)"""
+        print("🔍 Scrapeando FMS World Series...")
+        
+        # Scrapear página de calendario
+        calendar_events = self._scrape_calendar_page()
+        yield from calendar_events
+        
+        # Si no hay eventos del calendario, usar eventos conocidos
+        if not calendar_events:
+            print("  📝 Usando eventos conocidos de FMS")
+            yield from self._get_known_fms_events()
     
     def scrape_events(self) -> List[Dict[str, Any]]:
         """Extrae eventos de FMS"""
-        events = []
-        
         try:
-            print("🔍 Scrapeando FMS World Series...")
-            
-            # Scrapear página de calendario
-            calendar_events = self._scrape_calendar_page()
-            events.extend(calendar_events)
-            
-            # Si no hay eventos del calendario, usar eventos conocidos
-            if not events:
-                print("  📝 Usando eventos conocidos de FMS")
-                known_events = self._get_known_fms_events()
-                events.extend(known_events)
-            
             # Filtrar y validar eventos
-            events = [event for event in events if validate_event(event)]
+            events = [event for event in self.iter_events() if validate_event(event)]
             
             log_scraping_result("FMS World Series", len(events))
             return events
@@ -57,25 +74,13 @@ class FMSScraper:
         try:
             print(f"🔍 Accediendo a: {self.calendar_url}")
             
-            ScrapingUtils.random_delay()
             response = self.session.get(self.calendar_url, timeout=15)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Buscar elementos de eventos
-                event_selectors = [
-                    '.event', '.calendario-item', '.fixture',
-                    'article', '.card', '.evento'
-                ]
-                
-                for selector in event_selectors:
-                    elements = soup.select(selector)
-                    for element in elements[:15]:  # Limitar a 15 eventos
-                        event = self._parse_fms_event(element)
-                        if event:
-                            events.append(event)
-                            print(f"  ✅ Encontrado: {event['nombre']}")
+                events = self.fingerprints.get_or_parse(
+                    'fms', self.calendar_url, response.content,
+                    lambda: self._parse_calendar_page(response.content)
+                )
             else:
                 print(f"  ⚠️ Error HTTP {response.status_code} al acceder al calendario FMS")
                 
@@ -84,50 +89,41 @@ class FMSScraper:
         
         return events
     
+    def _parse_calendar_page(self, content: bytes) -> List[Dict[str, Any]]:
+        """Extrae los eventos del HTML del calendario"""
+        events = []
+        soup = make_soup(content, parse_only=CALENDAR_STRAINER)
+        
+        # Buscar elementos de eventos
+        event_selectors = [
+            '.event', '.calendario-item', '.fixture',
+            'article', '.card', '.evento'
+        ]
+        
+        # Una sola pasada: cada contenedor se parsea una vez aunque coincida con varios selectores
+        for element in find_containers(soup, event_selectors, limit=15):  # Limitar a 15 eventos
+            event = self._parse_fms_event(element)
+            if event:
+                events.append(event)
+                print(f"  ✅ Encontrado: {event['nombre']}")
+        
+        return events
+    
     def _parse_fms_event(self, element) -> Dict[str, Any]:
         """Parsea un evento de FMS del calendario"""
         try:
-            # Buscar título del evento
-            title_selectors = ['h1', 'h2', 'h3', 'h4', '.title', '.evento-titulo', 'a']
-            title = None
-            
-            for selector in title_selectors:
-                title_elem = element.select_one(selector)
-                if title_elem:
-                    title = ScrapingUtils.clean_text(title_elem.get_text())
-                    if title and len(title) > 3:
-                        break
+            fields = self.EVENT_FIELDS.extract(element)
+            title = fields['title']
             
             if not title:
                 return None
             
-            # Buscar fecha
-            date_selectors = ['time', '.date', '.fecha', '[datetime]', '.day']
-            fecha = None
-            
-            for selector in date_selectors:
-                date_elem = element.select_one(selector)
-                if date_elem:
-                    fecha = date_elem.get('datetime') or ScrapingUtils.clean_text(date_elem.get_text())
-                    if fecha:
-                        break
-            
-            # Buscar ubicación/liga
-            location_selectors = ['.location', '.venue', '.liga', '.country']
-            ubicacion = None
+            fecha = fields['date']
+            ubicacion = fields['location']
             
-            for selector in location_selectors:
-                location_elem = element.select_one(selector)
-                if location_elem:
-                    ubicacion = ScrapingUtils.clean_text(location_elem.get_text())
-                    if ubicacion:
-                        break
-            
-            # Buscar enlace
-            link_elem = element.select_one('a')
             link = ""
-            if link_elem and link_elem.get('href'):
-                href = link_elem['href']
+            href = fields['link']
+            if href:
                 link = href if href.startswith('http') else f"{self.base_url}{href}"
             
             # Determinar liga/país basado en el título o ubicación
@@ -172,29 +168,15 @@ class FMSScraper:
     
     def _extract_city_from_league(self, league: str) -> str:
         """Extrae la ciudad principal de una liga"""
-        cities = {
-            'FMS España': 'Madrid',
-            'FMS México': 'Ciudad de México',
-            'FMS Argentina': 'Buenos Aires',
-            'FMS Chile': 'Santiago',
-            'FMS Perú': 'Lima',
-            'FMS Colombia': 'Bogotá',
-            'FMS Internacional': 'Varios'
-        }
-        return cities.get(league, '')
+        if league == 'FMS Internacional':
+            return 'Varios'
+        return gazetteer.main_city(gazetteer.resolve(league)['pais'])
     
     def _extract_country_from_league(self, league: str) -> str:
         """Extrae el país de una liga"""
-        countries = {
-            'FMS España': 'España',
-            'FMS México': 'México',
-            'FMS Argentina': 'Argentina',
-            'FMS Chile': 'Chile',
-            'FMS Perú': 'Perú',
-            'FMS Colombia': 'Colombia',
-            'FMS Internacional': 'Internacional'
-        }
-        return countries.get(league, 'España')
+        if league == 'FMS Internacional':
+            return 'Internacional'
+        return gazetteer.resolve(league)['pais'] or 'España'
     
     def _get_known_fms_events(self) -> List[Dict[str, Any]]:
         """Eventos conocidos de FMS (datos actualizados para 2025)"""
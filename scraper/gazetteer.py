@@ -0,0 +1,149 @@
+"""
+Resolución de ciudades, países y venues en una sola pasada por el texto
+Desarrollado por Sergie Code
+"""
+
+import hashlib
+import json
+import os
+from collections import deque
+from typing import Dict, List, Tuple
+
+# Fichero con los lugares conocidos (se puede cambiar con SCRAPER_GAZETTEER)
+DEFAULT_GAZETTEER_PATH = os.environ.get(
+    'SCRAPER_GAZETTEER',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.json')
+)
+
+# Tipos de entrada, en el orden en que se prefieren ante dos coincidencias iguales
+KINDS = ('venue', 'city', 'country')
+
+# Se ignoran mayúsculas y tildes al comparar
+_FOLD = str.maketrans('áéíóúàèìòùäëïöüâêîôûñç', 'aeiouaeiouaeiouaeiounc')
+
+def fold(text: str) -> str:
+    """Texto en minúsculas y sin tildes"""
+    return text.lower().translate(_FOLD)
+
+class Gazetteer:
+    """Autómata Aho-Corasick con todos los nombres de ciudades, países y venues.
+
+    ``find`` recorre el texto una sola vez sea cual sea el número de
+    entradas y devuelve las coincidencias de palabras completas, de
+    izquierda a derecha y sin solaparse (gana la más larga: "Santiago de
+    Compostela" antes que "Santiago").
+    """
+
+    def __init__(self, countries: Dict[str, Dict] = None, cities: Dict[str, Dict] = None,
+                 venues: Dict[str, Dict] = None):
+        self.countries = countries or {}
+        self.cities = cities or {}
+        self.venues = venues or {}
+        # Resumen de los datos: las huellas de páginas lo incluyen para que un
+        # cambio de lugares invalide los eventos ya resueltos con los anteriores
+        data = json.dumps([self.countries, self.cities, self.venues], sort_keys=True, ensure_ascii=False)
+        self.digest = hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+        # Trie: transiciones, enlace de fallo y salidas (longitud, tipo, nombre) de cada nodo
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str, str]]] = [[]]
+
+        for kind, entries in (('country', self.countries), ('city', self.cities), ('venue', self.venues)):
+            for name, entry in entries.items():
+                for alias in {fold(name), *(fold(a) for a in entry.get('aliases', ()))}:
+                    self._add(alias, kind, name)
+        self._build_links()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_GAZETTEER_PATH) -> 'Gazetteer':
+        """Crea el gazetteer a partir de un fichero JSON"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('countries'), data.get('cities'), data.get('venues'))
+
+    def _add(self, alias: str, kind: str, name: str):
+        """Añade un nombre al trie"""
+        node = 0
+        for char in alias:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = next_node
+        self._out[node].append((len(alias), kind, name))
+
+    def _build_links(self):
+        """Calcula los enlaces de fallo recorriendo el trie por niveles"""
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, child in self._goto[node].items():
+                pending.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """Coincidencias (inicio, fin, tipo, nombre) en el texto"""
+        if not text:
+            return []
+
+        folded = fold(text)
+        matches = []
+        node = 0
+        for i, char in enumerate(folded):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, kind, name in self._out[node]:
+                start = i + 1 - length
+                if _is_word_boundary(folded, start - 1) and _is_word_boundary(folded, i + 1):
+                    matches.append((start, i + 1, kind, name))
+
+        # De izquierda a derecha, la más larga primero y sin solapes
+        matches.sort(key=lambda m: (m[0], m[0] - m[1], KINDS.index(m[2])))
+        selected = []
+        end = 0
+        for match in matches:
+            if match[0] >= end:
+                selected.append(match)
+                end = match[1]
+        return selected
+
+    def resolve(self, text: str) -> Dict[str, str]:
+        """Ciudad, país y venue mencionados en el texto ('' si no se reconocen)
+
+        El país mencionado explícitamente tiene prioridad; si no lo hay se
+        deduce de la ciudad o del venue.
+        """
+        found = {}
+        for _, _, kind, name in self.find(text):
+            found.setdefault(kind, name)
+
+        venue = found.get('venue', '')
+        city = found.get('city') or (self.venues[venue].get('city', '') if venue else '')
+        country = found.get('country') or self.country_of(city)
+        return {'ciudad': city, 'pais': country, 'venue': venue}
+
+    def country_of(self, city: str) -> str:
+        """País de una ciudad conocida, o ''"""
+        entry = self.cities.get(city)
+        return entry['country'] if entry else ''
+
+    def main_city(self, country: str) -> str:
+        """Ciudad principal de un país conocido, o ''"""
+        entry = self.countries.get(country)
+        return entry.get('main_city', '') if entry else ''
+
+def _is_word_boundary(text: str, index: int) -> bool:
+    """Indica si la posición está fuera del texto o no es letra ni número"""
+    return index < 0 or index >= len(text) or not text[index].isalnum()
+
+# Gazetteer compartido por todos los scrapers
+gazetteer = Gazetteer.load()
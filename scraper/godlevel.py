@@ -3,15 +3,36 @@ Scraper para eventos de God Level
 Desarrollado por Sergie Code
 """
 
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any
+from .parsing import make_soup, SubtreeStrainer
+from typing import List, Dict, Any, Iterator
 import re
 from .utils import ScrapingUtils, log_scraping_result, validate_event
+from .fetch import fetcher
+from .fingerprint import fingerprint_store
+from .extraction import find_containers, FieldSpec, FieldSpecs, class_contains
+from .gazetteer import gazetteer
+
+# Subárboles que se construyen al parsear cada página (cubren sus selectores)
+EVENTS_STRAINER = SubtreeStrainer(
+    tags=('article',),
+    classes=('event', 'evento', 'battle', 'batalla', 'card', 'item')
+)
+MAIN_PAGE_STRAINER = SubtreeStrainer(class_pattern=r'event|tournament',
+                                     pattern_tags=('div', 'article', 'section'))
+TOURNAMENTS_STRAINER = SubtreeStrainer(class_pattern=r'tournament|battle|event',
+                                       pattern_tags=('div', 'article'))
 
 class GodLevelScraper:
     """Scraper para eventos de God Level"""
     
+    # Campos de cada evento (equivalen a los element.find() originales)
+    EVENT_FIELDS = FieldSpecs({
+        'title': FieldSpec(['h1, h2, h3, h4']),
+        'date': FieldSpec([class_contains(('time', 'span'), 'date', 'fecha')]),
+        'link': FieldSpec(['a'], attribute='href', text=False),
+        'location': FieldSpec([class_contains(('span', 'div'), 'location', 'venue', 'lugar')])
+    })
+    
     def __init__(self):
         self.base_url = "https://godlevel.es"
         self.events_url = "https://godlevel.es/eventos"
@@ -20,28 +41,28 @@ class GodLevelScraper:
             'twitter': 'https://twitter.com/GodLevel_',
             'youtube': 'https://www.youtube.com/c/GodLevelOficial'
         }
-        self.session = requests.Session()
-        self.session.headers.update(ScrapingUtils.get_headers())
+        self.fetcher = fetcher
+        self.session = fetcher.session
+        self.fingerprints = fingerprint_store
+    
+    def iter_events(self) -> Iterator[Dict[str, Any]]:
+        """Genera los eventos de God Level a medida que se parsean (sin validar)"""
+        print("🔍 Scrapeando God Level...")
+        
+        # Scrapear página de eventos
+        events_page = self._scrape_events_page()
+        yield from events_page
+        
+        # Si no hay eventos, usar eventos conocidos
+        if not events_page:
+            print("  📝 Usando eventos conocidos de God Level")
+            yield from self._get_known_godlevel_events()
     
     def scrape_events(self) -> List[Dict[str, Any]]:
         """Extrae eventos de God Level"""
-        events = []
-        
         try:
-            print("🔍 Scrapeando God Level...")
-            
-            # Scrapear página de eventos
-            events_page = self._scrape_events_page()
-            events.extend(events_page)
-            
-            # Si no hay eventos, usar eventos conocidos
-            if not events:
-                print("  📝 Usando eventos conocidos de God Level")
-                known_events = self._get_known_godlevel_events()
-                events.extend(known_events)
-            
             # Filtrar y validar eventos
-            events = [event for event in events if validate_event(event)]
+            events = [event for event in self.iter_events() if validate_event(event)]
             
             log_scraping_result("God Level", len(events))
             return events
@@ -57,25 +78,13 @@ class GodLevelScraper:
         try:
             print(f"🔍 Accediendo a: {self.events_url}")
             
-            ScrapingUtils.random_delay()
             response = self.session.get(self.events_url, timeout=15)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Buscar elementos de eventos
-                event_selectors = [
-                    '.event', '.evento', '.battle', '.batalla',
-                    'article', '.card', '.item'
-                ]
-                
-                for selector in event_selectors:
-                    elements = soup.select(selector)
-                    for element in elements[:10]:  # Limitar a 10 eventos
-                        event = self._parse_godlevel_event(element)
-                        if event:
-                            events.append(event)
-                            print(f"  ✅ Encontrado: {event['nombre']}")
+                events = self.fingerprints.get_or_parse(
+                    'godlevel', self.events_url, response.content,
+                    lambda: self._parse_events_page(response.content)
+                )
             else:
                 print(f"  ⚠️ Error HTTP {response.status_code} al acceder a eventos God Level")
                 
@@ -84,86 +93,25 @@ class GodLevelScraper:
         
         return events
     
-    def _parse_godlevel_event(self, element) -> Dict[str, Any]:
-        """Parsea un evento de God Level"""
-        try:
-            # Buscar título
-            title_selectors = ['h1', 'h2', 'h3', 'h4', '.title', '.nombre', 'a']
-            title = None
-            
-            for selector in title_selectors:
-                title_elem = element.select_one(selector)
-                if title_elem:
-                    title = ScrapingUtils.clean_text(title_elem.get_text())
-                    if title and len(title) > 3:
-                        break
-            
-            if not title:
-                return None
-            
-            # Buscar fecha
-            date_selectors = ['time', '.date', '.fecha', '[datetime]']
-            fecha = None
-            
-            for selector in date_selectors:
-                date_elem = element.select_one(selector)
-                if date_elem:
-                    fecha = date_elem.get('datetime') or ScrapingUtils.clean_text(date_elem.get_text())
-                    if fecha:
-                        break
-            
-            # Buscar ubicación
-            location_selectors = ['.location', '.venue', '.lugar', '.ciudad']
-            ubicacion = None
-            
-            for selector in location_selectors:
-                location_elem = element.select_one(selector)
-                if location_elem:
-                    ubicacion = ScrapingUtils.clean_text(location_elem.get_text())
-                    if ubicacion:
-                        break
-            
-            # Buscar enlace
-            link_elem = element.select_one('a')
-            link = ""
-            if link_elem and link_elem.get('href'):
-                href = link_elem['href']
-                link = href if href.startswith('http') else f"{self.base_url}{href}"
-            
-            return {
-                'nombre': title,
-                'fecha': ScrapingUtils.parse_date(fecha) if fecha else "",
-                'hora': '',
-                'ciudad': self._extract_city(ubicacion) if ubicacion else "Madrid",
-                'pais': "España",
-                'venue': ubicacion or "",
-                'organizador': 'God Level',
-                'link_oficial': link,
-                'descripcion': f"Evento de God Level: {title}"
-            }
-            
-        except Exception as e:
-            print(f"  ❌ Error parseando evento God Level: {e}")
-            return None
-            
-            # Buscar sección de eventos/torneos
-            tournament_events = self._scrape_tournaments()
-            events.extend(tournament_events)
-            
-            # Agregar eventos conocidos
-            known_events = self._get_known_godlevel_events()
-            events.extend(known_events)
-            
-            # Filtrar y validar eventos
-            events = [event for event in events if validate_event(event)]
-            
-            log_scraping_result("God Level", len(events))
-            return events
-            
-        except Exception as e:
-            print(f"❌ Error scrapeando God Level: {e}")
-            log_scraping_result("God Level", 0, False)
-            return []
+    def _parse_events_page(self, content: bytes) -> List[Dict[str, Any]]:
+        """Extrae los eventos del HTML de la página de eventos"""
+        events = []
+        soup = make_soup(content, parse_only=EVENTS_STRAINER)
+        
+        # Buscar elementos de eventos
+        event_selectors = [
+            '.event', '.evento', '.battle', '.batalla',
+            'article', '.card', '.item'
+        ]
+        
+        # Una sola pasada: cada contenedor se parsea una vez aunque coincida con varios selectores
+        for element in find_containers(soup, event_selectors, limit=10):  # Limitar a 10 eventos
+            event = self._parse_godlevel_event(element)
+            if event:
+                events.append(event)
+                print(f"  ✅ Encontrado: {event['nombre']}")
+        
+        return events
     
     def _scrape_main_page(self) -> List[Dict[str, Any]]:
         """Extrae eventos de la página principal"""
@@ -174,7 +122,7 @@ class GodLevelScraper:
             if response.status_code != 200:
                 return events
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = make_soup(response.content, parse_only=MAIN_PAGE_STRAINER)
             
             # Buscar elementos de eventos
             event_selectors = [
@@ -184,12 +132,10 @@ class GodLevelScraper:
                 'section[class*="event"]'
             ]
             
-            for selector in event_selectors:
-                elements = soup.select(selector)
-                for element in elements:
-                    event = self._parse_godlevel_event(element)
-                    if event:
-                        events.append(event)
+            for element in find_containers(soup, event_selectors):
+                event = self._parse_godlevel_event(element)
+                if event:
+                    events.append(event)
                         
         except Exception as e:
             print(f"Error scrapeando página principal de God Level: {e}")
@@ -207,7 +153,7 @@ class GodLevelScraper:
             if response.status_code != 200:
                 return events
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = make_soup(response.content, parse_only=TOURNAMENTS_STRAINER)
             
             # Buscar torneos específicos
             tournament_elements = soup.find_all(['div', 'article'], 
@@ -226,36 +172,24 @@ class GodLevelScraper:
     def _parse_godlevel_event(self, element) -> Dict[str, Any]:
         """Parsea un evento de God Level"""
         try:
-            # Buscar título
-            title_elem = element.find(['h1', 'h2', 'h3', 'h4'])
-            if not title_elem:
+            fields = self.EVENT_FIELDS.extract(element)
+            title = fields['title']
+            if title is None:
                 return None
             
-            title = ScrapingUtils.clean_text(title_elem.get_text())
-            
             # Filtrar solo eventos de freestyle/batalla
             if not any(keyword in title.lower() for keyword in 
                       ['battle', 'batalla', 'freestyle', 'god level', 'tournament']):
                 return None
             
-            # Buscar fecha
-            date_elem = element.find(['time', 'span'], class_=re.compile(r'date|fecha'))
-            date = ""
-            if date_elem:
-                date = ScrapingUtils.parse_date(date_elem.get_text())
+            date = ScrapingUtils.parse_date(fields['date']) if fields['date'] is not None else ""
             
-            # Buscar link
-            link_elem = element.find('a')
             link = ""
-            if link_elem and link_elem.get('href'):
-                href = link_elem['href']
+            href = fields['link']
+            if href:
                 link = href if href.startswith('http') else f"{self.base_url}{href}"
             
-            # Buscar ubicación
-            location_elem = element.find(['span', 'div'], class_=re.compile(r'location|venue|lugar'))
-            location = ""
-            if location_elem:
-                location = ScrapingUtils.clean_text(location_elem.get_text())
+            location = fields['location'] or ""
             
             return {
                 'nombre': f"God Level - {title}",
@@ -338,40 +272,15 @@ class GodLevelScraper:
         if not location:
             return ""
         
-        # Ciudades comunes en eventos internacionales
-        cities = ['México', 'Bogotá', 'Buenos Aires', 'Madrid', 'Lima', 'Santiago',
-                 'Medellín', 'Guadalajara', 'Valencia', 'Barcelona', 'Miami', 'Los Angeles']
-        
-        for city in cities:
-            if city.lower() in location.lower():
-                return city
-        
         # Si no encuentra ciudad conocida, tomar la primera parte
-        parts = location.split(',')
-        return parts[0].strip() if parts else ""
+        return gazetteer.resolve(location)['ciudad'] or location.split(',')[0].strip()
     
     def _extract_country(self, location: str) -> str:
         """Extrae el país de una ubicación"""
         if not location:
             return ""
         
-        countries = {
-            'méxico': 'México', 'mexico': 'México',
-            'colombia': 'Colombia',
-            'argentina': 'Argentina',
-            'españa': 'España', 'spain': 'España',
-            'perú': 'Perú', 'peru': 'Perú',
-            'chile': 'Chile',
-            'venezuela': 'Venezuela',
-            'usa': 'Estados Unidos', 'united states': 'Estados Unidos'
-        }
-        
-        location_lower = location.lower()
-        for key, value in countries.items():
-            if key in location_lower:
-                return value
-        
-        return ""
+        return gazetteer.resolve(location)['pais']
 
 def main():
     """Función principal para testing"""
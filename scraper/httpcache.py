@@ -0,0 +1,212 @@
+"""
+Caché HTTP persistente para las sesiones de los scrapers
+Desarrollado por Sergie Code
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Cabeceras de la petición que cambian la representación devuelta
+VARY_HEADERS = ('Accept', 'Accept-Language')
+
+# Cabeceras que no se guardan: el cuerpo se almacena ya descomprimido
+SKIP_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+
+class HTTPCache:
+    """Caché HTTP en SQLite con revalidación ETag/Last-Modified.
+
+    Mientras una entrada tiene menos de ``ttl`` segundos se sirve sin tocar la
+    red. Pasado ese tiempo se revalida con If-None-Match/If-Modified-Since y
+    un 304 se trata como acierto. Si el tamaño total supera ``max_bytes`` se
+    eliminan las entradas usadas hace más tiempo (LRU).
+    """
+
+    DEFAULT_TTL = 15 * 60
+    DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+    def __init__(self, db_path: str = "data/http_cache.db", ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_respuestas_access ON respuestas(last_access)')
+        self._conn.commit()
+
+    @staticmethod
+    def key_for(url: str, headers: Optional[Dict[str, str]] = None) -> str:
+        """Clave de la entrada: URL más las cabeceras relevantes de la petición"""
+        headers = CaseInsensitiveDict(headers or {})
+        parts = [url] + [f"{name}:{headers.get(name, '')}" for name in VARY_HEADERS]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Devuelve la entrada guardada (y la marca como usada) o None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, status, headers, body, etag, last_modified, stored_at '
+                'FROM respuestas WHERE clave = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE respuestas SET last_access = ? WHERE clave = ?',
+                               (time.time(), key))
+            self._conn.commit()
+
+        url, status, headers, body, etag, last_modified, stored_at = row
+        return {
+            'url': url,
+            'status': status,
+            'headers': json.loads(headers),
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': stored_at
+        }
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        """Indica si la entrada puede servirse sin revalidar"""
+        return time.time() - entry['stored_at'] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: Dict[str, Any]) -> Dict[str, str]:
+        """Cabeceras para revalidar la entrada con el servidor"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    @staticmethod
+    def is_cacheable(response: requests.Response) -> bool:
+        """Solo se guardan respuestas 200 que no prohíban almacenarse"""
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        return response.status_code == 200 and 'no-store' not in cache_control
+
+    def store(self, key: str, url: str, response: requests.Response):
+        """Guarda una respuesta y aplica el límite de tamaño"""
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in SKIP_HEADERS}
+        body = response.content or b''
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO respuestas
+                (clave, url, status, headers, body, etag, last_modified, size, stored_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                key, url, response.status_code, json.dumps(headers), body,
+                response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                len(body), now, now
+            ))
+            self._evict()
+            self._conn.commit()
+
+    def revalidated(self, key: str, response: requests.Response):
+        """Renueva una entrada tras un 304 Not Modified"""
+        with self._lock:
+            self._conn.execute('''
+                UPDATE respuestas
+                SET stored_at = ?, last_access = ?,
+                    etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+                WHERE clave = ?
+            ''', (time.time(), time.time(), response.headers.get('ETag'),
+                  response.headers.get('Last-Modified'), key))
+            self._conn.commit()
+
+    def _evict(self):
+        """Elimina las entradas menos usadas hasta respetar max_bytes (con el lock tomado)"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM respuestas').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute('SELECT clave, size FROM respuestas ORDER BY last_access').fetchall()
+        for clave, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM respuestas WHERE clave = ?', (clave,))
+            total -= size
+
+    @staticmethod
+    def to_response(entry: Dict[str, Any], request: Optional[requests.PreparedRequest] = None) -> requests.Response:
+        """Construye un Response de requests a partir de una entrada guardada"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response.url = entry['url']
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.request = request
+        response.from_cache = True
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aciertos, revalidaciones, fallos y tamaño de la caché"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM respuestas'
+            ).fetchone()
+        return {
+            'hits': self.hits,
+            'revalidations': self.revalidations,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': size
+        }
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._conn.execute('DELETE FROM respuestas')
+            self._conn.commit()
+
+    def close(self):
+        """Cierra la conexión con la base de datos de la caché"""
+        with self._lock:
+            self._conn.close()
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_http_cache() -> HTTPCache:
+    """Caché compartida por todas las sesiones (se crea al primer uso)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HTTPCache()
+        return _default_cache
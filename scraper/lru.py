@@ -0,0 +1,128 @@
+"""
+Caché LRU en memoria con límite de entradas y de bytes
+Desarrollado por Sergie Code
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+class LRUCache:
+    """Caché LRU limitada por número de entradas y por tamaño total en bytes.
+
+    Los valores son bytes (o texto, que se guarda codificado en UTF-8). Al
+    superar cualquiera de los dos límites se descartan las entradas usadas
+    hace más tiempo.
+    """
+
+    DEFAULT_MAX_ENTRIES = 256
+    DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("max_entries y max_bytes deben ser >= 1")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Devuelve el valor (y lo marca como usado) o None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value):
+        """Guarda un valor y descarta las entradas más antiguas si hace falta"""
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+
+        # Un valor más grande que toda la caché no se guarda
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = value
+            self._bytes += len(value)
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aciertos, fallos, expulsiones y ocupación de la caché"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
+class TieredCache:
+    """Caché LRU local con un backend compartido opcional detrás.
+
+    El backend puede ser cualquier objeto con ``get(key)`` y
+    ``set(key, value, ex=segundos)`` (por ejemplo un cliente de Redis), para
+    que varios procesos de la web compartan respuestas. Si el backend falla
+    se sigue funcionando solo con la caché local.
+    """
+
+    def __init__(self, local: Optional[LRUCache] = None, shared=None, shared_ttl: int = 24 * 3600):
+        self.local = local if local is not None else LRUCache()
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Busca primero en local y después en el backend compartido"""
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+
+        try:
+            value = self.shared.get(key)
+        except Exception as e:
+            print(f"⚠️ Error leyendo la caché compartida: {e}")
+            return None
+
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value):
+        """Guarda el valor en local y en el backend compartido"""
+        self.local.set(key, value)
+        if self.shared is None:
+            return
+
+        try:
+            self.shared.set(key, value, ex=self.shared_ttl)
+        except Exception as e:
+            print(f"⚠️ Error escribiendo en la caché compartida: {e}")
+
+    def clear(self):
+        """Vacía la caché local (las claves compartidas caducan solas)"""
+        self.local.clear()
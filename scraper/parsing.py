@@ -0,0 +1,124 @@
+"""
+Construcción de documentos HTML con backend de parser seleccionable
+Desarrollado por Sergie Code
+"""
+
+import os
+import re
+from typing import Iterable, List, Optional
+
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+
+# Backends soportados, del más rápido al más tolerante con HTML roto
+PARSER_BACKENDS = ('lxml', 'html.parser', 'html5lib')
+
+# Backend por defecto (se puede cambiar con la variable de entorno SCRAPER_HTML_PARSER)
+DEFAULT_PARSER = os.environ.get('SCRAPER_HTML_PARSER', 'lxml')
+
+# Backend para reintentar cuando el documento parece haberse perdido al parsear
+FALLBACK_PARSERS = ('html5lib', 'html.parser')
+
+_available = {}
+
+def is_available(parser: str) -> bool:
+    """Indica si el backend está instalado"""
+    if parser not in _available:
+        try:
+            BeautifulSoup('', parser)
+            _available[parser] = True
+        except FeatureNotFound:
+            _available[parser] = False
+    return _available[parser]
+
+def available_parsers() -> List[str]:
+    """Backends instalados, en orden de preferencia"""
+    return [parser for parser in PARSER_BACKENDS if is_available(parser)]
+
+def _looks_truncated(soup: BeautifulSoup, content) -> bool:
+    """El parser no produjo ninguna etiqueta aunque el contenido tiene marcado"""
+    if soup.find() is not None or not content:
+        return False
+    return (b'<' if isinstance(content, bytes) else '<') in content
+
+class SubtreeStrainer(SoupStrainer):
+    """Filtro de parseo que solo construye los subárboles que interesan a un scraper.
+
+    Un elemento de primer nivel se conserva (con todo su contenido) si su
+    etiqueta está en ``tags``, si tiene alguna clase de ``classes`` o si su
+    atributo class contiene ``class_pattern`` (solo en las etiquetas de
+    ``pattern_tags``, o en todas si no se indican). Cabeceras, scripts,
+    SVG y demás se descartan sin crear nodos.
+
+    Debe cubrir todo lo que buscan los selectores del scraper: dentro de los
+    subárboles conservados las búsquedas dan el mismo resultado que sobre el
+    documento completo.
+    """
+
+    def __init__(self, tags: Iterable[str] = (), classes: Iterable[str] = (),
+                 class_pattern: Optional[str] = None, pattern_tags: Optional[Iterable[str]] = None):
+        super().__init__()
+        self.tags = frozenset(tags)
+        self.classes = frozenset(classes)
+        self.class_pattern = re.compile(class_pattern) if class_pattern else None
+        self.pattern_tags = frozenset(pattern_tags) if pattern_tags is not None else None
+
+    def wants(self, name: str, class_value) -> bool:
+        """Indica si un elemento con esta etiqueta y clases debe conservarse"""
+        if name in self.tags:
+            return True
+        if not class_value:
+            return False
+        if not isinstance(class_value, str):
+            class_value = ' '.join(class_value)
+        if self.classes and not self.classes.isdisjoint(class_value.split()):
+            return True
+        return (self.class_pattern is not None
+                and (self.pattern_tags is None or name in self.pattern_tags)
+                and self.class_pattern.search(class_value) is not None)
+
+    # beautifulsoup4 >= 4.13
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        return self.wants(name, (attrs or {}).get('class'))
+
+    def allow_string_creation(self, string) -> bool:
+        return False
+
+    # beautifulsoup4 < 4.13
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        if hasattr(markup_name, 'name'):
+            name, class_value = markup_name.name, markup_name.get('class')
+        else:
+            name, class_value = markup_name, dict(markup_attrs or {}).get('class')
+        return markup_name if self.wants(name, class_value) else None
+
+def make_soup(content, parser: Optional[str] = None, fallback: bool = True, **kwargs) -> BeautifulSoup:
+    """Parsea HTML con el backend indicado (lxml por defecto)
+
+    Si el backend no está instalado se usa el siguiente disponible. Con
+    ``fallback`` activado, si el resultado sale vacío a pesar de haber
+    marcado (HTML muy roto, bytes nulos...) se reintenta con html5lib o,
+    si no está instalado, con html.parser. Los argumentos extra (por
+    ejemplo ``parse_only`` con un SubtreeStrainer) se pasan a BeautifulSoup.
+    
+    html5lib no admite ``parse_only``: con ese backend se construye el
+    documento completo.
+    """
+    parser = parser or DEFAULT_PARSER
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(f"Parser desconocido: {parser}")
+
+    if not is_available(parser):
+        parser = available_parsers()[0]
+
+    if parser == 'html5lib':
+        kwargs.pop('parse_only', None)
+
+    soup = BeautifulSoup(content, parser, **kwargs)
+
+    # Con parse_only un resultado vacío solo significa que no hubo coincidencias
+    if fallback and 'parse_only' not in kwargs and _looks_truncated(soup, content):
+        for alternative in FALLBACK_PARSERS:
+            if alternative != parser and is_available(alternative):
+                return BeautifulSoup(content, alternative, **kwargs)
+
+    return soup
@@ -0,0 +1,264 @@
+"""
+Pipeline en streaming desde los scrapers hasta la base de datos
+Desarrollado por Sergie Code
+"""
+
+import bisect
+import hashlib
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import dates
+from .utils import KEY_FIELDS, VALUE_FIELDS, DEFAULT_BATCH_SIZE, validate_event
+
+# Eventos en vuelo entre los scrapers y el escritor; con la cola llena los scrapers esperan
+DEFAULT_QUEUE_SIZE = 1000
+
+# Cada cuánto comprueba un scraper bloqueado si el consumidor se ha ido
+PUT_POLL_INTERVAL = 0.1
+
+# Próximos eventos que se muestran en el resumen
+UPCOMING_LIMIT = 5
+
+class SourceEnd:
+    """Marca el final de una fuente dentro del flujo, con su error si lo hubo"""
+
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+class ChannelClosed(Exception):
+    """El consumidor ya no acepta eventos (por ejemplo, se agotó el plazo)"""
+
+def source_events(scraper) -> Iterator[Dict[str, Any]]:
+    """Eventos de un scraper a medida que los genera (o su lista, si no sabe generarlos)"""
+    iter_events = getattr(scraper, 'iter_events', None)
+    return iter_events() if iter_events is not None else iter(scraper.scrape_events())
+
+class EventChannel:
+    """Cola acotada entre los scrapers (productores) y el escritor (consumidor).
+
+    ``put`` bloquea mientras la cola está llena, así que un scraper rápido
+    espera al escritor en vez de acumular eventos en memoria. Si el
+    consumidor deja de leer, ``close`` libera a los productores con
+    ChannelClosed.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_QUEUE_SIZE):
+        if maxsize < 1:
+            raise ValueError("maxsize debe ser >= 1")
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._closed = threading.Event()
+
+    def put(self, name: str, event):
+        """Encola un evento (o un SourceEnd) de la fuente ``name``"""
+        while not self._closed.is_set():
+            try:
+                self._queue.put((name, event), timeout=PUT_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+        raise ChannelClosed(f"Canal cerrado, se descartan los eventos de {name}")
+
+    def produce(self, name: str, events: Iterable[Dict[str, Any]]):
+        """Vuelca los eventos de una fuente y marca su final (se ejecuta en el hilo del scraper)"""
+        try:
+            for event in events:
+                self.put(name, event)
+            end = SourceEnd()
+        except ChannelClosed:
+            return
+        except Exception as e:
+            end = SourceEnd(e)
+        finally:
+            # El generador se cierra en este hilo (su presupuesto de tiempo es de este contexto)
+            close = getattr(events, 'close', None)
+            if close is not None:
+                close()
+
+        try:
+            self.put(name, end)
+        except ChannelClosed:
+            pass
+
+    def close(self):
+        """Deja de aceptar eventos"""
+        self._closed.set()
+
+    @property
+    def closed(self) -> bool:
+        """Indica si el consumidor ya no acepta eventos"""
+        return self._closed.is_set()
+
+    def items(self, sources: Iterable[str], timeout: Optional[float] = None) -> Iterator[Tuple[str, Any]]:
+        """Genera (fuente, evento) hasta que terminan todas las fuentes o pasan ``timeout`` segundos
+
+        Las fuentes que no terminan a tiempo se cierran con un TimeoutError.
+        """
+        pending = dict.fromkeys(sources)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            while pending:
+                wait = None if deadline is None else deadline - time.monotonic()
+                if wait is not None and wait <= 0:
+                    break
+                try:
+                    name, event = self._queue.get(timeout=wait)
+                except queue.Empty:
+                    break
+                if isinstance(event, SourceEnd):
+                    pending.pop(name, None)
+                yield name, event
+
+            for name in pending:
+                yield name, SourceEnd(TimeoutError("Plazo de la ejecución agotado"))
+        finally:
+            self.close()
+
+def validate(items: Iterable[Tuple[str, Any]]) -> Iterator[Tuple[str, Any]]:
+    """Descarta los eventos sin nombre, fecha u organizador"""
+    for name, event in items:
+        if isinstance(event, SourceEnd) or validate_event(event):
+            yield name, event
+
+def normalize(items: Iterable[Tuple[str, Any]]) -> Iterator[Tuple[str, Any]]:
+    """Recorta los espacios de los textos y pasa la fecha a YYYY-MM-DD si se reconoce"""
+    for name, event in items:
+        if not isinstance(event, SourceEnd):
+            # Copia: los eventos pueden venir de la caché de huellas
+            event = {field: value.strip() if isinstance(value, str) else value
+                     for field, value in event.items()}
+            event['fecha'] = dates.parse_date(event['fecha'])
+        yield name, event
+
+def _digest(event: Dict[str, Any], fields) -> bytes:
+    """Resumen de tamaño fijo (16 bytes) de los campos indicados"""
+    values = '\x1f'.join(str(event.get(field, '')) for field in fields)
+    return hashlib.blake2b(values.encode('utf-8'), digest_size=16).digest()
+
+def dedupe(items: Iterable[Tuple[str, Any]]) -> Iterator[Tuple[str, Any]]:
+    """Descarta los eventos que una fuente repite con la misma clave y los mismos datos
+
+    Si una clave vuelve con otros datos se deja pasar y, como siempre, la
+    última versión es la que queda en la base de datos. Cada fuente lleva
+    un resumen de 16 bytes por clave y otro de sus datos, y se olvidan al
+    terminar la fuente: las repeticiones entre fuentes las resuelve el
+    UPSERT, así que la memoria depende de las fuentes en curso y no del
+    total de la ejecución.
+    """
+    seen: Dict[str, Dict[bytes, bytes]] = {}
+    for name, event in items:
+        if isinstance(event, SourceEnd):
+            seen.pop(name, None)
+        else:
+            source_seen = seen.setdefault(name, {})
+            key = _digest(event, KEY_FIELDS)
+            digest = _digest(event, VALUE_FIELDS)
+            if source_seen.get(key) == digest:
+                continue
+            source_seen[key] = digest
+        yield name, event
+
+def batched(items: Iterable[Tuple[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE):
+    """Agrupa los eventos en lotes de (fuente, evento)
+
+    Genera pares (lote, final) donde ``final`` es None o el (fuente, SourceEnd)
+    que cerró el lote: al terminar una fuente se escribe lo que haya sin
+    esperar a llenar el lote.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size debe ser >= 1")
+
+    batch = []
+    for name, event in items:
+        if isinstance(event, SourceEnd):
+            yield batch, (name, event)
+            batch = []
+            continue
+        batch.append((name, event))
+        if len(batch) >= batch_size:
+            yield batch, None
+            batch = []
+
+    if batch:
+        yield batch, None
+
+class RunStats:
+    """Recuentos del resumen final, calculados a medida que se escriben los eventos"""
+
+    def __init__(self, upcoming_limit: int = UPCOMING_LIMIT):
+        self.total = 0
+        self.organizers: Dict[str, int] = {}
+        self.countries: Dict[str, int] = {}
+        self.upcoming_limit = upcoming_limit
+        self._upcoming: List[Tuple[str, int, Dict[str, Any]]] = []
+
+    def add(self, event: Dict[str, Any]):
+        """Cuenta un evento guardado"""
+        self.total += 1
+        org = event.get('organizador', 'Unknown')
+        country = event.get('pais', 'Unknown')
+        self.organizers[org] = self.organizers.get(org, 0) + 1
+        self.countries[country] = self.countries.get(country, 0) + 1
+
+        # Solo se guardan los más próximos; a igual fecha, el que llegó antes
+        fecha = event.get('fecha')
+        if fecha and (len(self._upcoming) < self.upcoming_limit or fecha < self._upcoming[-1][0]):
+            bisect.insort(self._upcoming, (fecha, self.total, event))
+            del self._upcoming[self.upcoming_limit:]
+
+    @property
+    def upcoming(self) -> List[Dict[str, Any]]:
+        """Próximos eventos ordenados por fecha"""
+        return [event for _, _, event in self._upcoming]
+
+class EventPipeline:
+    """Lleva un flujo de (fuente, evento) a la base de datos y al CSV.
+
+    Etapas: validate → normalize → dedupe → batched. Cada lote se escribe
+    en una transacción en cuanto se llena o termina una fuente, así que en
+    memoria solo hay un lote (más los resúmenes de ``dedupe`` de las fuentes
+    en curso) y las primeras filas llegan a la base de datos
+    mientras otras fuentes siguen descargando. ``on_source_end(fuente,
+    eventos guardados, error)`` se llama al terminar cada fuente.
+    """
+
+    def __init__(self, db, csv_writer=None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 on_source_end: Optional[Callable] = None):
+        self.db = db
+        self.csv_writer = csv_writer
+        self.batch_size = batch_size
+        self.on_source_end = on_source_end
+        self.stats = RunStats()
+        self.saved: Dict[str, int] = {}
+
+    def stages(self, items: Iterable[Tuple[str, Any]]):
+        """Encadena las etapas sobre el flujo de entrada"""
+        return batched(dedupe(normalize(validate(items))), self.batch_size)
+
+    def run(self, items: Iterable[Tuple[str, Any]]) -> RunStats:
+        """Consume el flujo completo desde el hilo que llama"""
+        for batch, end in self.stages(items):
+            if batch:
+                self._write(batch)
+            if end is not None and self.on_source_end is not None:
+                name, marker = end
+                self.on_source_end(name, self.saved.get(name, 0), marker.error)
+        return self.stats
+
+    def _write(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        """Guarda un lote en la base de datos y en el CSV"""
+        events = [event for _, event in batch]
+        try:
+            self.db.insert_events(events)
+        except Exception as e:
+            sources = ', '.join(dict.fromkeys(name for name, _ in batch))
+            print(f"❌ Error guardando {len(events)} eventos de {sources}: {e}")
+            return
+
+        if self.csv_writer is not None:
+            self.csv_writer.write(events)
+        for name, event in batch:
+            self.saved[name] = self.saved.get(name, 0) + 1
+            self.stats.add(event)
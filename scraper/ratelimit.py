@@ -0,0 +1,124 @@
+"""
+Limitador de peticiones por dominio basado en token bucket
+Desarrollado por Sergie Code
+"""
+
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+# Límites por dominio: (peticiones por segundo, ráfaga máxima)
+DOMAIN_LIMITS = {
+    'redbull.com': (0.5, 2),
+    'fms.tv': (0.5, 2),
+    'godlevel.es': (0.5, 2),
+    'infofreestyle.com': (0.5, 3),
+    'ticketmaster.es': (0.33, 1),
+    'passline.com': (0.33, 1),
+}
+
+class TokenBucket:
+    """Token bucket: permite ráfagas de ``burst`` peticiones y repone ``rate`` por segundo"""
+
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate debe ser > 0 y burst >= 1")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reserva un token y devuelve los segundos que hay que esperar para usarlo.
+
+        Las reservas pueden dejar el saldo en negativo: así las peticiones que
+        llegan a la vez quedan encoladas en orden sin mantener el lock mientras
+        esperan.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+class DomainRateLimiter:
+    """Limitador compartido con un token bucket independiente por host.
+
+    Las peticiones a hosts distintos no se bloquean entre sí; cada sitio
+    mantiene su propio ritmo. Guarda métricas de espera por host.
+    """
+
+    DEFAULT_RATE = 0.5
+    DEFAULT_BURST = 2
+
+    def __init__(self, default_rate: float = DEFAULT_RATE, default_burst: int = DEFAULT_BURST,
+                 domains: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self._limits = dict(domains or {})
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._metrics: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_for(url: str) -> str:
+        """Normaliza el host de una URL (sin 'www.')"""
+        host = (urlparse(url).hostname or url).lower()
+        return host[4:] if host.startswith('www.') else host
+
+    def configure(self, host: str, rate: float, burst: int):
+        """Configura (o cambia) el límite de un host"""
+        with self._lock:
+            self._limits[host] = (rate, burst)
+            self._buckets.pop(host, None)
+
+    def _bucket(self, host: str) -> TokenBucket:
+        """Devuelve el bucket del host, creándolo si no existe"""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self._limits.get(host, (self.default_rate, self.default_burst))
+                bucket = self._buckets[host] = TokenBucket(rate, burst)
+            return bucket
+
+    def reserve(self, url: str) -> float:
+        """Reserva un turno para la URL y devuelve la espera necesaria (sin dormir)"""
+        host = self.host_for(url)
+        wait = self._bucket(host).reserve()
+
+        with self._lock:
+            metrics = self._metrics.setdefault(host, {
+                'requests': 0, 'waits': 0, 'total_wait': 0.0, 'max_wait': 0.0
+            })
+            metrics['requests'] += 1
+            if wait > 0:
+                metrics['waits'] += 1
+                metrics['total_wait'] += wait
+                metrics['max_wait'] = max(metrics['max_wait'], wait)
+
+        return wait
+
+    def acquire(self, url: str) -> float:
+        """Espera hasta que la URL pueda pedirse; devuelve los segundos esperados"""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Métricas de espera por host"""
+        with self._lock:
+            return {host: dict(values) for host, values in self._metrics.items()}
+
+    def reset_metrics(self):
+        """Reinicia las métricas de espera"""
+        with self._lock:
+            self._metrics.clear()
+
+# Limitador compartido por todas las sesiones de los scrapers
+rate_limiter = DomainRateLimiter(domains=DOMAIN_LIMITS)
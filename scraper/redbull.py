@@ -3,36 +3,52 @@ Scraper para eventos de Red Bull Batalla
 Desarrollado por Sergie Code
 """
 
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any
+from .parsing import make_soup, SubtreeStrainer
+from typing import List, Dict, Any, Iterator
 import re
 from .utils import ScrapingUtils, log_scraping_result, validate_event
+from .fetch import fetcher
+from .fingerprint import fingerprint_store
+from .extraction import find_containers, FieldSpec, FieldSpecs, min_length
+from .gazetteer import gazetteer
+
+# Subárboles que se construyen al parsear la página de eventos (cubren event_selectors)
+EVENTS_STRAINER = SubtreeStrainer(tags=('article',), class_pattern=r'event|card|item|content',
+                                  pattern_tags=('div',))
 
 class RedBullScraper:
     """Scraper para eventos de Red Bull"""
     
+    # Campos de cada evento (selectores en orden de prioridad)
+    EVENT_FIELDS = FieldSpecs({
+        'title': FieldSpec(['h1', 'h2', 'h3', 'h4', 'a', '.title', '.headline'], validator=min_length(5)),
+        'date': FieldSpec(['time', '.date', '.fecha', '[datetime]', '[data-date]'], attribute='datetime'),
+        'location': FieldSpec(['.location', '.venue', '.city', '.lugar', '.ubicacion']),
+        'link': FieldSpec(['a'], attribute='href', text=False),
+        'description': FieldSpec(['.description', '.desc', '.content', 'p'], validator=min_length(20))
+    })
+    
     def __init__(self):
         self.base_url = "https://www.redbull.com"
         self.events_url = "https://www.redbull.com/int-es/collections/batalla-eventos"
         self.instagram_url = "https://www.instagram.com/redbullbatalla"
         self.twitter_url = "https://x.com/redbullbatalla"
-        self.session = requests.Session()
-        self.session.headers.update(ScrapingUtils.get_headers())
+        self.fetcher = fetcher
+        self.session = fetcher.session
+        self.fingerprints = fingerprint_store
+    
+    def iter_events(self) -> Iterator[Dict[str, Any]]:
+        """Genera los eventos de Red Bull a medida que se parsean (sin validar)"""
+        print("🔍 Scrapeando Red Bull Batalla...")
+        
+        # Buscar eventos específicos de freestyle
+        yield from self._search_freestyle_events()
     
     def scrape_events(self) -> List[Dict[str, Any]]:
         """Extrae eventos de Red Bull"""
-        events = []
-        
         try:
-            print("🔍 Scrapeando Red Bull Batalla...")
-            
-            # Buscar eventos específicos de freestyle
-            freestyle_events = self._search_freestyle_events()
-            events.extend(freestyle_events)
-            
             # Filtrar y validar eventos
-            events = [event for event in events if validate_event(event)]
+            events = [event for event in self.iter_events() if validate_event(event)]
             
             log_scraping_result("Red Bull", len(events))
             return events
@@ -50,28 +66,13 @@ class RedBullScraper:
             print(f"🔍 Accediendo a: {self.events_url}")
             
             # Scrapear la página principal de Red Bull Batalla eventos
-            ScrapingUtils.random_delay()
             response = self.session.get(self.events_url, timeout=15)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Buscar elementos de eventos en la página
-                event_selectors = [
-                    'article',
-                    'div[class*="event"]',
-                    'div[class*="card"]',
-                    'div[class*="item"]',
-                    'div[class*="content"]'
-                ]
-                
-                for selector in event_selectors:
-                    elements = soup.select(selector)
-                    for element in elements[:10]:  # Limitar a 10 elementos por selector
-                        event = self._parse_redbull_event(element)
-                        if event and self._is_batalla_event(event['nombre']):
-                            events.append(event)
-                            print(f"  ✅ Encontrado: {event['nombre']}")
+                events = self.fingerprints.get_or_parse(
+                    'redbull', self.events_url, response.content,
+                    lambda: self._parse_events_page(response.content)
+                )
             else:
                 print(f"  ⚠️ Error HTTP {response.status_code} al acceder a Red Bull eventos")
                 
@@ -85,6 +86,29 @@ class RedBullScraper:
             
         return events
     
+    def _parse_events_page(self, content: bytes) -> List[Dict[str, Any]]:
+        """Extrae los eventos de batalla del HTML de la página de eventos"""
+        events = []
+        soup = make_soup(content, parse_only=EVENTS_STRAINER)
+        
+        # Buscar elementos de eventos en la página
+        event_selectors = [
+            'article',
+            'div[class*="event"]',
+            'div[class*="card"]',
+            'div[class*="item"]',
+            'div[class*="content"]'
+        ]
+        
+        # Una sola pasada: cada contenedor se parsea una vez aunque coincida con varios selectores
+        for element in find_containers(soup, event_selectors, limit=10 * len(event_selectors)):
+            event = self._parse_redbull_event(element)
+            if event and self._is_batalla_event(event['nombre']):
+                events.append(event)
+                print(f"  ✅ Encontrado: {event['nombre']}")
+        
+        return events
+    
     def _search_events_by_term(self, search_term: str) -> List[Dict[str, Any]]:
         """Busca eventos por término específico"""
         events = []
@@ -97,7 +121,7 @@ class RedBullScraper:
             if response.status_code != 200:
                 return events
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = make_soup(response.content)
             
             # Buscar elementos de eventos (esto dependería de la estructura real)
             event_elements = soup.find_all(['article', 'div'], class_=re.compile(r'event|card'))
@@ -115,60 +139,21 @@ class RedBullScraper:
     def _parse_redbull_event(self, element) -> Dict[str, Any]:
         """Parsea un elemento de evento de Red Bull"""
         try:
-            # Buscar título del evento
-            title_selectors = ['h1', 'h2', 'h3', 'h4', 'a', '.title', '.headline']
-            title = None
-            
-            for selector in title_selectors:
-                title_elem = element.select_one(selector)
-                if title_elem:
-                    title = ScrapingUtils.clean_text(title_elem.get_text())
-                    if title and len(title) > 5:
-                        break
+            fields = self.EVENT_FIELDS.extract(element)
+            title = fields['title']
             
             if not title:
                 return None
             
-            # Buscar fecha del evento
-            date_selectors = ['time', '.date', '.fecha', '[datetime]', '[data-date]']
-            fecha = None
-            
-            for selector in date_selectors:
-                date_elem = element.select_one(selector)
-                if date_elem:
-                    fecha = date_elem.get('datetime') or ScrapingUtils.clean_text(date_elem.get_text())
-                    if fecha:
-                        break
-            
-            # Buscar ubicación
-            location_selectors = ['.location', '.venue', '.city', '.lugar', '.ubicacion']
-            ubicacion = None
-            
-            for selector in location_selectors:
-                location_elem = element.select_one(selector)
-                if location_elem:
-                    ubicacion = ScrapingUtils.clean_text(location_elem.get_text())
-                    if ubicacion:
-                        break
+            fecha = fields['date']
+            ubicacion = fields['location']
+            descripcion = fields['description'] or ""
             
-            # Buscar enlace
-            link_elem = element.select_one('a')
             link = ""
-            if link_elem and link_elem.get('href'):
-                href = link_elem['href']
+            href = fields['link']
+            if href:
                 link = href if href.startswith('http') else f"{self.base_url}{href}"
             
-            # Buscar descripción
-            desc_selectors = ['.description', '.desc', '.content', 'p']
-            descripcion = ""
-            
-            for selector in desc_selectors:
-                desc_elem = element.select_one(selector)
-                if desc_elem:
-                    descripcion = ScrapingUtils.clean_text(desc_elem.get_text())
-                    if descripcion and len(descripcion) > 20:
-                        break
-            
             return {
                 'nombre': title,
                 'fecha': ScrapingUtils.parse_date(fecha) if fecha else "",
@@ -245,43 +230,6 @@ class RedBullScraper:
             }
         ]
     
-    def _extract_city(self, location: str) -> str:
-        """Extrae la ciudad de una ubicación"""
-        if not location:
-            return ""
-        
-        # Buscar patrones de ciudad conocidos
-        cities = ['madrid', 'barcelona', 'valencia', 'sevilla', 'bilbao', 'ciudad de méxico', 'buenos aires', 'santiago', 'lima', 'bogotá']
-        location_lower = location.lower()
-        
-        for city in cities:
-            if city in location_lower:
-                return city.title()
-        
-        # Si no encuentra una ciudad conocida, devolver la primera palabra
-        return location.split(',')[0].strip()
-    
-    def _extract_country(self, location: str) -> str:
-        """Extrae el país de una ubicación"""
-        if not location:
-            return "España"
-        
-        countries = {
-            'spain': 'España', 'españa': 'España', 'madrid': 'España', 'barcelona': 'España',
-            'mexico': 'México', 'méxico': 'México', 'cdmx': 'México',
-            'argentina': 'Argentina', 'buenos aires': 'Argentina',
-            'chile': 'Chile', 'santiago': 'Chile',
-            'peru': 'Perú', 'perú': 'Perú', 'lima': 'Perú',
-            'colombia': 'Colombia', 'bogotá': 'Colombia'
-        }
-        
-        location_lower = location.lower()
-        for key, country in countries.items():
-            if key in location_lower:
-                return country
-        
-        return "España"  # Default
-    
     def _search_events_by_term(self, search_term: str) -> List[Dict[str, Any]]:
         """Eventos conocidos de Red Bull Batalla (datos de ejemplo actualizados)"""
         return [
@@ -336,39 +284,15 @@ class RedBullScraper:
         if not location:
             return ""
         
-        # Ciudades comunes en eventos de freestyle
-        cities = ['Madrid', 'Barcelona', 'Valencia', 'Sevilla', 'México', 'Buenos Aires', 
-                 'Bogotá', 'Lima', 'Santiago', 'Caracas', 'Medellín', 'Guadalajara']
-        
-        for city in cities:
-            if city.lower() in location.lower():
-                return city
-        
         # Si no encuentra ciudad conocida, tomar la primera parte
-        parts = location.split(',')
-        return parts[0].strip() if parts else ""
+        return gazetteer.resolve(location)['ciudad'] or location.split(',')[0].strip()
     
     def _extract_country(self, location: str) -> str:
         """Extrae el país de una ubicación"""
         if not location:
             return ""
         
-        countries = {
-            'españa': 'España', 'spain': 'España',
-            'méxico': 'México', 'mexico': 'México',
-            'argentina': 'Argentina',
-            'colombia': 'Colombia',
-            'perú': 'Perú', 'peru': 'Perú',
-            'chile': 'Chile',
-            'venezuela': 'Venezuela'
-        }
-        
-        location_lower = location.lower()
-        for key, value in countries.items():
-            if key in location_lower:
-                return value
-        
-        return ""
+        return gazetteer.resolve(location)['pais']
 
 def main():
     """Función principal para testing"""
@@ -0,0 +1,186 @@
+"""
+Reintentos con backoff exponencial y circuit breaker por host
+Desarrollado por Sergie Code
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, Any, Optional
+
+import requests
+
+from .ratelimit import DomainRateLimiter
+
+# Respuestas que indican un fallo pasajero del servidor
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """El circuito del host está abierto: la petición no llega a enviarse"""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Circuito abierto para {host} (siguiente intento en {retry_in:.0f}s)")
+        self.host = host
+        self.retry_in = retry_in
+
+class RetryPolicy:
+    """Qué fallos se reintentan y cuánto se espera entre intentos.
+
+    Se reintentan los errores de conexión (incluido el timeout al conectar)
+    y las respuestas 429/5xx. Un timeout de lectura no se reintenta: volver
+    a pedir costaría otra vez el timeout completo. La espera crece de forma
+    exponencial con jitter completo, con un máximo de ``max_backoff``
+    segundos, y respeta la cabecera Retry-After si viene en segundos.
+    """
+
+    def __init__(self, retries: int = 2, backoff: float = 0.5, max_backoff: float = 8.0):
+        if retries < 0 or backoff < 0:
+            raise ValueError("retries y backoff deben ser >= 0")
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def is_retryable_error(self, error: Exception) -> bool:
+        """Indica si la excepción es un fallo de conexión que merece otro intento"""
+        return (isinstance(error, requests.exceptions.ConnectionError)
+                and not isinstance(error, CircuitOpenError))
+
+    def is_retryable_response(self, response: requests.Response) -> bool:
+        """Indica si el código de estado es un fallo pasajero"""
+        return response.status_code in RETRY_STATUSES
+
+    def delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Segundos de espera antes del reintento número ``attempt`` (desde 0)"""
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        if retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+class CircuitBreaker:
+    """Circuit breaker por host con el estado guardado en un fichero JSON.
+
+    Tras ``failure_threshold`` fallos seguidos contra un host el circuito se
+    abre y, durante ``cooldown`` segundos, sus peticiones fallan al instante
+    con CircuitOpenError. Pasado ese tiempo se deja pasar una petición de
+    prueba: si va bien el circuito se cierra y si falla se vuelve a abrir.
+    Como el estado persiste, la siguiente ejecución tampoco espera timeouts
+    contra un sitio caído.
+    """
+
+    def __init__(self, path: Optional[str] = "data/circuit_breakers.json",
+                 failure_threshold: int = 3, cooldown: float = 300):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold debe ser >= 1")
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._hosts = self._load()
+        self._trials = set()
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Lee el estado guardado (vacío si no existe o está dañado)"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignorando el estado del circuit breaker: {e}")
+            return {}
+
+    def _save(self):
+        """Guarda el estado (con el lock tomado)"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._hosts, f)
+        os.replace(temp_path, self.path)
+
+    def before_request(self, url: str):
+        """Lanza CircuitOpenError si el host no admite peticiones ahora mismo"""
+        host = DomainRateLimiter.host_for(url)
+        with self._lock:
+            state = self._hosts.get(host)
+            if not state or state.get('opened_at') is None:
+                return
+
+            retry_in = state['opened_at'] + self.cooldown - time.time()
+            if retry_in > 0:
+                raise CircuitOpenError(host, retry_in)
+
+            # Semiabierto: solo una petición de prueba a la vez
+            if host in self._trials:
+                raise CircuitOpenError(host, 0)
+            self._trials.add(host)
+
+    def record_success(self, url: str):
+        """El host respondió: se cierra el circuito"""
+        host = DomainRateLimiter.host_for(url)
+        with self._lock:
+            self._trials.discard(host)
+            if self._hosts.pop(host, None) is not None:
+                self._save()
+
+    def release(self, url: str):
+        """La petición terminó sin decir nada del host: libera su prueba sin contar nada"""
+        host = DomainRateLimiter.host_for(url)
+        with self._lock:
+            self._trials.discard(host)
+
+    def record_failure(self, url: str):
+        """El host falló: cuenta el fallo y abre el circuito si hace falta"""
+        host = DomainRateLimiter.host_for(url)
+        with self._lock:
+            self._trials.discard(host)
+            state = self._hosts.setdefault(host, {'failures': 0, 'opened_at': None})
+            state['failures'] += 1
+            # Un fallo de la petición de prueba vuelve a abrirlo directamente
+            if state['failures'] >= self.failure_threshold or state['opened_at'] is not None:
+                if state['opened_at'] is None:
+                    print(f"  🔌 Circuito abierto para {host} tras {state['failures']} fallos")
+                state['opened_at'] = time.time()
+            self._save()
+
+    def state(self, host: str) -> str:
+        """'closed', 'open' o 'half-open'"""
+        with self._lock:
+            state = self._hosts.get(host)
+            if not state or state.get('opened_at') is None:
+                return 'closed'
+            return 'open' if state['opened_at'] + self.cooldown > time.time() else 'half-open'
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Fallos y estado de cada host con fallos registrados"""
+        with self._lock:
+            hosts = {host: dict(state) for host, state in self._hosts.items()}
+        for host, state in hosts.items():
+            state['state'] = self.state(host)
+        return hosts
+
+    def reset(self):
+        """Cierra todos los circuitos"""
+        with self._lock:
+            self._hosts.clear()
+            self._trials.clear()
+            self._save()
+
+# Política de reintentos por defecto de las sesiones
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+_default_breaker = None
+_default_breaker_lock = threading.Lock()
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Circuit breaker compartido por todas las sesiones (se crea al primer uso)"""
+    global _default_breaker
+    with _default_breaker_lock:
+        if _default_breaker is None:
+            _default_breaker = CircuitBreaker()
+        return _default_breaker
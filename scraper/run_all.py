@@ -5,7 +5,14 @@ Desarrollado por Sergie Code
 
 import sys
 import os
+import argparse
+import asyncio
+import functools
+import queue
+import threading
+import time
 from datetime import datetime
+from typing import List, Dict, Any, Tuple, Callable, Optional, Iterator
 
 # Agregar el directorio padre al path para imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -15,84 +22,244 @@ from scraper.fms import FMSScraper
 from scraper.godlevel import GodLevelScraper
 from scraper.supremacia import SupremaciaScraper
 from scraper.tickets import TicketsScraper
-from scraper.utils import EventDatabase, CSVExporter, log_scraping_result
+from scraper.utils import EventDatabase, CSVExporter, log_scraping_result, DEFAULT_BATCH_SIZE
+from scraper.fetch import fetcher
+from scraper.budget import TimeBudget, budget_scope
+from scraper.pipeline import (EventChannel, EventPipeline, SourceEnd, source_events,
+                              DEFAULT_QUEUE_SIZE)
 
-def run_all_scrapers():
-    """Ejecuta todos los scrapers y guarda los datos"""
-    print("🚀 Iniciando scraping de eventos de freestyle...")
-    print(f"📅 Fecha y hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 60)
-    
-    all_events = []
-    
-    # Instanciar base de datos
-    db = EventDatabase()
-    
-    # Scrapers a ejecutar
-    scrapers = [
+# Modos de ejecución disponibles para los scrapers
+EXECUTION_MODES = ('sequential', 'threads', 'asyncio')
+
+# Número máximo de scrapers ejecutándose a la vez en modo concurrente
+DEFAULT_MAX_WORKERS = 5
+
+# Segundos que tiene cada fuente para descargar sus páginas
+DEFAULT_SOURCE_BUDGET = 120
+
+# Fuentes con más páginas que el resto
+SOURCE_BUDGETS = {
+    "Supremacía MC": 180,
+    "Sitios de Tickets": 180,
+}
+
+# Margen tras el plazo global para recoger lo que los scrapers ya tienen parseado
+DEADLINE_GRACE = 5
+
+def get_scrapers() -> List[Tuple[str, Any]]:
+    """Instancia los scrapers a ejecutar"""
+    return [
         ("Red Bull Batalla", RedBullScraper()),
         ("Urban Roosters (FMS)", FMSScraper()),
         ("God Level", GodLevelScraper()),
         ("Supremacía MC", SupremaciaScraper()),
         ("Sitios de Tickets", TicketsScraper())
     ]
+
+def _scrape(name: str, scraper, run_budget: Optional[TimeBudget] = None,
+            source_budget: Optional[float] = DEFAULT_SOURCE_BUDGET,
+            budgets: Optional[Dict[str, TimeBudget]] = None) -> Iterator[Dict[str, Any]]:
+    """Genera los eventos de un scraper sin tocar la base de datos
+
+    El presupuesto de la fuente empieza a contar con el primer evento pedido
+    y nunca termina después del plazo global de la ejecución (``run_budget``).
+    """
+    budget = (run_budget or TimeBudget()).child(SOURCE_BUDGETS.get(name, source_budget))
+    if budgets is not None:
+        budgets[name] = budget
     
-    # Ejecutar cada scraper
+    print(f"\n🔄 Ejecutando scraper: {name}")
+    with budget_scope(budget):
+        yield from source_events(scraper)
+
+def _wait_time(run_budget: Optional[TimeBudget]) -> Optional[float]:
+    """Cuánto se espera como mucho a los scrapers que siguen en marcha"""
+    remaining = run_budget.remaining() if run_budget is not None else None
+    return None if remaining is None else remaining + DEADLINE_GRACE
+
+def _stream_sequential(scrapers, scrape: Callable = _scrape):
+    """Ejecuta los scrapers uno detrás de otro, evento a evento"""
     for name, scraper in scrapers:
         try:
-            print(f"\n🔄 Ejecutando scraper: {name}")
-            events = scraper.scrape_events()
-            
-            if events:
-                all_events.extend(events)
-                # Guardar en base de datos inmediatamente
-                db.insert_events(events)
-                print(f"✅ {name}: {len(events)} eventos procesados")
-            else:
-                print(f"⚠️ {name}: No se encontraron eventos")
-                
+            for event in scrape(name, scraper):
+                yield name, event
         except Exception as e:
-            print(f"❌ Error en scraper {name}: {e}")
-            log_scraping_result(name, 0, False)
+            yield name, SourceEnd(e)
+        else:
+            yield name, SourceEnd()
+
+def _start_workers(channel: EventChannel, scrapers, max_workers: int, scrape: Callable = _scrape):
+    """Reparte las fuentes entre como mucho ``max_workers`` hilos daemon
+
+    Los hilos de un ThreadPoolExecutor se esperan al salir del intérprete,
+    así que un scraper colgado alargaría el proceso más allá del plazo; uno
+    daemon se abandona. Con el canal cerrado no empieza ninguna fuente más.
+    """
+    pending = queue.SimpleQueue()
+    for name, scraper in scrapers:
+        pending.put((name, scraper))
+
+    def worker():
+        while not channel.closed:
+            try:
+                name, scraper = pending.get_nowait()
+            except queue.Empty:
+                return
+            channel.produce(name, scrape(name, scraper))
+
+    for i in range(min(max_workers, len(scrapers))):
+        threading.Thread(target=worker, name=f'scraper-{i}', daemon=True).start()
+
+async def _run_in_daemon_thread(func: Callable, *args):
+    """Como ``loop.run_in_executor``, pero en un hilo daemon que no retiene el proceso al salir"""
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+
+    def target():
+        try:
+            func(*args)
+        finally:
+            loop.call_soon_threadsafe(done.set_result, None)
+
+    threading.Thread(target=target, daemon=True).start()
+    await done
+
+def _stream_threads(scrapers, max_workers: int, scrape: Callable = _scrape,
+                    run_budget: Optional[TimeBudget] = None, queue_size: int = DEFAULT_QUEUE_SIZE):
+    """Ejecuta los scrapers en un pool de hilos acotado.
+
+    Cada hilo mete sus eventos en un canal acotado a medida que los genera
+    y el hilo que llama los consume, de modo que la escritura en la base de
+    datos la hace un único hilo. Pasado el plazo global (más un margen) se
+    deja de esperar a los que sigan en marcha, y como sus hilos son daemon
+    tampoco retienen el proceso.
+    """
+    channel = EventChannel(queue_size)
+    _start_workers(channel, scrapers, max_workers, scrape)
+    yield from channel.items([name for name, _ in scrapers], timeout=_wait_time(run_budget))
+
+def _stream_asyncio(scrapers, max_workers: int, scrape: Callable = _scrape,
+                    run_budget: Optional[TimeBudget] = None, queue_size: int = DEFAULT_QUEUE_SIZE):
+    """Ejecuta los scrapers desde un event loop de asyncio.
+
+    El loop corre en un hilo aparte y delega los scrapers (síncronos) a
+    hilos daemon, como mucho ``max_workers`` a la vez; sus eventos llegan
+    por el mismo canal acotado que en el modo threads y se consumen desde
+    el hilo que llama.
+    """
+    channel = EventChannel(queue_size)
+
+    async def run(slots: asyncio.Semaphore, name: str, scraper):
+        async with slots:
+            if not channel.closed:
+                await _run_in_daemon_thread(channel.produce, name, scrape(name, scraper))
+
+    async def main():
+        slots = asyncio.Semaphore(max_workers)
+        await asyncio.gather(*(run(slots, name, scraper) for name, scraper in scrapers),
+                             return_exceptions=True)
+
+    threading.Thread(target=asyncio.run, args=(main(),), name='scrapers-loop', daemon=True).start()
+    yield from channel.items([name for name, _ in scrapers], timeout=_wait_time(run_budget))
+
+def run_all_scrapers(mode: str = 'sequential', max_workers: int = DEFAULT_MAX_WORKERS,
+                     deadline: Optional[float] = None,
+                     source_budget: Optional[float] = DEFAULT_SOURCE_BUDGET,
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Any]:
+    """Ejecuta todos los scrapers y guarda los datos a medida que llegan
+
+    Args:
+        mode: 'sequential', 'threads' o 'asyncio'
+        max_workers: scrapers simultáneos como máximo en los modos concurrentes
+        deadline: segundos que puede durar toda la ejecución (None = sin plazo)
+        source_budget: segundos por fuente para las que no están en SOURCE_BUDGETS
+        batch_size: eventos por transacción (y como mucho en memoria a la espera de escribirse)
+
+    Returns:
+        Número de eventos y fuentes con resultado parcial o con error
+    """
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"Modo de ejecución desconocido: {mode}")
+    
+    print("🚀 Iniciando scraping de eventos de freestyle...")
+    print(f"📅 Fecha y hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"⚙️ Modo: {mode}" + (f" (máx. {max_workers} en paralelo)" if mode != 'sequential' else ""))
+    if deadline is not None:
+        print(f"⏱️ Plazo de la ejecución: {deadline:g}s")
+    print("=" * 60)
+    
+    start = time.monotonic()
+    run_budget = TimeBudget(deadline)
+    budgets: Dict[str, TimeBudget] = {}
+    scrape = functools.partial(_scrape, run_budget=run_budget, source_budget=source_budget,
+                               budgets=budgets)
+    
+    partial_sources = []
+    failed_sources = []
+    
+    # Instanciar base de datos y el CSV, que se escriben lote a lote
+    db = EventDatabase()
+    csv_writer = CSVExporter.open_stream()
+    
+    def on_source_end(name, saved, error):
+        """Informe de cada fuente en cuanto termina"""
+        if error is not None:
+            print(f"❌ Error en scraper {name}: {error}")
+            log_scraping_result(name, saved, False)
+            failed_sources.append(name)
+            return
+        
+        budget = budgets.get(name)
+        if budget is not None and budget.exhausted:
+            print(f"⏱️ {name}: resultado parcial, se agotó su tiempo")
+            partial_sources.append(name)
+        
+        if saved:
+            print(f"✅ {name}: {saved} eventos procesados")
+        else:
+            print(f"⚠️ {name}: No se encontraron eventos")
+    
+    # Ejecutar los scrapers en el modo elegido; el pipeline escribe desde este hilo
+    scrapers = get_scrapers()
+    if mode == 'threads':
+        items = _stream_threads(scrapers, max_workers, scrape, run_budget)
+    elif mode == 'asyncio':
+        items = _stream_asyncio(scrapers, max_workers, scrape, run_budget)
+    else:
+        items = _stream_sequential(scrapers, scrape)
+    
+    pipeline = EventPipeline(db, csv_writer, batch_size=batch_size, on_source_end=on_source_end)
+    stats = pipeline.run(items)
+    
+    # Volcar el WAL sin esperar a los lectores de la aplicación web
+    db.checkpoint()
+    db.close()
+    fetcher.close()
     
     # Resumen final
     print("\n" + "=" * 60)
     print("📊 RESUMEN FINAL")
     print("=" * 60)
     
-    if all_events:
-        # Exportar a CSV
-        CSVExporter.export_events(all_events)
-        
-        # Estadísticas por organizador
-        organizers = {}
-        countries = {}
+    if stats.total:
+        # Cerrar el CSV (sustituye al de la ejecución anterior)
+        csv_writer.close()
         
-        for event in all_events:
-            org = event.get('organizador', 'Unknown')
-            country = event.get('pais', 'Unknown')
-            
-            organizers[org] = organizers.get(org, 0) + 1
-            countries[country] = countries.get(country, 0) + 1
-        
-        print(f"📈 Total de eventos encontrados: {len(all_events)}")
+        print(f"📈 Total de eventos encontrados: {stats.total}")
         print(f"🗃️ Eventos guardados en: data/eventos.db")
         print(f"📄 Eventos exportados a: data/eventos.csv")
         
         print("\n📊 Por organizador:")
-        for org, count in sorted(organizers.items(), key=lambda x: x[1], reverse=True):
+        for org, count in sorted(stats.organizers.items(), key=lambda x: x[1], reverse=True):
             print(f"   • {org}: {count} eventos")
         
         print("\n🌍 Por país:")
-        for country, count in sorted(countries.items(), key=lambda x: x[1], reverse=True):
+        for country, count in sorted(stats.countries.items(), key=lambda x: x[1], reverse=True):
             print(f"   • {country}: {count} eventos")
         
         # Próximos eventos (ordenados por fecha)
         print("\n📅 Próximos eventos:")
-        sorted_events = sorted([e for e in all_events if e.get('fecha')], 
-                             key=lambda x: x['fecha'])
-        
-        for event in sorted_events[:5]:  # Mostrar solo los próximos 5
+        for event in stats.upcoming:
             fecha = event.get('fecha', 'N/A')
             nombre = event.get('nombre', 'N/A')
             pais = event.get('pais', 'N/A')
@@ -102,34 +269,66 @@ def run_all_scrapers():
         print("⚠️ No se encontraron eventos en ninguna fuente")
         print("💡 Verifica la conexión a internet y los sitios web")
     
-    print("\n✨ Scraping completado!")
+    if partial_sources:
+        print(f"\n⏱️ Resultados parciales (tiempo agotado): {', '.join(partial_sources)}")
+    
+    print(f"\n✨ Scraping completado en {time.monotonic() - start:.1f}s!")
     print("🌐 Puedes iniciar la aplicación web con: python webapp/app.py")
+    
+    return {
+        'total_eventos': stats.total,
+        'parciales': partial_sources,
+        'errores': failed_sources
+    }
 
 def show_database_stats():
     """Muestra estadísticas de la base de datos"""
     try:
         db = EventDatabase()
-        events = db.get_all_events()
+        stats = db.get_stats()
         
         print(f"📊 Estadísticas de la base de datos:")
-        print(f"   Total de eventos: {len(events)}")
+        print(f"   Total de eventos: {stats['total_eventos']}")
         
-        if events:
-            # Agrupar por organizador
-            organizers = {}
-            for event in events:
-                org = event.get('organizador', 'Unknown')
-                organizers[org] = organizers.get(org, 0) + 1
-            
+        if stats['total_eventos']:
             print("\n   Por organizador:")
-            for org, count in organizers.items():
+            for org, count in stats['por_organizador'].items():
                 print(f"     • {org}: {count}")
     
     except Exception as e:
         print(f"❌ Error accediendo a la base de datos: {e}")
 
+def parse_args(argv=None):
+    """Parsea los argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Ejecuta los scrapers de eventos de freestyle")
+    parser.add_argument('--stats', action='store_true',
+                        help="Muestra estadísticas de la base de datos y sale")
+    parser.add_argument('--mode', choices=EXECUTION_MODES, default='sequential',
+                        help="Modo de ejecución de los scrapers")
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Scrapers simultáneos como máximo (modos threads y asyncio)")
+    parser.add_argument('--deadline', type=float, default=None,
+                        help="Segundos que puede durar la ejecución completa")
+    parser.add_argument('--source-budget', type=float, default=DEFAULT_SOURCE_BUDGET,
+                        help="Segundos por fuente para descargar sus páginas")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Eventos por transacción al guardar")
+    args = parser.parse_args(argv)
+    if args.max_workers < 1:
+        parser.error("--max-workers debe ser al menos 1")
+    if args.deadline is not None and args.deadline <= 0:
+        parser.error("--deadline debe ser mayor que 0")
+    if args.source_budget <= 0:
+        parser.error("--source-budget debe ser mayor que 0")
+    if args.batch_size < 1:
+        parser.error("--batch-size debe ser al menos 1")
+    return args
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "--stats":
+    args = parse_args()
+    if args.stats:
         show_database_stats()
     else:
-        run_all_scrapers()
+        run_all_scrapers(mode=args.mode, max_workers=args.max_workers,
+                         deadline=args.deadline, source_budget=args.source_budget,
+                         batch_size=args.batch_size)
@@ -0,0 +1,166 @@
+"""
+Sesión HTTP común para todos los scrapers
+Desarrollado por Sergie Code
+"""
+
+import threading
+import time
+import requests
+from typing import Dict, Optional
+from .httpcache import HTTPCache, get_http_cache
+from .ratelimit import DomainRateLimiter, rate_limiter
+from .resilience import CircuitBreaker, RetryPolicy, DEFAULT_RETRY_POLICY, get_circuit_breaker
+from .budget import BudgetExceededError, current_budget
+from .utils import ScrapingUtils
+
+# Peticiones simultáneas como máximo contra un mismo host
+DEFAULT_PER_HOST_LIMIT = 4
+
+class ScraperSession(requests.Session):
+    """Sesión de requests con cabeceras comunes, caché HTTP y límite por dominio
+
+    Las peticiones GET pasan por la caché: una entrada fresca se devuelve sin
+    tocar la red y una caducada se revalida con una petición condicional
+    (un 304 devuelve el cuerpo guardado). Solo las peticiones que salen a la
+    red consumen turno del limitador, pasan por el circuit breaker del host
+    y se reintentan según la política de reintentos. Cada host admite como
+    mucho ``per_host_limit`` peticiones en vuelo, las haga un scraper
+    directamente o el AsyncFetcher desde su pool de hilos.
+    """
+
+    def __init__(self, limiter: Optional[DomainRateLimiter] = None,
+                 cache: Optional[HTTPCache] = None, use_cache: bool = True,
+                 breaker: Optional[CircuitBreaker] = None, retry: Optional[RetryPolicy] = None,
+                 per_host_limit: int = DEFAULT_PER_HOST_LIMIT):
+        super().__init__()
+        if per_host_limit < 1:
+            raise ValueError("per_host_limit debe ser >= 1")
+        self.headers.update(ScrapingUtils.get_headers())
+        self.limiter = limiter if limiter is not None else rate_limiter
+        self.use_cache = use_cache
+        self._cache = cache
+        self.breaker = breaker if breaker is not None else get_circuit_breaker()
+        self.retry = retry if retry is not None else DEFAULT_RETRY_POLICY
+        self.per_host_limit = per_host_limit
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._slots_lock = threading.Lock()
+
+    @property
+    def cache(self) -> Optional[HTTPCache]:
+        """Caché de la sesión (la compartida, creada al primer uso, si no se indicó otra)"""
+        if self._cache is None and self.use_cache:
+            self._cache = get_http_cache()
+        return self._cache if self.use_cache else None
+
+    @cache.setter
+    def cache(self, cache: Optional[HTTPCache]):
+        self._cache = cache
+        self.use_cache = cache is not None
+
+    def _slot(self, url: str) -> threading.BoundedSemaphore:
+        """Semáforo que limita las peticiones en vuelo al host de la URL"""
+        host = DomainRateLimiter.host_for(url)
+        with self._slots_lock:
+            slot = self._slots.get(host)
+            if slot is None:
+                slot = self._slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return slot
+
+    def request(self, method, url, *args, **kwargs):
+        """Envía la petición usando la caché y esperando el turno del host"""
+        cache = self.cache if method.upper() == 'GET' else None
+        entry = None
+
+        if cache is not None:
+            full_url = requests.Request('GET', url, params=kwargs.get('params')).prepare().url
+            request_headers = dict(self.headers)
+            request_headers.update(kwargs.get('headers') or {})
+            key = cache.key_for(full_url, request_headers)
+            entry = cache.get(key)
+
+            if entry is not None and cache.is_fresh(entry):
+                cache.hits += 1
+                return cache.to_response(entry)
+
+            if entry is not None:
+                headers = dict(kwargs.get('headers') or {})
+                headers.update(cache.conditional_headers(entry))
+                kwargs['headers'] = headers
+
+        response = self._send(method, url, *args, **kwargs)
+
+        if cache is not None:
+            if response.status_code == 304 and entry is not None:
+                cache.revalidated(key, response)
+                cache.revalidations += 1
+                return cache.to_response(entry, response.request)
+
+            cache.misses += 1
+            if cache.is_cacheable(response):
+                cache.store(key, full_url, response)
+
+        return response
+
+    def _send(self, method, url, *args, **kwargs):
+        """Envía la petición a la red con reintentos, registrando el resultado en el breaker
+
+        Si hay un presupuesto de tiempo activo, el timeout se recorta a lo que
+        queda y, una vez agotado, no se envían más peticiones. El recorte se
+        repite tras esperar el hueco del host y el turno del limitador, porque
+        esa espera también gasta presupuesto.
+        """
+        budget = current_budget()
+        attempt = 0
+        while True:
+            if budget is not None:
+                kwargs['timeout'] = budget.check(url, kwargs.get('timeout'))
+            self.breaker.before_request(url)
+
+            try:
+                # El hueco del host se toma antes que el turno del limitador
+                with self._slot(url):
+                    if self.limiter is not None:
+                        self.limiter.acquire(url)
+                    if budget is not None:
+                        kwargs['timeout'] = budget.check(url, kwargs.get('timeout'))
+                    response = super().request(method, url, *args, **kwargs)
+            except Exception as e:
+                if budget is not None and budget.expired():
+                    # El timeout lo recortó el presupuesto: no es un fallo del host,
+                    # pero si era la petición de prueba hay que liberarla
+                    self.breaker.release(url)
+                    budget.exhausted = True
+                    raise BudgetExceededError(f"Presupuesto de tiempo agotado pidiendo {url}") from e
+                self.breaker.record_failure(url)
+                if attempt < self.retry.retries and self.retry.is_retryable_error(e):
+                    time.sleep(self._backoff(self.retry.delay(attempt), budget))
+                    attempt += 1
+                    continue
+                raise
+
+            if response.status_code >= 500:
+                self.breaker.record_failure(url)
+            else:
+                self.breaker.record_success(url)
+
+            if attempt < self.retry.retries and self.retry.is_retryable_response(response):
+                time.sleep(self._backoff(self.retry.delay(attempt, response), budget))
+                response.close()
+                attempt += 1
+                continue
+
+            return response
+
+    @staticmethod
+    def _backoff(delay: float, budget) -> float:
+        """Espera antes de reintentar, sin pasarse del presupuesto"""
+        remaining = budget.remaining() if budget is not None else None
+        return delay if remaining is None else min(delay, remaining)
+
+def create_session(limiter: Optional[DomainRateLimiter] = None,
+                   cache: Optional[HTTPCache] = None, use_cache: bool = True,
+                   breaker: Optional[CircuitBreaker] = None,
+                   retry: Optional[RetryPolicy] = None,
+                   per_host_limit: int = DEFAULT_PER_HOST_LIMIT) -> ScraperSession:
+    """Crea la sesión HTTP que usan los scrapers"""
+    return ScraperSession(limiter, cache, use_cache, breaker, retry, per_host_limit)
@@ -3,15 +3,32 @@ Scraper para eventos de Supremacía MC
 Desarrollado por Sergie Code
 """
 
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any
+from .parsing import make_soup, SubtreeStrainer
+from typing import List, Dict, Any, Iterator
 import re
 from .utils import ScrapingUtils, log_scraping_result, validate_event
+from .fetch import fetcher
+from .fingerprint import fingerprint_store
+from .extraction import FieldSpec, FieldSpecs, class_contains
+from .gazetteer import gazetteer
+
+# Subárboles que se construyen al parsear cada página (cubren sus find_all)
+MAIN_PAGE_STRAINER = SubtreeStrainer(class_pattern=r'event|battle|supremacia',
+                                     pattern_tags=('div', 'article'))
+COUNTRY_PAGE_STRAINER = SubtreeStrainer(class_pattern=r'event|battle|tournament',
+                                        pattern_tags=('div', 'section'))
 
 class SupremaciaScraper:
     """Scraper para eventos de InfoFreestyle y otros sitios de batalla"""
     
+    # Campos de cada evento (equivalen a los element.find() originales)
+    EVENT_FIELDS = FieldSpecs({
+        'title': FieldSpec(['h1, h2, h3, h4']),
+        'date': FieldSpec([class_contains(('time', 'span'), 'date', 'fecha')]),
+        'link': FieldSpec(['a'], attribute='href', text=False),
+        'location': FieldSpec([class_contains(('span', 'div'), 'location', 'venue', 'lugar')])
+    })
+    
     def __init__(self):
         self.base_url = "https://infofreestyle.com"
         self.eventos_url = "https://infofreestyle.com/eventos"
@@ -19,30 +36,28 @@ class SupremaciaScraper:
             'instagram': 'https://www.instagram.com/infofreestyle/',
             'twitter': 'https://twitter.com/InfoFreestyle'
         }
-        self.session = requests.Session()
-        self.session.headers.update(ScrapingUtils.get_headers())
+        self.fetcher = fetcher
+        self.session = fetcher.session
+        self.fingerprints = fingerprint_store
+    
+    def iter_events(self) -> Iterator[Dict[str, Any]]:
+        """Genera los eventos de Supremacía MC sección a sección (sin validar)"""
+        print("🔍 Scrapeando Supremacía MC...")
+        
+        # Intentar scrapear diferentes secciones
+        yield from self._scrape_main_page()
+        
+        # Scrapear eventos por países
+        yield from self._scrape_latam_events()
+        
+        # Agregar eventos conocidos
+        yield from self._get_known_supremacia_events()
     
     def scrape_events(self) -> List[Dict[str, Any]]:
         """Extrae eventos de Supremacía MC"""
-        events = []
-        
         try:
-            print("🔍 Scrapeando Supremacía MC...")
-            
-            # Intentar scrapear diferentes secciones
-            main_events = self._scrape_main_page()
-            events.extend(main_events)
-            
-            # Scrapear eventos por países
-            latam_events = self._scrape_latam_events()
-            events.extend(latam_events)
-            
-            # Agregar eventos conocidos
-            known_events = self._get_known_supremacia_events()
-            events.extend(known_events)
-            
             # Filtrar y validar eventos
-            events = [event for event in events if validate_event(event)]
+            events = [event for event in self.iter_events() if validate_event(event)]
             
             log_scraping_result("Supremacía MC", len(events))
             return events
@@ -61,99 +76,111 @@ class SupremaciaScraper:
             if response.status_code != 200:
                 return events
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Buscar elementos de eventos
-            event_elements = soup.find_all(['div', 'article'], 
-                                         class_=re.compile(r'event|battle|supremacia'))
-            
-            for element in event_elements:
-                event = self._parse_supremacia_event(element)
-                if event:
-                    events.append(event)
+            events = self.fingerprints.get_or_parse(
+                'supremacia', self.base_url, response.content,
+                lambda: self._parse_main_page(response.content)
+            )
                     
         except Exception as e:
             print(f"Error scrapeando página principal de Supremacía: {e}")
         
         return events
     
+    def _parse_main_page(self, content: bytes) -> List[Dict[str, Any]]:
+        """Extrae los eventos del HTML de la página principal"""
+        events = []
+        soup = make_soup(content, parse_only=MAIN_PAGE_STRAINER)
+        
+        # Buscar elementos de eventos
+        event_elements = soup.find_all(['div', 'article'], 
+                                     class_=re.compile(r'event|battle|supremacia'))
+        
+        for element in event_elements:
+            event = self._parse_supremacia_event(element)
+            if event:
+                events.append(event)
+        
+        return events
+    
     def _scrape_latam_events(self) -> List[Dict[str, Any]]:
-        """Extrae eventos de países LATAM"""
+        """Extrae eventos de países LATAM (las páginas se piden a la vez)"""
         events = []
         
         # Países donde Supremacía tiene actividad
         countries = ['mexico', 'colombia', 'argentina', 'chile', 'peru']
         
-        for country in countries:
-            try:
-                ScrapingUtils.random_delay()
-                country_events = self._scrape_country_events(country)
-                events.extend(country_events)
-            except Exception as e:
-                print(f"Error scrapeando eventos de {country}: {e}")
+        urls = [self._country_url(country) for country in countries]
+        responses = self.fetcher.fetch_many(urls, timeout=10)
+        
+        # Se combinan en el orden de la lista, no en el que terminan las descargas
+        for country, response in zip(countries, responses):
+            events.extend(self._events_from_country_response(country, response))
         
         return events
     
-    def _scrape_country_events(self, country: str) -> List[Dict[str, Any]]:
-        """Extrae eventos de un país específico"""
+    def _country_url(self, country: str) -> str:
+        """URL de la página de un país"""
+        return f"{self.base_url}/{country}"
+    
+    def _events_from_country_response(self, country: str, response) -> List[Dict[str, Any]]:
+        """Eventos de la respuesta (o excepción) de la página de un país"""
         events = []
         
+        if isinstance(response, Exception):
+            print(f"Error scrapeando eventos de {country}: {response}")
+            return events
+        
         try:
-            country_url = f"{self.base_url}/{country}"
-            response = self.session.get(country_url, timeout=10)
-            
             if response.status_code != 200:
                 return events
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Buscar eventos específicos del país
-            event_elements = soup.find_all(['div', 'section'], 
-                                         class_=re.compile(r'event|battle|tournament'))
-            
-            for element in event_elements:
-                event = self._parse_supremacia_event(element, country)
-                if event:
-                    events.append(event)
+            events = self.fingerprints.get_or_parse(
+                'supremacia', self._country_url(country), response.content,
+                lambda: self._parse_country_page(response.content, country)
+            )
                     
         except Exception as e:
             print(f"Error scrapeando eventos de {country}: {e}")
         
         return events
     
+    def _parse_country_page(self, content: bytes, country: str) -> List[Dict[str, Any]]:
+        """Extrae los eventos del HTML de la página de un país"""
+        events = []
+        soup = make_soup(content, parse_only=COUNTRY_PAGE_STRAINER)
+        
+        # Buscar eventos específicos del país
+        event_elements = soup.find_all(['div', 'section'], 
+                                     class_=re.compile(r'event|battle|tournament'))
+        
+        for element in event_elements:
+            event = self._parse_supremacia_event(element, country)
+            if event:
+                events.append(event)
+        
+        return events
+    
     def _parse_supremacia_event(self, element, country: str = "") -> Dict[str, Any]:
         """Parsea un evento de Supremacía MC"""
         try:
-            # Buscar título
-            title_elem = element.find(['h1', 'h2', 'h3', 'h4'])
-            if not title_elem:
+            fields = self.EVENT_FIELDS.extract(element)
+            title = fields['title']
+            if title is None:
                 return None
             
-            title = ScrapingUtils.clean_text(title_elem.get_text())
-            
             # Filtrar solo eventos de freestyle/batalla
             if not any(keyword in title.lower() for keyword in 
                       ['supremacia', 'batalla', 'freestyle', 'mc', 'tournament']):
                 return None
             
-            # Buscar fecha
-            date_elem = element.find(['time', 'span'], class_=re.compile(r'date|fecha'))
-            date = ""
-            if date_elem:
-                date = ScrapingUtils.parse_date(date_elem.get_text())
+            date = ScrapingUtils.parse_date(fields['date']) if fields['date'] is not None else ""
             
-            # Buscar link
-            link_elem = element.find('a')
             link = ""
-            if link_elem and link_elem.get('href'):
-                href = link_elem['href']
+            href = fields['link']
+            if href:
                 link = href if href.startswith('http') else f"{self.base_url}{href}"
             
-            # Buscar ubicación
-            location_elem = element.find(['span', 'div'], class_=re.compile(r'location|venue|lugar'))
-            location = ""
-            if location_elem:
-                location = ScrapingUtils.clean_text(location_elem.get_text())
+            location = fields['location'] or ""
             
             # Determinar país y ciudad
             event_country = self._get_country_from_context(country, location, title)
@@ -248,45 +275,17 @@ class SupremaciaScraper:
     
     def _get_country_from_context(self, country_hint: str, location: str, title: str) -> str:
         """Determina el país basado en el contexto"""
-        # Mapeo de hints de país
-        country_mapping = {
-            'mexico': 'México',
-            'colombia': 'Colombia', 
-            'argentina': 'Argentina',
-            'chile': 'Chile',
-            'peru': 'Perú'
-        }
-        
-        # Si hay hint del país en la URL
-        if country_hint and country_hint in country_mapping:
-            return country_mapping[country_hint]
-        
-        # Buscar en ubicación
-        if location:
-            location_lower = location.lower()
-            for key, value in country_mapping.items():
-                if key in location_lower or value.lower() in location_lower:
-                    return value
-        
-        # Buscar en título
-        if title:
-            title_lower = title.lower()
-            for key, value in country_mapping.items():
-                if key in title_lower or value.lower() in title_lower:
-                    return value
+        # Primero el hint del país en la URL, después la ubicación y el título
+        for text in (country_hint, location, title):
+            country = gazetteer.resolve(text)['pais'] if text else ""
+            if country:
+                return country
         
         return "México"  # Default
     
     def _get_city_from_country(self, country: str) -> str:
         """Obtiene la ciudad principal según el país"""
-        main_cities = {
-            'México': 'Ciudad de México',
-            'Colombia': 'Bogotá',
-            'Argentina': 'Buenos Aires',
-            'Chile': 'Santiago',
-            'Perú': 'Lima'
-        }
-        return main_cities.get(country, 'Ciudad de México')
+        return gazetteer.main_city(country) or 'Ciudad de México'
 
 def main():
     """Función principal para testing"""
@@ -3,20 +3,38 @@ Scraper para sitios de venta de entradas (Ticketmaster, Passline)
 Desarrollado por Sergie Code
 """
 
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any
+from .parsing import make_soup, SubtreeStrainer
+from typing import List, Dict, Any, Tuple, Callable, Iterator
 import re
 from .utils import ScrapingUtils, log_scraping_result, validate_event
+from .fetch import fetcher
+from .fingerprint import fingerprint_store
+from .extraction import FieldSpec, FieldSpecs, class_contains
+from .gazetteer import gazetteer
+
+# Subárboles que se construyen al parsear los resultados (cubren sus find_all)
+TICKETMASTER_STRAINER = SubtreeStrainer(class_pattern=r'event|card|result',
+                                        pattern_tags=('div', 'article'))
+PASSLINE_STRAINER = SubtreeStrainer(class_pattern=r'event|card|item',
+                                    pattern_tags=('div', 'article'))
 
 class TicketsScraper:
     """Scraper para sitios de venta de entradas"""
     
+    # Campos de cada evento, iguales en Ticketmaster y Passline
+    EVENT_FIELDS = FieldSpecs({
+        'title': FieldSpec(['h1, h2, h3, a']),
+        'date': FieldSpec([class_contains(('time', 'span'), 'date')]),
+        'venue': FieldSpec([class_contains(('span', 'div'), 'venue', 'location')]),
+        'link': FieldSpec(['a'], attribute='href', text=False)
+    })
+    
     def __init__(self):
         self.ticketmaster_url = "https://www.ticketmaster.es"
         self.passline_url = "https://www.passline.com"
-        self.session = requests.Session()
-        self.session.headers.update(ScrapingUtils.get_headers())
+        self.fetcher = fetcher
+        self.session = fetcher.session
+        self.fingerprints = fingerprint_store
         
         # Palabras clave para filtrar eventos de freestyle
         self.freestyle_keywords = [
@@ -24,27 +42,21 @@ class TicketsScraper:
             'god level', 'supremacia', 'urban roosters', 'hip hop battle'
         ]
     
+    def iter_events(self) -> Iterator[Dict[str, Any]]:
+        """Genera los eventos de los sitios de tickets a medida que se parsean (sin validar)"""
+        print("🔍 Scrapeando sitios de tickets...")
+        
+        # Búsquedas de Ticketmaster y Passline, todas a la vez
+        yield from self._run_searches(self._ticketmaster_searches() + self._passline_searches())
+        
+        # Agregar eventos conocidos de tickets
+        yield from self._get_known_ticket_events()
+    
     def scrape_events(self) -> List[Dict[str, Any]]:
         """Extrae eventos de sitios de tickets"""
-        events = []
-        
         try:
-            print("🔍 Scrapeando sitios de tickets...")
-            
-            # Scrapear Ticketmaster
-            ticketmaster_events = self._scrape_ticketmaster()
-            events.extend(ticketmaster_events)
-            
-            # Scrapear Passline
-            passline_events = self._scrape_passline()
-            events.extend(passline_events)
-            
-            # Agregar eventos conocidos de tickets
-            known_events = self._get_known_ticket_events()
-            events.extend(known_events)
-            
             # Filtrar y validar eventos
-            events = [event for event in events if validate_event(event)]
+            events = [event for event in self.iter_events() if validate_event(event)]
             
             log_scraping_result("Sitios de Tickets", len(events))
             return events
@@ -54,77 +66,84 @@ class TicketsScraper:
             log_scraping_result("Sitios de Tickets", 0, False)
             return []
     
-    def _scrape_ticketmaster(self) -> List[Dict[str, Any]]:
-        """Extrae eventos de Ticketmaster"""
+    def _ticketmaster_searches(self) -> List[Tuple[str, str, Callable]]:
+        """Búsquedas en Ticketmaster: (descripción, URL, parser de resultados)"""
+        return [
+            (f"'{keyword}' en Ticketmaster", f"{self.ticketmaster_url}/search?q={keyword}",
+             self._parse_ticketmaster_results)
+            for keyword in self.freestyle_keywords[:3]  # Limitar búsquedas
+        ]
+    
+    def _passline_searches(self) -> List[Tuple[str, str, Callable]]:
+        """Búsquedas en Passline: (descripción, URL, parser de resultados)"""
+        return [
+            (f"'{keyword}' en Passline", f"{self.passline_url}/search?query={keyword}",
+             self._parse_passline_results)
+            for keyword in self.freestyle_keywords[:2]  # Limitar búsquedas
+        ]
+    
+    def _run_searches(self, searches: List[Tuple[str, str, Callable]]) -> List[Dict[str, Any]]:
+        """Lanza las búsquedas a la vez y combina sus eventos en el orden de la lista"""
         events = []
+        responses = self.fetcher.fetch_many([url for _, url, _ in searches], timeout=10)
         
-        try:
-            # Buscar por diferentes términos de freestyle
-            for keyword in self.freestyle_keywords[:3]:  # Limitar búsquedas
-                ScrapingUtils.random_delay()
-                keyword_events = self._search_ticketmaster_by_keyword(keyword)
-                events.extend(keyword_events)
-                
-        except Exception as e:
-            print(f"Error scrapeando Ticketmaster: {e}")
+        for (label, url, parse), response in zip(searches, responses):
+            events.extend(self._events_from_search(label, url, parse, response))
         
         return events
     
-    def _search_ticketmaster_by_keyword(self, keyword: str) -> List[Dict[str, Any]]:
-        """Busca eventos en Ticketmaster por palabra clave"""
+    def _events_from_search(self, label: str, url: str, parse: Callable, response) -> List[Dict[str, Any]]:
+        """Eventos de la respuesta (o excepción) de una búsqueda"""
         events = []
         
+        if isinstance(response, Exception):
+            print(f"Error buscando {label}: {response}")
+            return events
+        
         try:
-            # URL de búsqueda de Ticketmaster
-            search_url = f"{self.ticketmaster_url}/search?q={keyword}"
-            
-            response = self.session.get(search_url, timeout=10)
             if response.status_code != 200:
                 return events
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Buscar elementos de eventos
-            event_elements = soup.find_all(['div', 'article'], 
-                                         class_=re.compile(r'event|card|result'))
-            
-            for element in event_elements[:5]:  # Limitar a 5 por keyword
-                event = self._parse_ticketmaster_event(element)
-                if event and self._is_freestyle_event(event['nombre']):
-                    events.append(event)
+            events = self.fingerprints.get_or_parse(
+                'tickets', url, response.content,
+                lambda: parse(response.content)
+            )
                     
         except Exception as e:
-            print(f"Error buscando '{keyword}' en Ticketmaster: {e}")
+            print(f"Error buscando {label}: {e}")
+        
+        return events
+    
+    def _parse_ticketmaster_results(self, content: bytes) -> List[Dict[str, Any]]:
+        """Extrae los eventos de freestyle del HTML de resultados de Ticketmaster"""
+        events = []
+        soup = make_soup(content, parse_only=TICKETMASTER_STRAINER)
+        
+        # Buscar elementos de eventos
+        event_elements = soup.find_all(['div', 'article'], 
+                                     class_=re.compile(r'event|card|result'))
+        
+        for element in event_elements[:5]:  # Limitar a 5 por keyword
+            event = self._parse_ticketmaster_event(element)
+            if event and self._is_freestyle_event(event['nombre']):
+                events.append(event)
         
         return events
     
     def _parse_ticketmaster_event(self, element) -> Dict[str, Any]:
         """Parsea un evento de Ticketmaster"""
         try:
-            # Buscar título
-            title_elem = element.find(['h1', 'h2', 'h3', 'a'])
-            if not title_elem:
+            fields = self.EVENT_FIELDS.extract(element)
+            title = fields['title']
+            if title is None:
                 return None
             
-            title = ScrapingUtils.clean_text(title_elem.get_text())
-            
-            # Buscar fecha
-            date_elem = element.find(['time', 'span'], class_=re.compile(r'date'))
-            date = ""
-            if date_elem:
-                date = ScrapingUtils.parse_date(date_elem.get_text())
+            date = ScrapingUtils.parse_date(fields['date']) if fields['date'] is not None else ""
+            venue = fields['venue'] or ""
             
-            # Buscar venue/ubicación
-            venue_elem = element.find(['span', 'div'], class_=re.compile(r'venue|location'))
-            venue = ""
-            if venue_elem:
-                venue = ScrapingUtils.clean_text(venue_elem.get_text())
-            
-            # Buscar link
-            link_elem = element.find('a')
             link = ""
-            if link_elem and link_elem.get('href'):
-                href = link_elem['href']
+            href = fields['link']
+            if href:
                 link = href if href.startswith('http') else f"{self.ticketmaster_url}{href}"
             
             return {
@@ -143,77 +162,36 @@ class TicketsScraper:
             print(f"Error parseando evento de Ticketmaster: {e}")
             return None
     
-    def _scrape_passline(self) -> List[Dict[str, Any]]:
-        """Extrae eventos de Passline"""
+    def _parse_passline_results(self, content: bytes) -> List[Dict[str, Any]]:
+        """Extrae los eventos de freestyle del HTML de resultados de Passline"""
         events = []
+        soup = make_soup(content, parse_only=PASSLINE_STRAINER)
         
-        try:
-            # Buscar por términos de freestyle
-            for keyword in self.freestyle_keywords[:2]:  # Limitar búsquedas
-                ScrapingUtils.random_delay()
-                keyword_events = self._search_passline_by_keyword(keyword)
-                events.extend(keyword_events)
-                
-        except Exception as e:
-            print(f"Error scrapeando Passline: {e}")
+        # Buscar elementos de eventos
+        event_elements = soup.find_all(['div', 'article'], 
+                                     class_=re.compile(r'event|card|item'))
         
-        return events
-    
-    def _search_passline_by_keyword(self, keyword: str) -> List[Dict[str, Any]]:
-        """Busca eventos en Passline por palabra clave"""
-        events = []
-        
-        try:
-            # URL de búsqueda de Passline
-            search_url = f"{self.passline_url}/search?query={keyword}"
-            
-            response = self.session.get(search_url, timeout=10)
-            if response.status_code != 200:
-                return events
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Buscar elementos de eventos
-            event_elements = soup.find_all(['div', 'article'], 
-                                         class_=re.compile(r'event|card|item'))
-            
-            for element in event_elements[:3]:  # Limitar a 3 por keyword
-                event = self._parse_passline_event(element)
-                if event and self._is_freestyle_event(event['nombre']):
-                    events.append(event)
-                    
-        except Exception as e:
-            print(f"Error buscando '{keyword}' en Passline: {e}")
+        for element in event_elements[:3]:  # Limitar a 3 por keyword
+            event = self._parse_passline_event(element)
+            if event and self._is_freestyle_event(event['nombre']):
+                events.append(event)
         
         return events
     
     def _parse_passline_event(self, element) -> Dict[str, Any]:
         """Parsea un evento de Passline"""
         try:
-            # Buscar título
-            title_elem = element.find(['h1', 'h2', 'h3', 'a'])
-            if not title_elem:
+            fields = self.EVENT_FIELDS.extract(element)
+            title = fields['title']
+            if title is None:
                 return None
             
-            title = ScrapingUtils.clean_text(title_elem.get_text())
+            date = ScrapingUtils.parse_date(fields['date']) if fields['date'] is not None else ""
+            venue = fields['venue'] or ""
             
-            # Buscar fecha
-            date_elem = element.find(['time', 'span'], class_=re.compile(r'date'))
-            date = ""
-            if date_elem:
-                date = ScrapingUtils.parse_date(date_elem.get_text())
-            
-            # Buscar venue/ubicación
-            venue_elem = element.find(['span', 'div'], class_=re.compile(r'venue|location'))
-            venue = ""
-            if venue_elem:
-                venue = ScrapingUtils.clean_text(venue_elem.get_text())
-            
-            # Buscar link
-            link_elem = element.find('a')
             link = ""
-            if link_elem and link_elem.get('href'):
-                href = link_elem['href']
+            href = fields['link']
+            if href:
                 link = href if href.startswith('http') else f"{self.passline_url}{href}"
             
             return {
@@ -280,34 +258,15 @@ class TicketsScraper:
         if not location:
             return ""
         
-        # Ciudades principales de España (para Ticketmaster.es)
-        spanish_cities = ['Madrid', 'Barcelona', 'Valencia', 'Sevilla', 'Bilbao', 'Málaga', 'Zaragoza']
-        
-        for city in spanish_cities:
-            if city.lower() in location.lower():
-                return city
-        
         # Si no encuentra ciudad conocida, tomar la primera parte
-        parts = location.split(',')
-        return parts[0].strip() if parts else ""
+        return gazetteer.resolve(location)['ciudad'] or location.split(',')[0].strip()
     
     def _extract_country(self, location: str) -> str:
         """Extrae el país de una ubicación"""
         if not location:
             return "España"  # Default para sitios .es
         
-        countries = {
-            'españa': 'España', 'spain': 'España',
-            'portugal': 'Portugal',
-            'francia': 'Francia', 'france': 'Francia'
-        }
-        
-        location_lower = location.lower()
-        for key, value in countries.items():
-            if key in location_lower:
-                return value
-        
-        return "España"  # Default
+        return gazetteer.resolve(location)['pais'] or "España"
 
 def main():
     """Función principal para testing"""
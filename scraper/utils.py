@@ -5,26 +5,177 @@ Desarrollado por Sergie Code
 
 import sqlite3
 import pandas as pd
+import csv
 import os
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Tuple
 import time
 import random
 
+from . import dates
+
+# Columnas que identifican un evento (restricción UNIQUE de la tabla)
+KEY_FIELDS = ('nombre', 'fecha', 'organizador')
+
+# Resto de columnas con datos del evento
+VALUE_FIELDS = ('hora', 'ciudad', 'pais', 'venue', 'link_oficial', 'descripcion')
+
+# Todas las columnas de la tabla eventos, en orden
+EVENT_COLUMNS = ('id', 'nombre', 'fecha', 'hora', 'ciudad', 'pais', 'venue', 'organizador',
+                 'link_oficial', 'descripcion', 'fecha_scraping')
+
+# Columnas de cada evento tal y como lo devuelven los scrapers (y del CSV)
+EVENT_FIELDS = EVENT_COLUMNS[1:-1]
+
+# Eventos por transacción en las inserciones masivas
+DEFAULT_BATCH_SIZE = 500
+
+# Modos de escritura: 'upsert' conserva el id de los eventos existentes,
+# 'replace' es el INSERT OR REPLACE original (borra y vuelve a insertar)
+INSERT_MODES = ('upsert', 'replace')
+
+REPLACE_SQL = '''
+    INSERT OR REPLACE INTO eventos
+    (nombre, fecha, organizador, hora, ciudad, pais, venue, link_oficial, descripcion, fecha_scraping)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+UPSERT_SQL = '''
+    INSERT INTO eventos
+    (nombre, fecha, organizador, hora, ciudad, pais, venue, link_oficial, descripcion, fecha_scraping)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(nombre, fecha, organizador) DO UPDATE SET
+        hora = excluded.hora,
+        ciudad = excluded.ciudad,
+        pais = excluded.pais,
+        venue = excluded.venue,
+        link_oficial = excluded.link_oficial,
+        descripcion = excluded.descripcion,
+        fecha_scraping = excluded.fecha_scraping
+    WHERE eventos.hora IS NOT excluded.hora
+       OR eventos.ciudad IS NOT excluded.ciudad
+       OR eventos.pais IS NOT excluded.pais
+       OR eventos.venue IS NOT excluded.venue
+       OR eventos.link_oficial IS NOT excluded.link_oficial
+       OR eventos.descripcion IS NOT excluded.descripcion
+'''
+
+INSERT_SQL = {'upsert': UPSERT_SQL, 'replace': REPLACE_SQL}
+
+# Espera máxima ante un bloqueo de escritura antes de dar error (ms)
+BUSY_TIMEOUT_MS = 30000
+
+# PRAGMAs que se aplican una sola vez al abrir cada conexión
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}',
+    'PRAGMA wal_autocheckpoint = 1000',
+    'PRAGMA journal_size_limit = 67108864',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA temp_store = MEMORY',
+    # INSERT OR REPLACE borra la fila anterior: así sus triggers de DELETE también se ejecutan
+    'PRAGMA recursive_triggers = ON',
+)
+
+# Conexiones abiertas que se guardan para reutilizar
+DEFAULT_POOL_SIZE = 8
+
+# Sentencias preparadas que cachea cada conexión
+CACHED_STATEMENTS = 256
+
+# Reintentos de un lote cuando la base de datos sigue bloqueada tras busy_timeout
+LOCK_RETRIES = 3
+LOCK_RETRY_DELAY = 0.5
+
+# Modos de PRAGMA wal_checkpoint
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+# Columnas por las que se precalculan recuentos en eventos_stats
+STATS_DIMENSIONS = ('organizador', 'pais', 'fecha')
+
 class EventDatabase:
-    """Maneja la base de datos SQLite de eventos"""
+    """Maneja la base de datos SQLite de eventos
+    
+    Las conexiones se reutilizan: cada operación toma una del pool (o abre
+    una nueva si no hay libres) y la devuelve al terminar. Los PRAGMAs se
+    aplican al abrirla y cada conexión conserva su caché de sentencias
+    preparadas, así que las consultas repetidas no se vuelven a compilar.
     
-    def __init__(self, db_path: str = "data/eventos.db"):
+    La base de datos trabaja en modo WAL: las lecturas (la aplicación web)
+    nunca esperan a las escrituras (los scrapers) y siempre ven el último
+    lote confirmado. Las escrituras se serializan entre sí con busy_timeout y,
+    si aun así la base sigue bloqueada, el lote se reintenta entero. Solo los
+    checkpoints FULL, RESTART y TRUNCATE pueden esperar a lectores; el
+    automático y el de ``checkpoint()`` por defecto (PASSIVE) no.
+    """
+    
+    def __init__(self, db_path: str = "data/eventos.db", pool_size: int = DEFAULT_POOL_SIZE):
         self.db_path = db_path
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open_connections = 0
         self.create_table()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Abre una conexión nueva y la configura"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                               check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._open_connections += 1
+        return conn
+    
+    @contextmanager
+    def _connection(self):
+        """Presta una conexión del pool durante el bloque ``with``"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._pool.qsize() < self.pool_size:
+                self._pool.put(conn)
+            else:
+                self._close_connection(conn)
+    
+    def _close_connection(self, conn: sqlite3.Connection):
+        """Cierra una conexión y la descuenta"""
+        conn.close()
+        with self._lock:
+            self._open_connections -= 1
+    
+    def close(self):
+        """Cierra las conexiones libres del pool"""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            self._close_connection(conn)
+    
     def create_table(self):
         """Crea la tabla de eventos si no existe"""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        with self._connection() as conn:
+            self._create_schema(conn.cursor())
+    
+    @staticmethod
+    def _create_schema(cursor):
+        """Crea la tabla y sus índices en una transacción"""
+        cursor.execute('BEGIN')
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS eventos (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -42,54 +193,421 @@ class EventDatabase:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Índices para los filtros de la API
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_eventos_fecha ON eventos(fecha)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_eventos_pais ON eventos(pais, fecha)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_eventos_organizador ON eventos(organizador, fecha)')
+        
+        # Generación de los datos: cualquier cambio en eventos la incrementa
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                clave TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO meta (clave, valor) VALUES ('generacion', 0)")
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS eventos_generacion_{operation.lower()}
+                AFTER {operation} ON eventos
+                BEGIN
+                    UPDATE meta SET valor = valor + 1 WHERE clave = 'generacion';
+                END
+            ''')
+        
+        EventDatabase._create_stats_schema(cursor)
+        
+        cursor.execute('COMMIT')
+    
+    @staticmethod
+    def _create_stats_schema(cursor):
+        """Crea la tabla de recuentos por organizador, país y fecha, y sus triggers
+        
+        Los triggers la mantienen al día dentro de la misma transacción que
+        modifica eventos, así que las estadísticas cuestan O(grupos) y no
+        O(eventos).
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'eventos_stats'"
+        ).fetchone()
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS eventos_stats (
+                dimension TEXT NOT NULL,
+                valor TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                PRIMARY KEY (dimension, valor)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Bases de datos anteriores: calcular los recuentos de los eventos existentes
+        if not exists:
+            for dimension in STATS_DIMENSIONS:
+                cursor.execute(f'''
+                    INSERT INTO eventos_stats (dimension, valor, total)
+                    SELECT '{dimension}', COALESCE({dimension}, ''), COUNT(*)
+                    FROM eventos GROUP BY 2
+                ''')
+        
+        increment = ''.join(f'''
+                    INSERT INTO eventos_stats (dimension, valor, total)
+                    VALUES ('{dimension}', COALESCE(NEW.{dimension}, ''), 1)
+                    ON CONFLICT(dimension, valor) DO UPDATE SET total = total + 1;'''
+                    for dimension in STATS_DIMENSIONS)
+        decrement = ''.join(f'''
+                    UPDATE eventos_stats SET total = total - 1
+                    WHERE dimension = '{dimension}' AND valor = COALESCE(OLD.{dimension}, '');
+                    DELETE FROM eventos_stats
+                    WHERE dimension = '{dimension}' AND valor = COALESCE(OLD.{dimension}, '') AND total <= 0;'''
+                    for dimension in STATS_DIMENSIONS)
+        
+        triggers = {
+            'insert': ('AFTER INSERT ON eventos', increment),
+            'delete': ('AFTER DELETE ON eventos', decrement),
+            'update': (f"AFTER UPDATE OF {', '.join(STATS_DIMENSIONS)} ON eventos", increment + decrement),
+        }
+        for name, (event, body) in triggers.items():
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS eventos_stats_{name}
+                {event}
+                BEGIN{body}
+                END
+            ''')
     
-    def insert_events(self, events: List[Dict[str, Any]]):
+    def get_stats(self, today: str = None) -> Dict[str, Any]:
+        """Estadísticas de eventos a partir de los recuentos precalculados"""
+        today = today or datetime.now().strftime('%Y-%m-%d')
+        
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT dimension, valor, total FROM eventos_stats "
+                "WHERE dimension IN ('organizador', 'pais')"
+            ).fetchall()
+            proximos = conn.execute(
+                "SELECT COALESCE(SUM(total), 0) FROM eventos_stats "
+                "WHERE dimension = 'fecha' AND valor >= ?", (today,)
+            ).fetchone()[0]
+        
+        por_organizador = {valor: total for dimension, valor, total in rows if dimension == 'organizador'}
+        por_pais = {valor: total for dimension, valor, total in rows if dimension == 'pais'}
+        
+        return {
+            'total_eventos': sum(por_organizador.values()),
+            'por_organizador': por_organizador,
+            'por_pais': por_pais,
+            'proximos_eventos': proximos
+        }
+    
+    def get_generation(self) -> int:
+        """Generación de los datos; cambia con cada escritura que modifica eventos"""
+        with self._connection() as conn:
+            row = conn.execute("SELECT valor FROM meta WHERE clave = 'generacion'").fetchone()
+        return row[0] if row else 0
+    
+    def insert_events(self, events: List[Dict[str, Any]], mode: str = 'upsert') -> Dict[str, Any]:
         """Inserta eventos en la base de datos"""
         if not events:
-            return
+            return {'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': 0, 'changed_ids': []}
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return self.bulk_insert_events(events, mode=mode)
+    
+    def bulk_insert_events(self, events: Iterable[Dict[str, Any]],
+                           batch_size: int = DEFAULT_BATCH_SIZE,
+                           mode: str = 'upsert') -> Dict[str, Any]:
+        """Inserta eventos por lotes, cada lote en una única transacción
+        
+        Acepta cualquier iterable (por ejemplo un generador), así que no hace
+        falta tener todos los eventos en memoria. Devuelve cuántos eventos se
+        insertaron, actualizaron o ya estaban iguales, y en 'changed_ids' los
+        ids de las filas insertadas o modificadas. Las filas sin cambios no se
+        reescriben.
+        
+        En modo 'upsert' (por defecto) las filas existentes se actualizan en su
+        sitio y conservan su id; 'replace' mantiene el INSERT OR REPLACE
+        anterior, que asigna un id nuevo a cada fila modificada.
+        """
+        if mode not in INSERT_MODES:
+            raise ValueError(f"Modo de inserción desconocido: {mode}")
+        
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': 0, 'changed_ids': []}
+        batch = []
         
         for event in events:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                self._write_batch(batch, counts, mode)
+                batch = []
+        
+        if batch:
+            self._write_batch(batch, counts, mode)
+        
+        return counts
+    
+    @staticmethod
+    def _event_key(event: Dict[str, Any]) -> Tuple:
+        """Clave única de un evento: (nombre, fecha, organizador)"""
+        return tuple(event.get(field, '') for field in KEY_FIELDS)
+    
+    @staticmethod
+    def _event_values(event: Dict[str, Any]) -> Tuple:
+        """Valores de las columnas no clave, en el orden de VALUE_FIELDS"""
+        return tuple(event.get(field, '') for field in VALUE_FIELDS)
+    
+    def _fetch_existing(self, cursor, keys: List[Tuple]) -> Dict[Tuple, Tuple]:
+        """Devuelve los valores guardados de los eventos con las claves dadas"""
+        existing = {}
+        key_columns = ', '.join(KEY_FIELDS)
+        value_columns = ', '.join(VALUE_FIELDS)
+        
+        # Trozos pequeños para no superar el límite de parámetros de SQLite
+        for start in range(0, len(keys), 300):
+            chunk = keys[start:start + 300]
+            placeholders = ', '.join(['(?, ?, ?)'] * len(chunk))
+            cursor.execute(
+                f'SELECT {key_columns}, {value_columns} FROM eventos '
+                f'WHERE ({key_columns}) IN (VALUES {placeholders})',
+                [value for key in chunk for value in key]
+            )
+            for row in cursor.fetchall():
+                existing[tuple(row[:len(KEY_FIELDS)])] = tuple(row[len(KEY_FIELDS):])
+        
+        return existing
+    
+    def _fetch_ids(self, cursor, keys: List[Tuple]) -> List[int]:
+        """Devuelve los ids de los eventos con las claves dadas"""
+        ids = []
+        key_columns = ', '.join(KEY_FIELDS)
+        
+        for start in range(0, len(keys), 300):
+            chunk = keys[start:start + 300]
+            placeholders = ', '.join(['(?, ?, ?)'] * len(chunk))
+            cursor.execute(
+                f'SELECT id FROM eventos WHERE ({key_columns}) IN (VALUES {placeholders})',
+                [value for key in chunk for value in key]
+            )
+            ids.extend(row[0] for row in cursor.fetchall())
+        
+        return ids
+    
+    def _write_batch(self, batch: List[Dict[str, Any]], counts: Dict[str, Any], mode: str):
+        """Escribe un lote en una transacción, con un único timestamp de scraping"""
+        scraped_at = datetime.now().isoformat()
+        
+        # Si un evento se repite dentro del lote, gana la última versión
+        rows = {}
+        for event in batch:
+            rows[self._event_key(event)] = self._event_values(event)
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            for attempt in range(1, LOCK_RETRIES + 1):
+                try:
+                    self._write_rows(cursor, rows, scraped_at, counts, mode)
+                    return
+                except sqlite3.OperationalError as e:
+                    if not self._is_locked(e) or attempt == LOCK_RETRIES:
+                        raise
+                    wait = LOCK_RETRY_DELAY * 2 ** (attempt - 1)
+                    print(f"⏳ Base de datos ocupada, reintentando lote en {wait:.1f}s")
+                    time.sleep(wait)
+    
+    @staticmethod
+    def _is_locked(error: sqlite3.Error) -> bool:
+        """Indica si el error se debe a que otra conexión tiene el bloqueo"""
+        message = str(error).lower()
+        return 'locked' in message or 'busy' in message
+    
+    def _write_rows(self, cursor, rows: Dict[Tuple, Tuple], scraped_at: str,
+                    counts: Dict[str, Any], mode: str):
+        """Escribe las filas del lote en una única transacción"""
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            existing = self._fetch_existing(cursor, list(rows))
+            
+            to_write = []
+            inserted = updated = unchanged = 0
+            for key, values in rows.items():
+                current = existing.get(key)
+                if current is None:
+                    inserted += 1
+                elif current != values:
+                    updated += 1
+                else:
+                    unchanged += 1
+                    continue
+                to_write.append(key + values + (scraped_at,))
+            
+            cursor.executemany(INSERT_SQL[mode], to_write)
+            changed_ids = self._fetch_ids(cursor, [row[:len(KEY_FIELDS)] for row in to_write])
+            cursor.execute('COMMIT')
+            
+            counts['inserted'] += inserted
+            counts['updated'] += updated
+            counts['unchanged'] += unchanged
+            counts['changed_ids'].extend(changed_ids)
+            
+        except sqlite3.Error as e:
+            if cursor.connection.in_transaction:
+                cursor.execute('ROLLBACK')
+            if self._is_locked(e):
+                raise
+            print(f"⚠️ Error insertando lote de {len(rows)} eventos ({e}), reintentando uno a uno")
+            self._write_rows_one_by_one(cursor, rows, scraped_at, counts, mode)
+    
+    def _write_rows_one_by_one(self, cursor, rows: Dict[Tuple, Tuple], scraped_at: str,
+                               counts: Dict[str, Any], mode: str):
+        """Escribe fila a fila para aislar los eventos que provocan errores"""
+        for key, values in rows.items():
             try:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO eventos 
-                    (nombre, fecha, hora, ciudad, pais, venue, organizador, link_oficial, descripcion, fecha_scraping)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    event.get('nombre', ''),
-                    event.get('fecha', ''),
-                    event.get('hora', ''),
-                    event.get('ciudad', ''),
-                    event.get('pais', ''),
-                    event.get('venue', ''),
-                    event.get('organizador', ''),
-                    event.get('link_oficial', ''),
-                    event.get('descripcion', ''),
-                    datetime.now().isoformat()
-                ))
+                cursor.execute('BEGIN IMMEDIATE')
+                current = self._fetch_existing(cursor, [key]).get(key)
+                if current == values:
+                    cursor.execute('COMMIT')
+                    counts['unchanged'] += 1
+                    continue
+                cursor.execute(INSERT_SQL[mode], key + values + (scraped_at,))
+                changed_ids = self._fetch_ids(cursor, [key])
+                cursor.execute('COMMIT')
+                counts['updated' if current is not None else 'inserted'] += 1
+                counts['changed_ids'].extend(changed_ids)
             except sqlite3.Error as e:
-                print(f"Error insertando evento {event.get('nombre', 'Unknown')}: {e}")
+                if cursor.connection.in_transaction:
+                    cursor.execute('ROLLBACK')
+                counts['errors'] += 1
+                print(f"Error insertando evento {key[0] or 'Unknown'}: {e}")
+    
+    def checkpoint(self, mode: str = 'PASSIVE') -> Dict[str, int]:
+        """Vuelca el WAL a la base de datos principal
         
-        conn.commit()
-        conn.close()
+        PASSIVE copia lo que puede sin esperar a nadie. FULL espera a las
+        escrituras en curso; RESTART y TRUNCATE además esperan a los lectores
+        para reiniciar (o truncar) el fichero WAL.
+        """
+        mode = mode.upper()
+        if mode not in CHECKPOINT_MODES:
+            raise ValueError(f"Modo de checkpoint desconocido: {mode}")
+        
+        with self._connection() as conn:
+            busy, log_frames, checkpointed = conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+        
+        return {'busy': busy, 'log_frames': log_frames, 'checkpointed_frames': checkpointed}
     
     def get_all_events(self) -> List[Dict[str, Any]]:
         """Obtiene todos los eventos de la base de datos"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.execute('SELECT * FROM eventos ORDER BY fecha')
+            rows = cursor.fetchall()
         
-        cursor.execute('SELECT * FROM eventos ORDER BY fecha')
-        rows = cursor.fetchall()
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def get_event(self, event_id: int) -> Dict[str, Any]:
+        """Obtiene un evento por su id, o None si no existe"""
+        with self._connection() as conn:
+            cursor = conn.execute('SELECT * FROM eventos WHERE id = ?', (event_id,))
+            row = cursor.fetchone()
         
+        if row is None:
+            return None
         columns = [description[0] for description in cursor.description]
-        events = [dict(zip(columns, row)) for row in rows]
+        return dict(zip(columns, row))
+    
+    def get_distinct_values(self, column: str) -> List[str]:
+        """Valores distintos de pais u organizador, leídos de eventos_stats (O(grupos))"""
+        if column not in ('pais', 'organizador'):
+            raise ValueError(f"Columna no indexada: {column}")
         
-        conn.close()
-        return events
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT valor FROM eventos_stats WHERE dimension = ? AND valor != '' ORDER BY valor",
+                (column,)
+            ).fetchall()
+        
+        return [row[0] for row in rows]
+    
+    def query_events(self, pais: str = None, organizador: str = None,
+                     fecha_desde: str = None, fecha_hasta: str = None,
+                     limit: int = None, after: Tuple[str, int] = None,
+                     fields: List[str] = None,
+                     organizador_exacto: str = None) -> List[Dict[str, Any]]:
+        """Obtiene los eventos que cumplen los filtros, resueltos en SQL
+        
+        - pais: coincidencia exacta sin distinguir mayúsculas
+        - organizador: contiene el texto, sin distinguir mayúsculas
+        - organizador_exacto: coincidencia exacta sin distinguir mayúsculas
+          (para elegir un organizador de la lista de valores distintos)
+        - fecha_desde / fecha_hasta: rango inclusivo de fechas (YYYY-MM-DD)
+        - limit / after: paginación por clave (fecha, id); ``after`` es la
+          pareja (fecha, id) del último evento de la página anterior
+        - fields: columnas a devolver (por defecto todas)
+        
+        Los países y organizadores distintos salen de eventos_stats, que tiene
+        una fila por valor: la comparación sin mayúsculas (incluidas tildes y
+        eñes) se resuelve sobre esa lista corta y la consulta filtra por
+        igualdad exacta usando los índices, sin recorrer la tabla.
+        """
+        where = []
+        params = []
+        
+        if pais:
+            needle = pais.lower()
+            matches = [value for value in self.get_distinct_values('pais') if value.lower() == needle]
+            if not matches:
+                return []
+            where.append(f"pais IN ({', '.join(['?'] * len(matches))})")
+            params.extend(matches)
+        
+        if organizador:
+            needle = organizador.lower()
+            matches = [value for value in self.get_distinct_values('organizador') if needle in value.lower()]
+            if not matches:
+                return []
+            where.append(f"organizador IN ({', '.join(['?'] * len(matches))})")
+            params.extend(matches)
+        
+        if organizador_exacto:
+            needle = organizador_exacto.lower()
+            matches = [value for value in self.get_distinct_values('organizador') if value.lower() == needle]
+            if not matches:
+                return []
+            where.append(f"organizador IN ({', '.join(['?'] * len(matches))})")
+            params.extend(matches)
+        
+        if fecha_desde:
+            where.append('fecha >= ?')
+            params.append(fecha_desde)
+        
+        if fecha_hasta:
+            where.append('fecha <= ?')
+            params.append(fecha_hasta)
+        
+        if after:
+            where.append('(fecha, id) > (?, ?)')
+            params.extend(after)
+        
+        if fields:
+            unknown = [field for field in fields if field not in EVENT_COLUMNS]
+            if unknown:
+                raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
+            columns = ', '.join(column for column in EVENT_COLUMNS if column in fields)
+        else:
+            columns = '*'
+        
+        sql = f'SELECT {columns} FROM eventos'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY fecha, id'
+        
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        
+        with self._connection() as conn:
+            cursor = conn.execute(sql, params)
+            rows = cursor.fetchall()
+        
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
 
 class CSVExporter:
     """Maneja la exportación a CSV"""
@@ -105,6 +623,53 @@ class CSVExporter:
         df = pd.DataFrame(events)
         df.to_csv(csv_path, index=False, encoding='utf-8')
         print(f"✅ Exportados {len(events)} eventos a {csv_path}")
+    
+    @staticmethod
+    def open_stream(csv_path: str = "data/eventos.csv") -> 'CSVStreamWriter':
+        """Abre un CSV que se va escribiendo por lotes"""
+        return CSVStreamWriter(csv_path)
+
+class CSVStreamWriter:
+    """CSV escrito por lotes sin tener todos los eventos en memoria.
+
+    Las filas van a un fichero temporal que sustituye al CSV anterior al
+    cerrar, así que quien lo lea nunca ve un fichero a medias. Si no llega
+    ningún evento el CSV anterior se conserva.
+    """
+    
+    def __init__(self, csv_path: str = "data/eventos.csv"):
+        self.csv_path = csv_path
+        self.temp_path = f"{csv_path}.tmp"
+        self.rows = 0
+        self._file = None
+        self._writer = None
+    
+    def write(self, events: List[Dict[str, Any]]):
+        """Añade un lote de eventos al CSV"""
+        if not events:
+            return
+        
+        if self._file is None:
+            directory = os.path.dirname(self.csv_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.temp_path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.DictWriter(self._file, fieldnames=EVENT_FIELDS,
+                                          extrasaction='ignore', lineterminator=os.linesep)
+            self._writer.writeheader()
+        
+        self._writer.writerows(events)
+        self.rows += len(events)
+    
+    def close(self):
+        """Cierra el fichero y sustituye al CSV anterior"""
+        if self._file is None:
+            return
+        
+        self._file.close()
+        self._file = self._writer = None
+        os.replace(self.temp_path, self.csv_path)
+        print(f"✅ Exportados {self.rows} eventos a {self.csv_path}")
 
 class ScrapingUtils:
     """Utilidades generales para scraping"""
@@ -124,45 +689,8 @@ class ScrapingUtils:
     
     @staticmethod
     def parse_date(date_string: str) -> str:
-        """Intenta parsear fecha en diferentes formatos"""
-        if not date_string:
-            return ""
-        
-        # Lista de formatos comunes
-        formats = [
-            "%d/%m/%Y",
-            "%d-%m-%Y", 
-            "%Y-%m-%d",
-            "%d de %B de %Y",
-            "%d %B %Y",
-        ]
-        
-        # Mapeo de meses en español
-        months_es = {
-            'enero': 'January', 'febrero': 'February', 'marzo': 'March',
-            'abril': 'April', 'mayo': 'May', 'junio': 'June',
-            'julio': 'July', 'agosto': 'August', 'septiembre': 'September',
-            'octubre': 'October', 'noviembre': 'November', 'diciembre': 'December'
-        }
-        
-        # Reemplazar meses en español
-        date_clean = date_string.lower()
-        for es, en in months_es.items():
-            date_clean = date_clean.replace(es, en)
-        
-        for fmt in formats:
-            try:
-                # Try both original and cleaned strings
-                for test_string in [date_string, date_clean]:
-                    try:
-                        dt = datetime.strptime(test_string, fmt)
-                        return dt.strftime("%Y-%m-%d")
-                    except ValueError:
-                        continue
-            except:
-                continue
-        
-        return date_string
+        """Intenta parsear fecha en diferentes formatos (ver scraper/dates.py)"""
+        return dates.parse_date(date_string)
     
     @staticmethod
     def get_headers() -> Dict[str, str]:
@@ -0,0 +1,537 @@
+"""
+Unit tests for the shared HTTP layer used by the scrapers
+"""
+import unittest
+import tempfile
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import requests
+
+# Add the project root to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from scraper.ratelimit import TokenBucket, DomainRateLimiter
+from scraper.httpcache import HTTPCache
+from scraper.session import ScraperSession, create_session
+from scraper.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from scraper.fetch import AsyncFetcher
+from scraper.budget import TimeBudget, BudgetExceededError, budget_scope, current_budget
+from scraper.fms import FMSScraper
+from scraper.godlevel import GodLevelScraper
+
+
+def make_response(status=200, body=b'<html>ok</html>', headers=None):
+    """Build a requests.Response without touching the network"""
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response._content_consumed = True
+    response.headers.update(headers or {})
+    return response
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for TokenBucket"""
+    
+    def test_burst_then_wait(self):
+        """Test that the burst is free and later requests must wait"""
+        bucket = TokenBucket(rate=2, burst=2)
+        
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 0.5, delta=0.05)
+        self.assertAlmostEqual(bucket.reserve(), 1.0, delta=0.05)
+    
+    def test_invalid_settings(self):
+        """Test that invalid settings are rejected"""
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0, burst=1)
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=1, burst=0)
+
+
+class TestDomainRateLimiter(unittest.TestCase):
+    """Test cases for DomainRateLimiter"""
+    
+    def test_hosts_are_independent(self):
+        """Test that each host has its own bucket"""
+        limiter = DomainRateLimiter(default_rate=1, default_burst=1)
+        
+        self.assertEqual(limiter.reserve('https://fms.tv/calendario'), 0.0)
+        self.assertEqual(limiter.reserve('https://godlevel.es/eventos'), 0.0)
+        self.assertGreater(limiter.reserve('https://fms.tv/otra'), 0.0)
+    
+    def test_www_prefix_shares_bucket(self):
+        """Test that www.host and host share the same limit"""
+        limiter = DomainRateLimiter(domains={'redbull.com': (1, 1)})
+        
+        limiter.reserve('https://www.redbull.com/a')
+        self.assertGreater(limiter.reserve('https://redbull.com/b'), 0.0)
+    
+    def test_metrics(self):
+        """Test that wait-time metrics are recorded per host"""
+        limiter = DomainRateLimiter(default_rate=10, default_burst=1)
+        
+        limiter.reserve('https://fms.tv/1')
+        limiter.reserve('https://fms.tv/2')
+        metrics = limiter.get_metrics()['fms.tv']
+        
+        self.assertEqual(metrics['requests'], 2)
+        self.assertEqual(metrics['waits'], 1)
+        self.assertGreater(metrics['total_wait'], 0)
+        self.assertEqual(metrics['max_wait'], metrics['total_wait'])
+        
+        limiter.reset_metrics()
+        self.assertEqual(limiter.get_metrics(), {})
+    
+    def test_parallel_hosts_do_not_block_each_other(self):
+        """Test that throttling one host does not slow down another"""
+        limiter = DomainRateLimiter(default_rate=5, default_burst=1)
+        elapsed = {}
+        
+        def worker(url, count):
+            start = time.monotonic()
+            for _ in range(count):
+                limiter.acquire(url)
+            elapsed[url] = time.monotonic() - start
+        
+        threads = [
+            threading.Thread(target=worker, args=('https://fms.tv/', 3)),
+            threading.Thread(target=worker, args=('https://godlevel.es/', 1)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertGreaterEqual(elapsed['https://fms.tv/'], 0.35)
+        self.assertLess(elapsed['https://godlevel.es/'], 0.1)
+
+
+class TestScraperSession(unittest.TestCase):
+    """Test cases for ScraperSession"""
+    
+    def setUp(self):
+        """Set up a temporary HTTP cache"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = HTTPCache(os.path.join(self.temp_dir.name, 'http_cache.db'))
+    
+    def tearDown(self):
+        """Clean up the temporary HTTP cache"""
+        self.cache.close()
+        self.temp_dir.cleanup()
+    
+    def test_default_headers(self):
+        """Test that sessions carry the common scraping headers"""
+        session = create_session()
+        
+        self.assertIsInstance(session, ScraperSession)
+        self.assertIn('Mozilla', session.headers['User-Agent'])
+    
+    @patch('requests.Session.request')
+    def test_requests_go_through_limiter(self, mock_request):
+        """Test that every request waits for its host's turn"""
+        mock_request.return_value = make_response()
+        limiter = DomainRateLimiter(default_rate=100, default_burst=5)
+        session = create_session(limiter, self.cache, breaker=CircuitBreaker(None))
+        
+        session.get('https://fms.tv/calendario', timeout=5)
+        
+        mock_request.assert_called_once()
+        self.assertEqual(limiter.get_metrics()['fms.tv']['requests'], 1)
+
+
+
+class TestHTTPCache(unittest.TestCase):
+    """Test cases for the persistent HTTP cache"""
+    
+    def setUp(self):
+        """Set up a temporary HTTP cache and a session using it"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = HTTPCache(os.path.join(self.temp_dir.name, 'http_cache.db'), ttl=60)
+        self.session = create_session(DomainRateLimiter(default_rate=1000, default_burst=100), self.cache,
+                                      breaker=CircuitBreaker(None), retry=RetryPolicy(retries=0))
+    
+    def tearDown(self):
+        """Clean up the temporary HTTP cache"""
+        self.cache.close()
+        self.temp_dir.cleanup()
+    
+    @patch('requests.Session.request')
+    def test_fresh_entry_skips_network(self, mock_request):
+        """Test that a fresh entry is served without a request"""
+        mock_request.return_value = make_response(body=b'calendar')
+        
+        first = self.session.get('https://fms.tv/calendario', timeout=5)
+        second = self.session.get('https://fms.tv/calendario', timeout=5)
+        
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(first.content, b'calendar')
+        self.assertEqual(second.content, b'calendar')
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.from_cache)
+    
+    @patch('requests.Session.request')
+    def test_stale_entry_revalidates_with_304(self, mock_request):
+        """Test conditional revalidation and 304 handling"""
+        self.cache.ttl = 0
+        mock_request.return_value = make_response(body=b'calendar', headers={
+            'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Oct 2025 10:00:00 GMT'
+        })
+        self.session.get('https://fms.tv/calendario', timeout=5)
+        
+        mock_request.return_value = make_response(status=304, body=b'')
+        response = self.session.get('https://fms.tv/calendario', timeout=5)
+        
+        sent_headers = mock_request.call_args.kwargs['headers']
+        self.assertEqual(sent_headers['If-None-Match'], '"v1"')
+        self.assertEqual(sent_headers['If-Modified-Since'], 'Wed, 01 Oct 2025 10:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'calendar')
+        self.assertEqual(self.cache.get_stats()['revalidations'], 1)
+    
+    @patch('requests.Session.request')
+    def test_changed_page_replaces_entry(self, mock_request):
+        """Test that a 200 on revalidation stores the new body"""
+        self.cache.ttl = 0
+        mock_request.return_value = make_response(body=b'old', headers={'ETag': '"v1"'})
+        self.session.get('https://fms.tv/calendario')
+        
+        mock_request.return_value = make_response(body=b'new', headers={'ETag': '"v2"'})
+        self.session.get('https://fms.tv/calendario')
+        
+        mock_request.return_value = make_response(status=304, body=b'')
+        response = self.session.get('https://fms.tv/calendario')
+        self.assertEqual(response.content, b'new')
+        self.assertEqual(mock_request.call_args.kwargs['headers']['If-None-Match'], '"v2"')
+    
+    @patch('requests.Session.request')
+    def test_errors_and_no_store_are_not_cached(self, mock_request):
+        """Test that only cacheable 200 responses are stored"""
+        mock_request.return_value = make_response(status=500)
+        self.session.get('https://fms.tv/a')
+        mock_request.return_value = make_response(headers={'Cache-Control': 'no-store'})
+        self.session.get('https://fms.tv/b')
+        
+        self.assertEqual(self.cache.get_stats()['entries'], 0)
+    
+    def test_key_depends_on_relevant_headers(self):
+        """Test that the key includes the headers that change the representation"""
+        url = 'https://fms.tv/calendario'
+        
+        self.assertNotEqual(HTTPCache.key_for(url, {'Accept-Language': 'es'}),
+                            HTTPCache.key_for(url, {'Accept-Language': 'en'}))
+        self.assertEqual(HTTPCache.key_for(url, {'Accept-Language': 'es', 'X-Other': '1'}),
+                         HTTPCache.key_for(url, {'accept-language': 'es'}))
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are evicted past max_bytes"""
+        self.cache.max_bytes = 25
+        
+        self.cache.store('a', 'https://x/a', make_response(body=b'a' * 10))
+        time.sleep(0.01)
+        self.cache.store('b', 'https://x/b', make_response(body=b'b' * 10))
+        time.sleep(0.01)
+        self.cache.get('a')  # 'a' becomes the most recently used
+        time.sleep(0.01)
+        self.cache.store('c', 'https://x/c', make_response(body=b'c' * 10))
+        
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+
+if __name__ == '__main__':
+    # Run the tests
+    unittest.main(verbosity=2)
+
+
+class TestResilience(unittest.TestCase):
+    """Test cases for retries and the per-host circuit breaker"""
+    
+    def setUp(self):
+        """Set up a session with a breaker persisted in a temporary directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'breakers.json')
+        self.breaker = CircuitBreaker(self.path, failure_threshold=3, cooldown=60)
+        self.session = create_session(DomainRateLimiter(default_rate=1000, default_burst=100),
+                                      use_cache=False, breaker=self.breaker,
+                                      retry=RetryPolicy(retries=2, backoff=0.01))
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    @patch('time.sleep')
+    @patch('requests.Session.request')
+    def test_connection_errors_are_retried(self, mock_request, mock_sleep):
+        """Test that a transient connection error is retried with backoff"""
+        mock_request.side_effect = [requests.ConnectionError('reset'), make_response()]
+        
+        response = self.session.get('https://fms.tv/calendario')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertEqual(self.breaker.state('fms.tv'), 'closed')
+    
+    @patch('time.sleep')
+    @patch('requests.Session.request')
+    def test_read_timeouts_and_client_errors_are_not_retried(self, mock_request, mock_sleep):
+        """Test that only retryable failures get another attempt"""
+        mock_request.side_effect = requests.ReadTimeout('slow')
+        with self.assertRaises(requests.ReadTimeout):
+            self.session.get('https://fms.tv/a')
+        
+        mock_request.side_effect = None
+        mock_request.return_value = make_response(status=404)
+        self.assertEqual(self.session.get('https://fms.tv/b').status_code, 404)
+        
+        self.assertEqual(mock_request.call_count, 2)
+        mock_sleep.assert_not_called()
+    
+    @patch('time.sleep')
+    @patch('requests.Session.request')
+    def test_retry_after_is_respected(self, mock_request, mock_sleep):
+        """Test that 503 responses are retried after the Retry-After delay"""
+        mock_request.side_effect = [make_response(status=503, headers={'Retry-After': '2'}),
+                                    make_response()]
+        
+        self.assertEqual(self.session.get('https://fms.tv/').status_code, 200)
+        mock_sleep.assert_called_once_with(2.0)
+    
+    @patch('time.sleep')
+    @patch('requests.Session.request')
+    def test_breaker_opens_and_short_circuits(self, mock_request, mock_sleep):
+        """Test that a dead host stops costing requests and the state persists"""
+        mock_request.side_effect = requests.ConnectionError('down')
+        
+        with self.assertRaises(requests.ConnectionError):
+            self.session.get('https://godlevel.es/eventos')
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertEqual(self.breaker.state('godlevel.es'), 'open')
+        
+        start = time.monotonic()
+        with self.assertRaises(CircuitOpenError):
+            self.session.get('https://godlevel.es/otra')
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertEqual(mock_request.call_count, 3)
+        
+        # Other hosts are unaffected and a new run sees the open circuit
+        mock_request.side_effect = None
+        mock_request.return_value = make_response()
+        self.assertEqual(self.session.get('https://fms.tv/').status_code, 200)
+        self.assertEqual(CircuitBreaker(self.path, cooldown=60).state('godlevel.es'), 'open')
+    
+    @patch('requests.Session.request')
+    def test_half_open_trial_closes_circuit(self, mock_request):
+        """Test that after the cool-down one trial request is let through"""
+        breaker = CircuitBreaker(self.path, failure_threshold=1, cooldown=0)
+        session = create_session(DomainRateLimiter(default_rate=1000, default_burst=100),
+                                 use_cache=False, breaker=breaker, retry=RetryPolicy(retries=0))
+        mock_request.side_effect = requests.ConnectionError('down')
+        with self.assertRaises(requests.ConnectionError):
+            session.get('https://fms.tv/')
+        self.assertEqual(breaker.state('fms.tv'), 'half-open')
+        
+        mock_request.side_effect = None
+        mock_request.return_value = make_response()
+        self.assertEqual(session.get('https://fms.tv/').status_code, 200)
+        self.assertEqual(breaker.state('fms.tv'), 'closed')
+        self.assertEqual(breaker.get_stats(), {})
+
+
+class TestAsyncFetcher(unittest.TestCase):
+    """Test cases for the shared async fetch layer"""
+    
+    def setUp(self):
+        """Set up a fetcher over a session that never touches the network"""
+        self.session = create_session(DomainRateLimiter(default_rate=1000, default_burst=100),
+                                      use_cache=False, breaker=CircuitBreaker(None),
+                                      retry=RetryPolicy(retries=0), per_host_limit=2)
+        self.fetcher = AsyncFetcher(self.session, max_workers=8)
+        self.in_flight = {}
+        self.peak = {}
+        self.lock = threading.Lock()
+    
+    def tearDown(self):
+        self.fetcher.close()
+    
+    def fake_get(self, method, url, **kwargs):
+        """Record how many requests per host are in flight at once"""
+        host = url.split('/')[2]
+        with self.lock:
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.in_flight[host])
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight[host] -= 1
+        if 'fail' in url:
+            raise requests.ConnectionError(url)
+        return make_response(body=url.encode())
+    
+    def test_fetch_many_keeps_order_and_host_limit(self):
+        """Test that results come back in order and each host stays under its limit"""
+        urls = [f'https://fms.tv/{i}' for i in range(6)] + [f'https://godlevel.es/{i}' for i in range(2)]
+        
+        with patch('requests.Session.request', side_effect=self.fake_get):
+            start = time.monotonic()
+            responses = self.fetcher.fetch_many(urls)
+            elapsed = time.monotonic() - start
+        
+        self.assertEqual([r.content.decode() for r in responses], urls)
+        self.assertEqual(self.peak['fms.tv'], 2)
+        self.assertLess(elapsed, 6 * 0.05)
+    
+    def test_errors_are_returned_in_place(self):
+        """Test that a failed URL does not cancel the others"""
+        with patch('requests.Session.request', side_effect=self.fake_get):
+            responses = self.fetcher.fetch_many(['https://fms.tv/ok', 'https://fms.tv/fail'])
+        
+        self.assertEqual(responses[0].status_code, 200)
+        self.assertIsInstance(responses[1], requests.ConnectionError)
+    
+    def test_direct_session_requests_share_host_limit(self):
+        """Test that session.get from several threads and fetch_many share one per-host limit"""
+        urls = [f'https://fms.tv/{i}' for i in range(4)]
+        with patch('requests.Session.request', side_effect=self.fake_get):
+            threads = [threading.Thread(target=self.session.get, args=(f'https://fms.tv/direct/{i}',))
+                       for i in range(4)]
+            for thread in threads:
+                thread.start()
+            self.fetcher.fetch_many(urls)
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(self.peak['fms.tv'], 2)
+        self.assertEqual(self.fetcher.per_host_limit, 2)
+    
+    def test_scrapers_share_one_session(self):
+        """Test that keep-alive connections are shared across scrapers"""
+        self.assertIs(FMSScraper().session, GodLevelScraper().session)
+
+
+class TestTimeBudget(unittest.TestCase):
+    """Test cases for the per-run and per-scraper time budgets"""
+    
+    def setUp(self):
+        """Set up a session with an isolated breaker and no cache"""
+        self.breaker = CircuitBreaker(None)
+        self.session = create_session(DomainRateLimiter(default_rate=1000, default_burst=100),
+                                      use_cache=False, breaker=self.breaker,
+                                      retry=RetryPolicy(retries=2, backoff=0.01))
+    
+    def test_check_clamps_timeout(self):
+        """Test that request timeouts never outlive the budget"""
+        self.assertEqual(TimeBudget().check('https://fms.tv/', 10), 10)
+        
+        budget = TimeBudget(2)
+        self.assertLessEqual(budget.check('https://fms.tv/', 10), 2)
+        self.assertEqual(budget.check('https://fms.tv/', 1), 1)
+        self.assertLessEqual(budget.check('https://fms.tv/'), 2)
+        self.assertFalse(budget.exhausted)
+    
+    def test_child_never_outlives_parent(self):
+        """Test that a scraper budget is capped by the run deadline"""
+        run = TimeBudget(1)
+        self.assertLessEqual(run.child(60).remaining(), 1)
+        self.assertLessEqual(run.child(0.5).remaining(), 0.5)
+        self.assertIsNone(TimeBudget().child(None).remaining())
+    
+    def test_scope_is_restored(self):
+        """Test that budget_scope only applies inside the block"""
+        budget = TimeBudget(5)
+        with budget_scope(budget):
+            self.assertIs(current_budget(), budget)
+        self.assertIsNone(current_budget())
+    
+    @patch('requests.Session.request')
+    def test_expired_budget_skips_network(self, mock_request):
+        """Test that an exhausted budget fails fast without charging the breaker"""
+        budget = TimeBudget(0)
+        with budget_scope(budget):
+            with self.assertRaises(BudgetExceededError):
+                self.session.get('https://fms.tv/')
+        
+        mock_request.assert_not_called()
+        self.assertTrue(budget.exhausted)
+        self.assertEqual(self.breaker.get_stats(), {})
+    
+    @patch('time.sleep')
+    @patch('requests.Session.request')
+    def test_timeout_passed_to_request_is_clamped(self, mock_request, mock_sleep):
+        """Test that the remaining budget becomes the request timeout"""
+        mock_request.return_value = make_response()
+        with budget_scope(TimeBudget(3)):
+            self.session.get('https://fms.tv/', timeout=10)
+        
+        self.assertLessEqual(mock_request.call_args.kwargs['timeout'], 3)
+    
+    @patch('requests.Session.request')
+    def test_waiting_for_the_limiter_spends_budget(self, mock_request):
+        """Test that time queued for a host slot or token is taken from the budget"""
+        mock_request.return_value = make_response()
+        original_acquire = self.session.limiter.acquire
+        
+        def slow_acquire(url):
+            time.sleep(0.2)
+            original_acquire(url)
+        
+        with patch.object(self.session.limiter, 'acquire', side_effect=slow_acquire):
+            with budget_scope(TimeBudget(1)):
+                self.session.get('https://fms.tv/', timeout=10)
+            self.assertLessEqual(mock_request.call_args.kwargs['timeout'], 0.8)
+            
+            mock_request.reset_mock()
+            budget = TimeBudget(0.1)
+            with budget_scope(budget):
+                with self.assertRaises(BudgetExceededError):
+                    self.session.get('https://fms.tv/')
+        
+        mock_request.assert_not_called()
+        self.assertTrue(budget.exhausted)
+        self.assertEqual(self.breaker.state('fms.tv'), 'closed')
+    
+    @patch('requests.Session.request')
+    def test_half_open_trial_released_when_budget_runs_out(self, mock_request):
+        """Test that a trial request cut short by the budget does not block the host"""
+        breaker = CircuitBreaker(None, failure_threshold=1, cooldown=0)
+        session = create_session(DomainRateLimiter(default_rate=1000, default_burst=100),
+                                 use_cache=False, breaker=breaker, retry=RetryPolicy(retries=0))
+        mock_request.side_effect = requests.ConnectionError('down')
+        with self.assertRaises(requests.ConnectionError):
+            session.get('https://fms.tv/')
+        self.assertEqual(breaker.state('fms.tv'), 'half-open')
+        
+        # The trial times out exactly when the budget runs out
+        budget = TimeBudget(0.05)
+        def slow_timeout(*args, **kwargs):
+            time.sleep(0.06)
+            raise requests.ReadTimeout('slow')
+        mock_request.side_effect = slow_timeout
+        with budget_scope(budget):
+            with self.assertRaises(BudgetExceededError):
+                session.get('https://fms.tv/')
+        
+        # The host was not charged and the next request is let through as a new trial
+        mock_request.side_effect = None
+        mock_request.return_value = make_response()
+        self.assertEqual(session.get('https://fms.tv/').status_code, 200)
+        self.assertEqual(breaker.state('fms.tv'), 'closed')
+    
+    @patch('requests.Session.request')
+    def test_budget_reaches_fetcher_threads(self, mock_request):
+        """Test that fetch_many requests see the budget of the calling scraper"""
+        fetcher = AsyncFetcher(session=self.session)
+        self.addCleanup(fetcher.close)
+        budget = TimeBudget(0)
+        
+        with budget_scope(budget):
+            results = fetcher.fetch_many(['https://fms.tv/a', 'https://godlevel.es/b'])
+        
+        self.assertTrue(all(isinstance(r, BudgetExceededError) for r in results))
+        mock_request.assert_not_called()
+        self.assertTrue(budget.exhausted)
@@ -5,8 +5,12 @@ import unittest
 import tempfile
 import os
 import sys
+import threading
+import time
 from unittest.mock import patch
 
+import requests
+
 # Add the project root to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
@@ -26,11 +30,12 @@ class TestSystemIntegration(unittest.TestCase):
     
     def tearDown(self):
         """Clean up integration test environment"""
-        try:
-            os.unlink(self.temp_db.name)
-            os.unlink(self.temp_csv.name)
-        except Exception:
-            pass
+        for path in (self.temp_db.name, self.temp_db.name + '-wal',
+                     self.temp_db.name + '-shm', self.temp_csv.name):
+            try:
+                os.unlink(path)
+            except Exception:
+                pass
     
     def test_end_to_end_scraping_workflow(self):
         """Test complete scraping workflow"""
@@ -200,6 +205,467 @@ class TestSystemIntegration(unittest.TestCase):
             self.assertIn('organizador', event)
 
 
+class _FakeScraper:
+    """Fake scraper that waits for a barrier or an event before returning its events"""
+
+    def __init__(self, name, barrier=None, release=None):
+        self.name = name
+        self.barrier = barrier
+        self.release = release
+
+    def scrape_events(self):
+        if self.barrier is not None:
+            # Only passes if every source is running at the same time
+            self.barrier.wait()
+        if self.release is not None:
+            self.release.wait(30)
+        return [{
+            'nombre': f'{self.name} Battle',
+            'fecha': '2025-09-15',
+            'hora': '20:00',
+            'ciudad': 'Madrid',
+            'pais': 'España',
+            'venue': 'Venue',
+            'organizador': self.name,
+            'link_oficial': 'https://test.com',
+            'descripcion': f'{self.name} event'
+        }]
+
+
+class _PagedScraper:
+    """Fake scraper that downloads one page per event through the shared session"""
+
+    def __init__(self, name, session, pages=20):
+        self.name = name
+        self.session = session
+        self.pages = pages
+
+    def scrape_events(self):
+        from scraper.budget import BudgetExceededError
+
+        events = []
+        for page in range(self.pages):
+            try:
+                self.session.get(f'https://{self.name}.test/page/{page}')
+            except BudgetExceededError:
+                break
+            events.append({
+                'nombre': f'{self.name} Battle {page}',
+                'fecha': '2025-09-15',
+                'pais': 'España',
+                'organizador': self.name,
+            })
+        return events
+
+
+class TestRunAllScrapers(unittest.TestCase):
+    """Tests for the concurrent execution modes of run_all.py"""
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_db.close()
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(self.temp_db.name + suffix)
+            except Exception:
+                pass
+
+    def _run(self, mode):
+        from scraper import run_all
+
+        barrier = threading.Barrier(5, timeout=10)
+        scrapers = [(f'Source {i}', _FakeScraper(f'Source {i}', barrier=barrier)) for i in range(5)]
+        writer_threads = set()
+        db = EventDatabase(self.temp_db.name)
+        original_insert = db.insert_events
+
+        def tracking_insert(events):
+            writer_threads.add(threading.get_ident())
+            return original_insert(events)
+
+        db.insert_events = tracking_insert
+
+        with patch.object(run_all, 'get_scrapers', return_value=scrapers), \
+             patch.object(run_all, 'EventDatabase', return_value=db), \
+             patch.object(run_all.CSVExporter, 'open_stream'):
+            summary = run_all.run_all_scrapers(mode=mode, max_workers=5)
+
+        return db, writer_threads, summary
+
+    def test_concurrent_modes_write_all_events_from_one_thread(self):
+        """Threads and asyncio modes run in parallel and funnel writes through one thread"""
+        for mode in ('threads', 'asyncio'):
+            with self.subTest(mode=mode):
+                db, writer_threads, summary = self._run(mode)
+                # Run one after another, the sources would break the barrier and fail
+                self.assertEqual(summary['errores'], [])
+                self.assertEqual(len(db.get_all_events()), 5)
+                self.assertEqual(writer_threads, {threading.get_ident()})
+
+    def test_source_budget_keeps_partial_results(self):
+        """A source that runs out of time keeps the events it already parsed"""
+        from scraper import run_all
+        from scraper.ratelimit import DomainRateLimiter
+        from scraper.resilience import CircuitBreaker, RetryPolicy
+        from scraper.session import create_session
+
+        session = create_session(DomainRateLimiter(default_rate=1000, default_burst=100),
+                                 use_cache=False, breaker=CircuitBreaker(None),
+                                 retry=RetryPolicy(retries=0))
+        scrapers = [('Slow', _PagedScraper('slow', session)),
+                    ('Fast', _PagedScraper('fast', session, pages=2))]
+        db = EventDatabase(self.temp_db.name)
+
+        def slow_request(method, url, **kwargs):
+            if 'slow' in url:
+                time.sleep(0.2)
+            response = requests.Response()
+            response.status_code = 200
+            response._content = b'<html></html>'
+            response._content_consumed = True
+            return response
+
+        with patch.object(run_all, 'get_scrapers', return_value=scrapers), \
+             patch.object(run_all, 'EventDatabase', return_value=db), \
+             patch.object(run_all.CSVExporter, 'open_stream'), \
+             patch('requests.Session.request', side_effect=slow_request):
+            # 20 slow pages need 4s: well past the budget, with room for a loaded machine
+            summary = run_all.run_all_scrapers(mode='threads', source_budget=1)
+
+        self.assertEqual(summary['parciales'], ['Slow'])
+        self.assertEqual(summary['errores'], [])
+        slow_events = [e for e in db.get_all_events() if e['organizador'] == 'slow']
+        self.assertGreater(len(slow_events), 0)
+        self.assertLess(len(slow_events), 20)
+        self.assertEqual(len(db.get_all_events()) - len(slow_events), 2)
+
+    def test_deadline_stops_waiting_for_stuck_sources(self):
+        """A run with a deadline returns even if a scraper never finishes"""
+        from scraper import run_all
+
+        release = threading.Event()
+        scrapers = [('Stuck', _FakeScraper('Stuck', release=release)), ('Quick', _FakeScraper('Quick'))]
+        db = EventDatabase(self.temp_db.name)
+
+        try:
+            for mode in ('threads', 'asyncio'):
+                with self.subTest(mode=mode), \
+                     patch.object(run_all, 'get_scrapers', return_value=scrapers), \
+                     patch.object(run_all, 'EventDatabase', return_value=db), \
+                     patch.object(run_all.CSVExporter, 'open_stream'), \
+                     patch.object(run_all, 'DEADLINE_GRACE', 0.1):
+                    summary = run_all.run_all_scrapers(mode=mode, deadline=1)
+                    # Returning at all means the stuck source was abandoned
+                    self.assertEqual(summary['errores'], ['Stuck'])
+                    self.assertEqual(summary['total_eventos'], 1)
+        finally:
+            release.set()
+
+    def test_stuck_sources_do_not_keep_the_process_alive(self):
+        """Scrapers still running past the deadline are in daemon threads, not joined at exit"""
+        from scraper import run_all
+
+        release = threading.Event()
+        threads = []
+
+        class _StuckScraper:
+            def scrape_events(self):
+                threads.append(threading.current_thread())
+                release.wait(10)
+                return []
+
+        db = EventDatabase(self.temp_db.name)
+        try:
+            for mode in ('threads', 'asyncio'):
+                with self.subTest(mode=mode), \
+                     patch.object(run_all, 'get_scrapers', return_value=[('Stuck', _StuckScraper())]), \
+                     patch.object(run_all, 'EventDatabase', return_value=db), \
+                     patch.object(run_all.CSVExporter, 'open_stream'), \
+                     patch.object(run_all, 'DEADLINE_GRACE', 0):
+                    summary = run_all.run_all_scrapers(mode=mode, deadline=0.1)
+                    self.assertEqual(summary['errores'], ['Stuck'])
+                    self.assertTrue(threads[-1].is_alive())
+                    self.assertTrue(threads[-1].daemon)
+        finally:
+            release.set()
+
+    def test_invalid_mode(self):
+        """Unknown execution modes are rejected"""
+        from scraper import run_all
+
+        with self.assertRaises(ValueError):
+            run_all.run_all_scrapers(mode='invalid')
+
+
+class _StreamingScraper:
+    """Fake scraper that yields its events one by one, optionally pausing after the first
+
+    With ``resume`` it waits for that event before yielding the rest, and it
+    appends to ``log`` when it finishes.
+    """
+
+    def __init__(self, name, count=3, resume=None, log=None):
+        self.name = name
+        self.count = count
+        self.resume = resume
+        self.log = log if log is not None else []
+
+    def iter_events(self):
+        for i in range(self.count):
+            if i and self.resume is not None:
+                self.resume.wait(10)
+            yield {
+                'nombre': f'{self.name} Battle {i}',
+                'fecha': '2025-09-15',
+                'pais': 'España',
+                'organizador': self.name,
+            }
+        self.log.append(f'{self.name} done')
+
+
+class TestEventPipeline(unittest.TestCase):
+    """Tests for the streaming pipeline between the scrapers and the database"""
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_db.close()
+        self.db = EventDatabase(self.temp_db.name)
+
+    def tearDown(self):
+        self.db.close()
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(self.temp_db.name + suffix)
+            except Exception:
+                pass
+
+    def _track_inserts(self, callback):
+        """Call callback with every batch written to the test database"""
+        original_insert = self.db.insert_events
+
+        def tracking_insert(events):
+            callback(events)
+            return original_insert(events)
+
+        self.db.insert_events = tracking_insert
+
+    def test_stages(self):
+        """Invalid events are dropped, text is normalized and identical repeats are skipped"""
+        from scraper.pipeline import EventPipeline, SourceEnd
+
+        event = {'nombre': ' Battle ', 'fecha': '15/09/2025', 'organizador': 'Org', 'venue': 'A'}
+        items = [
+            ('A', event),
+            ('A', {'nombre': 'No date', 'organizador': 'Org'}),
+            ('A', dict(event)),
+            ('A', dict(event, venue='B')),
+            ('A', SourceEnd()),
+        ]
+        batches = []
+        ends = []
+        pipeline = EventPipeline(self.db, on_source_end=lambda *args: ends.append(args))
+        self._track_inserts(batches.append)
+
+        stats = pipeline.run(items)
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual([e['venue'] for e in batches[0]], ['A', 'B'])
+        self.assertEqual(batches[0][0]['nombre'], 'Battle')
+        self.assertEqual(batches[0][0]['fecha'], '2025-09-15')
+        self.assertEqual(event['nombre'], ' Battle ')
+        self.assertEqual(ends, [('A', 2, None)])
+        self.assertEqual(stats.total, 2)
+        # The later version wins in the database, as before
+        self.assertEqual([e['venue'] for e in self.db.get_all_events()], ['B'])
+
+    def test_batches_flush_at_size_and_source_end(self):
+        """Batches never exceed batch_size and a finished source is written right away"""
+        from scraper.pipeline import EventPipeline, SourceEnd
+
+        items = [('A', {'nombre': f'A {i}', 'fecha': '2025-09-15', 'organizador': 'A'}) for i in range(5)]
+        items.append(('A', SourceEnd()))
+        items.append(('B', {'nombre': 'B 0', 'fecha': '2025-09-16', 'organizador': 'B'}))
+        items.append(('B', SourceEnd(ValueError('boom'))))
+        sizes = []
+        ends = []
+        self._track_inserts(lambda events: sizes.append(len(events)))
+
+        EventPipeline(self.db, batch_size=2, on_source_end=lambda *args: ends.append(args)).run(items)
+
+        self.assertEqual(sizes, [2, 2, 1, 1])
+        self.assertEqual([(name, saved) for name, saved, _ in ends], [('A', 5), ('B', 1)])
+        self.assertIsInstance(ends[1][2], ValueError)
+
+    def test_dedupe_forgets_finished_sources(self):
+        """Repeats are only tracked per source and dropped when the source ends"""
+        from scraper.pipeline import SourceEnd, dedupe
+
+        event = {'nombre': 'Battle', 'fecha': '2025-09-15', 'organizador': 'Org'}
+        items = [
+            ('A', event),
+            ('B', dict(event)),
+            ('A', dict(event)),
+            ('A', SourceEnd()),
+            ('A', dict(event)),
+            ('A', dict(event)),
+        ]
+
+        kept = [(name, isinstance(e, SourceEnd)) for name, e in dedupe(iter(items))]
+
+        self.assertEqual(kept, [('A', False), ('B', False), ('A', True), ('A', False)])
+
+    def test_upcoming_keeps_first_of_equal_dates(self):
+        """The summary keeps the soonest events without sorting the whole run"""
+        from scraper.pipeline import RunStats
+
+        stats = RunStats(upcoming_limit=3)
+        for i, fecha in enumerate(['2025-12-01', '2025-10-01', '2025-11-01', '2025-10-01', '2025-09-01']):
+            stats.add({'nombre': str(i), 'fecha': fecha, 'organizador': 'Org', 'pais': 'España'})
+
+        self.assertEqual([e['nombre'] for e in stats.upcoming], ['4', '1', '3'])
+        self.assertEqual(stats.organizers, {'Org': 5})
+
+    def test_channel_backpressure(self):
+        """A fast producer blocks on a full channel until the consumer catches up"""
+        from scraper.pipeline import EventChannel, SourceEnd
+
+        channel = EventChannel(maxsize=2)
+        events = ({'nombre': str(i)} for i in range(10))
+        producer = threading.Thread(target=channel.produce, args=('A', events))
+        producer.start()
+        time.sleep(0.2)
+
+        self.assertTrue(producer.is_alive())
+        self.assertEqual(channel._queue.qsize(), 2)
+
+        items = list(channel.items(['A'], timeout=5))
+        producer.join(timeout=1)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(len(items), 11)
+        self.assertIsInstance(items[-1][1], SourceEnd)
+
+    def test_closed_channel_releases_producers(self):
+        """Producers blocked on a full channel give up once the consumer leaves"""
+        from scraper.pipeline import EventChannel
+
+        channel = EventChannel(maxsize=1)
+        producer = threading.Thread(target=channel.produce,
+                                    args=('A', ({'nombre': str(i)} for i in range(10))))
+        producer.start()
+        items = channel.items(['A'], timeout=5)
+        next(items)
+        items.close()
+
+        producer.join(timeout=1)
+        self.assertFalse(producer.is_alive())
+
+    def test_first_rows_land_while_other_sources_run(self):
+        """Events are written as they arrive, not when every source has finished"""
+        from scraper import run_all
+
+        log = []
+        first_write = threading.Event()
+
+        def on_insert(events):
+            log.append('write')
+            first_write.set()
+
+        # Slow only finishes once something has been written
+        scrapers = [('Quick', _StreamingScraper('Quick', log=log)),
+                    ('Slow', _StreamingScraper('Slow', resume=first_write, log=log))]
+        self._track_inserts(on_insert)
+
+        for mode in ('sequential', 'threads'):
+            log.clear()
+            first_write.clear()
+            with self.subTest(mode=mode), \
+                 patch.object(run_all, 'get_scrapers', return_value=scrapers), \
+                 patch.object(run_all, 'EventDatabase', return_value=self.db), \
+                 patch.object(run_all.CSVExporter, 'open_stream'):
+                summary = run_all.run_all_scrapers(mode=mode)
+
+                self.assertEqual(summary['total_eventos'], 6)
+                self.assertLess(log.index('write'), log.index('Slow done'))
+
+class TestConcurrentReadWrite(unittest.TestCase):
+    """Stress test: the scraper writes while the web app reads the same database"""
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.temp_db.close()
+        self.writer_db = EventDatabase(self.temp_db.name)
+        self.reader_db = EventDatabase(self.temp_db.name)
+
+    def tearDown(self):
+        self.writer_db.close()
+        self.reader_db.close()
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(self.temp_db.name + suffix)
+            except Exception:
+                pass
+
+    def test_readers_never_block_on_writer(self):
+        """Many readers run alongside one writer without errors and with low p99 latency"""
+        batches, batch_size, readers = 30, 100, 8
+        writer_done = threading.Event()
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def writer():
+            try:
+                for b in range(batches):
+                    self.writer_db.insert_events([{
+                        'nombre': f'Stress Battle {b}-{i}',
+                        'fecha': f'2030-{b % 12 + 1:02d}-{i % 28 + 1:02d}',
+                        'pais': 'España' if i % 2 else 'México',
+                        'organizador': 'Stress Org',
+                        'descripcion': 'x' * 200
+                    } for i in range(batch_size)])
+                    if b % 10 == 9:
+                        self.writer_db.checkpoint()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                writer_done.set()
+
+        def reader():
+            seen = 0
+            local = []
+            try:
+                # At least one read per thread, even if the writer finishes first
+                while not local or not writer_done.is_set():
+                    start = time.perf_counter()
+                    total = len(self.reader_db.query_events(fields=['id']))
+                    self.reader_db.query_events(pais='España', limit=50)
+                    local.append(time.perf_counter() - start)
+                    # Each read sees a committed snapshot that only grows
+                    self.assertGreaterEqual(total, seen)
+                    seen = total
+            except Exception as e:
+                errors.append(e)
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.reader_db.get_all_events()), batches * batch_size)
+
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"\n{len(latencies)} reads with a concurrent writer: p99 {p99 * 1000:.1f} ms")
+        self.assertLess(p99, 1.0)
+
+
 class TestPerformance(unittest.TestCase):
     """Basic performance tests"""
     
@@ -239,10 +705,11 @@ class TestPerformance(unittest.TestCase):
             self.assertEqual(len(all_events), 100)
             
         finally:
-            try:
-                os.unlink(temp_db.name)
-            except Exception:
-                pass
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.unlink(temp_db.name + suffix)
+                except Exception:
+                    pass
 
 
 if __name__ == '__main__':
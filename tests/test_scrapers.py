@@ -2,9 +2,12 @@
 Unit tests for scrapers
 """
 import unittest
+import tempfile
+import time
+import json
 import sys
 import os
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
 # Add the project root to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -13,6 +16,44 @@ from scraper.redbull import RedBullScraper
 from scraper.fms import FMSScraper
 from scraper.godlevel import GodLevelScraper
 from scraper.supremacia import SupremaciaScraper
+from scraper.tickets import TicketsScraper
+from scraper.fingerprint import PageFingerprintStore
+from scraper import parsing
+from scraper.extraction import find_containers, FieldSpec, FieldSpecs, min_length
+from scraper.gazetteer import Gazetteer, gazetteer
+
+FMS_CALENDAR_HTML = b"""
+<html><body>
+  <div class="evento">
+    <h3>FMS Chile Jornada 4</h3>
+    <time datetime="2025-11-02">2 de noviembre</time>
+    <span class="location">Santiago, Chile</span>
+    <a href="/fms-chile">Ver</a>
+  </div>
+</body></html>
+"""
+
+NOISY_EVENTS_HTML = b"""
+<html><head><script>var tracking = '<div class="event">';</script></head><body>
+  <header class="site-header"><nav><a href="/">Inicio</a></nav></header>
+  <svg><path d="M0 0"/></svg>
+  <main>
+    <article class="card">
+      <h2>Batalla de Gallos Final Madrid</h2>
+      <time datetime="2025-10-12">12 octubre</time>
+      <span class="location">Madrid, Espa\xc3\xb1a</span>
+      <a href="/final">Ver</a>
+    </article>
+    <div class="event-item supremacia battle-result">
+      <h3>Freestyle Battle Chile Supremacia</h3>
+      <span class="date">2025-11-20</span>
+      <p class="location">Santiago, Chile</p>
+      <div class="evento"><h4>Batalla anidada Lima</h4><a href="/lima">Lima</a></div>
+    </div>
+  </main>
+  <footer><p>Pie</p></footer>
+</body></html>
+"""
 
 
 class TestRedBullScraper(unittest.TestCase):
@@ -46,7 +87,7 @@ class TestRedBullScraper(unittest.TestCase):
         test_cases = [
             ("Madrid, España", "Madrid"),
             ("Barcelona, Catalunya", "Barcelona"),
-            ("Ciudad de México", "México"),  # Actual behavior: returns matched city
+            ("Ciudad de México", "Ciudad de México"),  # Longest gazetteer match
             ("", ""),
             ("Unknown City", "Unknown City")
         ]
@@ -185,6 +226,393 @@ class TestSupremaciaScraper(unittest.TestCase):
         self.assertIsNotNone(self.scraper.session)
 
 
+class TestPageFingerprintStore(unittest.TestCase):
+    """Test cases for the page fingerprint store"""
+    
+    def setUp(self):
+        """Set up a temporary fingerprint store"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = PageFingerprintStore(os.path.join(self.temp_dir.name, 'fingerprints.db'))
+    
+    def tearDown(self):
+        """Clean up the temporary store"""
+        self.store.close()
+        self.temp_dir.cleanup()
+    
+    def test_fingerprint_ignores_whitespace(self):
+        """Test that whitespace-only changes keep the same fingerprint"""
+        self.assertEqual(PageFingerprintStore.fingerprint(b'<p>a  b</p>\n'),
+                         PageFingerprintStore.fingerprint(b'  <p>a\n\tb</p>'))
+        self.assertNotEqual(PageFingerprintStore.fingerprint(b'<p>a</p>'),
+                            PageFingerprintStore.fingerprint(b'<p>b</p>'))
+    
+    def test_get_or_parse(self):
+        """Test that unchanged pages reuse the stored events"""
+        parse = MagicMock(return_value=[{'nombre': 'Evento'}])
+        
+        first = self.store.get_or_parse('test', 'https://x/a', b'<html>1</html>', parse)
+        second = self.store.get_or_parse('test', 'https://x/a', b'<html>1</html>', parse)
+        
+        self.assertEqual(first, second)
+        self.assertEqual(parse.call_count, 1)
+        
+        self.store.get_or_parse('test', 'https://x/a', b'<html>2</html>', parse)
+        self.assertEqual(parse.call_count, 2)
+    
+    def test_format_version_invalidates_stored_events(self):
+        """Test that bumping FORMAT_VERSION forces pages to be parsed again"""
+        import scraper.fingerprint as fingerprint
+        parse = MagicMock(return_value=[{'nombre': 'Evento', 'fecha': '15/03/2025'}])
+        self.store.get_or_parse('test', 'https://x/a', b'<html>1</html>', parse)
+        
+        with patch.object(fingerprint, 'FORMAT_VERSION', fingerprint.FORMAT_VERSION + 1):
+            self.store.get_or_parse('test', 'https://x/a', b'<html>1</html>', parse)
+        
+        self.assertEqual(parse.call_count, 2)
+    
+    def test_gazetteer_change_invalidates_stored_events(self):
+        """Test that editing the gazetteer data forces pages to be parsed again"""
+        import scraper.fingerprint as fingerprint
+        parse = MagicMock(return_value=[{'nombre': 'Evento', 'pais': 'Chile'}])
+        self.store.get_or_parse('test', 'https://x/a', b'<html>1</html>', parse)
+        
+        same = Gazetteer(gazetteer.countries, gazetteer.cities, gazetteer.venues)
+        with patch.object(fingerprint, 'gazetteer', same):
+            self.store.get_or_parse('test', 'https://x/a', b'<html>1</html>', parse)
+        self.assertEqual(parse.call_count, 1)
+        
+        edited = Gazetteer(gazetteer.countries, dict(gazetteer.cities, **{'Viña del Mar': {'country': 'Chile'}}),
+                           gazetteer.venues)
+        with patch.object(fingerprint, 'gazetteer', edited):
+            self.store.get_or_parse('test', 'https://x/a', b'<html>1</html>', parse)
+        self.assertEqual(parse.call_count, 2)
+    
+    @patch('requests.Session.get')
+    def test_scraper_skips_parsing_unchanged_page(self, mock_get):
+        """Test that a scraper does not rebuild the DOM for an unchanged page"""
+        mock_get.return_value = MagicMock(status_code=200, content=FMS_CALENDAR_HTML)
+        scraper = FMSScraper()
+        scraper.fingerprints = self.store
+        
+        first = scraper._scrape_calendar_page()
+        with patch('scraper.fms.make_soup') as mock_soup:
+            second = scraper._scrape_calendar_page()
+            mock_soup.assert_not_called()
+        
+        self.assertGreater(len(first), 0)
+        self.assertEqual(first, second)
+
+
+class TestParsing(unittest.TestCase):
+    """Test cases for the HTML parsing factory"""
+    
+    def test_default_backend_is_lxml(self):
+        """Test that documents are parsed with lxml by default"""
+        soup = parsing.make_soup(FMS_CALENDAR_HTML)
+        self.assertEqual(soup.builder.NAME, 'lxml')
+        self.assertEqual(soup.select_one('.evento h3').get_text(), 'FMS Chile Jornada 4')
+    
+    def test_backends_agree(self):
+        """Test that every installed backend extracts the same events"""
+        for parser in parsing.available_parsers():
+            with self.subTest(parser=parser):
+                soup = parsing.make_soup(FMS_CALENDAR_HTML, parser=parser)
+                self.assertEqual(soup.select_one('time')['datetime'], '2025-11-02')
+    
+    def test_backends_extract_identical_events(self):
+        """Test that lxml and html.parser give every page parser the same events"""
+        cases = {
+            'fms': lambda html: FMSScraper()._parse_calendar_page(html),
+            'godlevel': lambda html: GodLevelScraper()._parse_events_page(html),
+            'redbull': lambda html: RedBullScraper()._parse_events_page(html),
+            'supremacia': lambda html: SupremaciaScraper()._parse_main_page(html),
+            'ticketmaster': lambda html: TicketsScraper()._parse_ticketmaster_results(html),
+            'passline': lambda html: TicketsScraper()._parse_passline_results(html),
+        }
+        for name, parse in cases.items():
+            for html in (FMS_CALENDAR_HTML, NOISY_EVENTS_HTML):
+                with self.subTest(parser=name):
+                    with patch.object(parsing, 'DEFAULT_PARSER', 'lxml'):
+                        fast = parse(html)
+                    with patch.object(parsing, 'DEFAULT_PARSER', 'html.parser'):
+                        reference = parse(html)
+                    self.assertEqual(fast, reference)
+                    if html is NOISY_EVENTS_HTML:
+                        self.assertGreater(len(reference), 0)
+    
+    def test_missing_backend_falls_back(self):
+        """Test that an uninstalled backend is replaced by the first available one"""
+        with patch.dict(parsing._available, {'html5lib': False}):
+            soup = parsing.make_soup(FMS_CALENDAR_HTML, parser='html5lib')
+        self.assertIn(soup.builder.NAME, parsing.available_parsers())
+        
+        with self.assertRaises(ValueError):
+            parsing.make_soup(FMS_CALENDAR_HTML, parser='regex')
+    
+    def test_empty_result_is_reparsed(self):
+        """Test that a parse that loses all markup is retried with another backend"""
+        empty = parsing.make_soup(b'', parser='html.parser')
+        with patch.object(parsing, 'BeautifulSoup', side_effect=[empty, parsing.BeautifulSoup(
+                FMS_CALENDAR_HTML, 'html.parser')]) as soup_class:
+            soup = parsing.make_soup(FMS_CALENDAR_HTML, parser='lxml')
+        
+        self.assertEqual(soup_class.call_count, 2)
+        self.assertIsNotNone(soup.select_one('.evento'))
+
+
+class TestPageStrainers(unittest.TestCase):
+    """Partial parsing must extract exactly what full parsing extracts"""
+    
+    def _assert_same_events(self, module, strainer_name, parse):
+        with patch.object(module, strainer_name, None):
+            full = parse()
+        partial = parse()
+        self.assertGreater(len(full), 0)
+        self.assertEqual(partial, full)
+    
+    @staticmethod
+    def _with_page(scraper, html=NOISY_EVENTS_HTML):
+        """Make every request of the scraper return the given page"""
+        scraper.session = MagicMock()
+        scraper.session.get.return_value = MagicMock(status_code=200, content=html)
+        return scraper
+    
+    def test_strainers_match_full_parse(self):
+        """Test every scraper page parser with and without its strainer"""
+        import scraper.fms, scraper.godlevel, scraper.redbull, scraper.supremacia, scraper.tickets
+        
+        cases = [
+            (scraper.fms, 'CALENDAR_STRAINER',
+             lambda: FMSScraper()._parse_calendar_page(NOISY_EVENTS_HTML)),
+            (scraper.godlevel, 'EVENTS_STRAINER',
+             lambda: GodLevelScraper()._parse_events_page(NOISY_EVENTS_HTML)),
+            (scraper.redbull, 'EVENTS_STRAINER',
+             lambda: RedBullScraper()._parse_events_page(NOISY_EVENTS_HTML)),
+            (scraper.supremacia, 'MAIN_PAGE_STRAINER',
+             lambda: SupremaciaScraper()._parse_main_page(NOISY_EVENTS_HTML)),
+            (scraper.tickets, 'TICKETMASTER_STRAINER',
+             lambda: TicketsScraper()._parse_ticketmaster_results(NOISY_EVENTS_HTML)),
+            (scraper.tickets, 'PASSLINE_STRAINER',
+             lambda: TicketsScraper()._parse_passline_results(NOISY_EVENTS_HTML)),
+            (scraper.supremacia, 'COUNTRY_PAGE_STRAINER',
+             lambda: SupremaciaScraper()._parse_country_page(NOISY_EVENTS_HTML, 'Chile')),
+            (scraper.godlevel, 'MAIN_PAGE_STRAINER',
+             lambda: self._with_page(GodLevelScraper())._scrape_main_page()),
+            (scraper.godlevel, 'TOURNAMENTS_STRAINER',
+             lambda: self._with_page(GodLevelScraper())._scrape_tournaments()),
+        ]
+        for module, strainer_name, parse in cases:
+            with self.subTest(scraper=module.__name__):
+                self._assert_same_events(module, strainer_name, parse)
+    
+    def test_strainer_skips_unrelated_markup(self):
+        """Test that headers, scripts and SVG are not materialized"""
+        from scraper.fms import CALENDAR_STRAINER
+        
+        soup = parsing.make_soup(NOISY_EVENTS_HTML, parse_only=CALENDAR_STRAINER)
+        
+        self.assertIsNone(soup.find('script'))
+        self.assertIsNone(soup.find('svg'))
+        self.assertIsNone(soup.find('header'))
+        self.assertEqual(len(soup.select('article.card')), 1)
+
+
+class TestExtraction(unittest.TestCase):
+    """Test cases for the single-pass container search"""
+    
+    HTML = b"""
+    <html><body>
+      <article class="card event"><h2>One</h2><div class="card-body"><p>x</p></div></article>
+      <section class="content">
+        <div class="event">Two</div>
+        <div class="event">Three</div>
+      </section>
+      <div class="item">Four</div>
+    </body></html>
+    """
+    
+    def test_overlapping_selectors_yield_each_container_once(self):
+        """Test that nested and multi-selector matches are returned once"""
+        soup = parsing.make_soup(self.HTML)
+        containers = find_containers(soup, ['article', '.card', 'div[class*="card"]', '.event',
+                                            '.content', '.item'])
+        
+        texts = [c.get_text(' ', strip=True) for c in containers]
+        self.assertEqual(texts, ['One x', 'Two', 'Three', 'Four'])
+        self.assertEqual(len({id(c) for c in containers}), len(containers))
+    
+    def test_limit(self):
+        """Test that the limit applies in document order"""
+        soup = parsing.make_soup(self.HTML)
+        self.assertEqual(len(find_containers(soup, ['.event', '.item'], limit=2)), 2)
+    
+    def test_scraper_parses_each_container_once(self):
+        """Test that the FMS scraper no longer parses the same node for several selectors"""
+        scraper = FMSScraper()
+        with patch.object(scraper, '_parse_fms_event', wraps=scraper._parse_fms_event) as parse:
+            events = scraper._parse_calendar_page(NOISY_EVENTS_HTML)
+        
+        parsed = [call.args[0] for call in parse.call_args_list]
+        self.assertEqual(len({id(element) for element in parsed}), len(parsed))
+        self.assertEqual(len({e['nombre'] for e in events}), len(events))
+
+
+class TestFieldSpecs(unittest.TestCase):
+    """Test cases for the declarative field extraction"""
+    
+    HTML = b"""
+    <div class="event">
+      <a href="/e/1">Go</a>
+      <h2>Batalla Final</h2>
+      <span class="date" datetime="2025-05-10">10 de mayo</span>
+      <p>Corta</p>
+    </div>
+    """
+    
+    def setUp(self):
+        self.element = parsing.make_soup(self.HTML).div
+    
+    def test_selectors_tried_in_priority_order(self):
+        """Test that the first validated value wins over document order"""
+        specs = FieldSpecs({
+            'title': FieldSpec(['h2', 'a'], validator=min_length(3)),
+            'short': FieldSpec(['a', 'h2']),
+            'first': FieldSpec(['h2, a'])
+        })
+        fields = specs.extract(self.element)
+        self.assertEqual(fields['title'], 'Batalla Final')
+        self.assertEqual(fields['short'], 'Go')
+        self.assertEqual(fields['first'], 'Go')
+    
+    def test_attribute_and_fallbacks(self):
+        """Test attribute values, the last-candidate fallback and missing fields"""
+        specs = FieldSpecs({
+            'date': FieldSpec(['.date'], attribute='datetime'),
+            'link': FieldSpec(['a'], attribute='href', text=False),
+            'desc': FieldSpec(['.description', 'p'], validator=min_length(20)),
+            'venue': FieldSpec(['.venue'])
+        })
+        fields = specs.extract(self.element)
+        self.assertEqual(fields['date'], '2025-05-10')
+        self.assertEqual(fields['link'], '/e/1')
+        self.assertEqual(fields['desc'], 'Corta')
+        self.assertIsNone(fields['venue'])
+    
+    def test_scrapers_keep_parsing_fixture(self):
+        """Test that the spec-driven scrapers still extract the fixture events"""
+        events = FMSScraper()._parse_calendar_page(NOISY_EVENTS_HTML)
+        self.assertTrue(events)
+        for event in events:
+            self.assertTrue(event['nombre'])
+            self.assertTrue(event['link_oficial'].startswith('http'))
+
+
+class TestGazetteer(unittest.TestCase):
+    """Test cases for the shared location resolver"""
+    
+    def test_resolve(self):
+        """Test that city, country and venue are resolved in one pass"""
+        test_cases = [
+            ("Madrid, España", {'ciudad': 'Madrid', 'pais': 'España', 'venue': ''}),
+            ("CDMX, Mexico", {'ciudad': 'Ciudad de México', 'pais': 'México', 'venue': ''}),
+            ("Santiago de Compostela", {'ciudad': 'Santiago de Compostela', 'pais': 'España', 'venue': ''}),
+            ("Luna Park", {'ciudad': 'Buenos Aires', 'pais': 'Argentina', 'venue': 'Luna Park'}),
+            ("Bogota", {'ciudad': 'Bogotá', 'pais': 'Colombia', 'venue': ''}),
+            ("California", {'ciudad': '', 'pais': '', 'venue': ''}),  # Whole words only
+            ("El formato usa dos rondas", {'ciudad': '', 'pais': '', 'venue': ''}),  # Spanish verb, not USA
+            ("", {'ciudad': '', 'pais': '', 'venue': ''})
+        ]
+        
+        for text, expected in test_cases:
+            with self.subTest(text=text):
+                self.assertEqual(gazetteer.resolve(text), expected)
+    
+    def test_load_from_file(self):
+        """Test that the gazetteer is built from a JSON data file"""
+        data = {
+            'countries': {'Chile': {'aliases': ['chile'], 'main_city': 'Santiago'}},
+            'cities': {'Valparaíso': {'country': 'Chile', 'aliases': ['valpo']}}
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump(data, f)
+        try:
+            custom = Gazetteer.load(f.name)
+        finally:
+            os.unlink(f.name)
+        
+        self.assertEqual(custom.resolve("Batalla en Valpo")['pais'], 'Chile')
+        self.assertEqual(custom.main_city('Chile'), 'Santiago')
+        self.assertEqual(custom.resolve("Madrid")['ciudad'], '')
+    
+    def test_scrapers_share_locations(self):
+        """Test that every scraper resolves the same location the same way"""
+        self.assertEqual(GodLevelScraper()._extract_country("Lima"), 'Perú')
+        self.assertEqual(TicketsScraper()._extract_city("Sala en Bogotá"), 'Bogotá')
+        self.assertEqual(SupremaciaScraper()._get_country_from_context('', 'Madrid', ''), 'España')
+        self.assertEqual(SupremaciaScraper()._get_country_from_context('peru', '', ''), 'Perú')
+
+
+class TestParallelFanOut(unittest.TestCase):
+    """Test cases for the concurrent per-country and per-keyword fetches"""
+    
+    DELAY = 0.1
+    
+    def setUp(self):
+        """Set up a temporary fingerprint store"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = PageFingerprintStore(os.path.join(self.temp_dir.name, 'fingerprints.db'))
+    
+    def tearDown(self):
+        """Clean up the temporary store"""
+        self.store.close()
+        self.temp_dir.cleanup()
+    
+    def fake_get(self, url, **kwargs):
+        """Answer each URL with one event named after its last path/query part"""
+        name = url.rstrip('/').split('/')[-1].split('=')[-1]
+        # The first URLs answer last, so completion order differs from request order
+        time.sleep(self.DELAY * (3 - len(self.seen) % 3))
+        self.seen.append(url)
+        if name == 'broken':
+            raise ConnectionError(url)
+        body = f'<div class="event"><h3>Batalla freestyle {name}</h3></div>'.encode()
+        return MagicMock(status_code=200, content=body)
+    
+    def test_supremacia_countries_fetched_concurrently(self):
+        """Test that country pages are fetched at once and merged in list order"""
+        scraper = SupremaciaScraper()
+        scraper.fingerprints = self.store
+        self.seen = []
+        
+        with patch.object(scraper.session, 'get', side_effect=self.fake_get):
+            start = time.monotonic()
+            events = scraper._scrape_latam_events()
+            elapsed = time.monotonic() - start
+        
+        self.assertEqual([e['nombre'] for e in events],
+                         [f"Supremacía MC - Batalla freestyle {country}"
+                          for country in ['mexico', 'colombia', 'argentina', 'chile', 'peru']])
+        self.assertLess(elapsed, 5 * self.DELAY * 2)
+    
+    def test_tickets_searches_fetched_concurrently(self):
+        """Test that Ticketmaster and Passline searches run together and one failure is isolated"""
+        scraper = TicketsScraper()
+        scraper.fingerprints = self.store
+        scraper.freestyle_keywords = ['freestyle', 'broken', 'batalla']
+        self.seen = []
+        
+        with patch.object(scraper.session, 'get', side_effect=self.fake_get):
+            events = scraper._run_searches(scraper._ticketmaster_searches() +
+                                           scraper._passline_searches())
+        
+        self.assertEqual(len(self.seen), 5)
+        self.assertEqual([e['descripcion'] for e in events], [
+            'Evento disponible en Ticketmaster: Batalla freestyle freestyle',
+            'Evento disponible en Ticketmaster: Batalla freestyle batalla',
+            'Evento disponible en Passline: Batalla freestyle freestyle'
+        ])
+
+
 class TestScraperIntegration(unittest.TestCase):
     """Integration tests for scrapers"""
     
@@ -4,14 +4,18 @@ Unit tests for scraper utilities
 import unittest
 import tempfile
 import os
+import shutil
 import sqlite3
 import sys
 from unittest.mock import patch
 
+import pandas as pd
+
 # Add the project root to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from scraper.utils import EventDatabase, ScrapingUtils, CSVExporter, validate_event
+from scraper.utils import EventDatabase, ScrapingUtils, CSVExporter, CSVStreamWriter, EVENT_FIELDS, validate_event
+from scraper.lru import LRUCache, TieredCache
 
 
 class TestEventDatabase(unittest.TestCase):
@@ -25,10 +29,12 @@ class TestEventDatabase(unittest.TestCase):
     
     def tearDown(self):
         """Clean up test database"""
-        try:
-            os.unlink(self.temp_db.name)
-        except Exception:
-            pass
+        self.db.close()
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(self.temp_db.name + suffix)
+            except Exception:
+                pass
     
     def test_database_creation(self):
         """Test database and table creation"""
@@ -108,6 +114,317 @@ class TestEventDatabase(unittest.TestCase):
         self.assertEqual(spain_events[0]['nombre'], 'Spain Battle')
         self.assertEqual(mexico_events[0]['nombre'], 'Mexico Battle')
 
+    
+    def _make_event(self, i, **overrides):
+        """Build a test event"""
+        event = {
+            'nombre': f'Bulk Battle {i}',
+            'fecha': '2025-09-15',
+            'hora': '20:00',
+            'ciudad': 'Madrid',
+            'pais': 'España',
+            'venue': f'Venue {i}',
+            'organizador': 'Test Org',
+            'link_oficial': f'https://test{i}.com',
+            'descripcion': f'Bulk event {i}'
+        }
+        event.update(overrides)
+        return event
+    
+    def test_bulk_insert_counts(self):
+        """Test inserted/updated/unchanged counts of bulk inserts"""
+        counts = self.db.bulk_insert_events((self._make_event(i) for i in range(25)), batch_size=10)
+        self.assertEqual((counts['inserted'], counts['updated'], counts['unchanged'], counts['errors']),
+                         (25, 0, 0, 0))
+        self.assertEqual(len(counts['changed_ids']), 25)
+        
+        events = [self._make_event(i) for i in range(20)]
+        events[0]['venue'] = 'Nuevo Venue'
+        events.append(self._make_event(99))
+        counts = self.db.bulk_insert_events(events, batch_size=7)
+        self.assertEqual((counts['inserted'], counts['updated'], counts['unchanged'], counts['errors']),
+                         (1, 1, 19, 0))
+        self.assertEqual(len(counts['changed_ids']), 2)
+        
+        all_events = self.db.get_all_events()
+        self.assertEqual(len(all_events), 26)
+        self.assertIn('Nuevo Venue', [e['venue'] for e in all_events])
+    
+    def test_bulk_insert_single_timestamp_per_batch(self):
+        """Test that every row of a batch shares the same scrape timestamp"""
+        self.db.bulk_insert_events([self._make_event(i) for i in range(50)], batch_size=50)
+        
+        timestamps = {e['fecha_scraping'] for e in self.db.get_all_events()}
+        self.assertEqual(len(timestamps), 1)
+    
+    def test_bulk_insert_duplicates_in_batch(self):
+        """Test that the last version of a repeated event wins"""
+        counts = self.db.bulk_insert_events([
+            self._make_event(1, venue='Primero'),
+            self._make_event(1, venue='Segundo')
+        ])
+        
+        self.assertEqual(counts['inserted'], 1)
+        events = self.db.get_all_events()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['venue'], 'Segundo')
+    
+    def test_upsert_keeps_event_ids(self):
+        """Test that updating an event keeps its id and reports it as changed"""
+        self.db.insert_events([self._make_event(1), self._make_event(2)])
+        ids_before = {e['nombre']: e['id'] for e in self.db.get_all_events()}
+        
+        counts = self.db.insert_events([self._make_event(1, hora='21:00'), self._make_event(2)])
+        ids_after = {e['nombre']: e['id'] for e in self.db.get_all_events()}
+        
+        self.assertEqual(ids_before, ids_after)
+        self.assertEqual(counts['changed_ids'], [ids_before['Bulk Battle 1']])
+    
+    def test_upsert_does_not_touch_unchanged_rows(self):
+        """Test that unchanged rows keep their previous scrape timestamp"""
+        self.db.insert_events([self._make_event(1)])
+        before = self.db.get_all_events()[0]['fecha_scraping']
+        
+        counts = self.db.insert_events([self._make_event(1)])
+        
+        self.assertEqual(counts['unchanged'], 1)
+        self.assertEqual(counts['changed_ids'], [])
+        self.assertEqual(self.db.get_all_events()[0]['fecha_scraping'], before)
+    
+    def test_replace_mode_reassigns_ids(self):
+        """Test that the legacy replace mode is still available"""
+        self.db.insert_events([self._make_event(1)])
+        old_id = self.db.get_all_events()[0]['id']
+        
+        self.db.insert_events([self._make_event(1, hora='21:00')], mode='replace')
+        
+        self.assertNotEqual(self.db.get_all_events()[0]['id'], old_id)
+        with self.assertRaises(ValueError):
+            self.db.insert_events([self._make_event(1)], mode='invalid')
+    
+    def test_query_events_filters(self):
+        """Test that filters are resolved in SQL with the original semantics"""
+        self.db.insert_events([
+            self._make_event(1, pais='España', organizador='Red Bull', fecha='2025-09-10'),
+            self._make_event(2, pais='México', organizador='FMS World Series', fecha='2025-09-20'),
+            self._make_event(3, pais='España', organizador='FMS World Series', fecha='2025-10-01'),
+        ])
+        
+        self.assertEqual(len(self.db.query_events()), 3)
+        self.assertEqual([e['nombre'] for e in self.db.query_events(pais='españa')],
+                         ['Bulk Battle 1', 'Bulk Battle 3'])
+        self.assertEqual(len(self.db.query_events(organizador='fms')), 2)
+        self.assertEqual(self.db.query_events(organizador='nadie'), [])
+        self.assertEqual([e['nombre'] for e in self.db.query_events(organizador_exacto='red bull')],
+                         ['Bulk Battle 1'])
+        self.assertEqual(self.db.query_events(organizador_exacto='FMS'), [])
+        self.assertEqual([e['nombre'] for e in self.db.query_events(fecha_desde='2025-09-15',
+                                                                    fecha_hasta='2025-09-30')],
+                         ['Bulk Battle 2'])
+        self.assertEqual([e['nombre'] for e in self.db.query_events(pais='España', organizador='FMS')],
+                         ['Bulk Battle 3'])
+    
+    def test_query_events_pagination(self):
+        """Test keyset pagination on (fecha, id) and field projection"""
+        self.db.insert_events([self._make_event(i, fecha='2025-09-10') for i in range(1, 4)] +
+                              [self._make_event(4, fecha='2025-09-01')])
+        
+        first = self.db.query_events(limit=2, fields=['fecha', 'id', 'nombre'])
+        self.assertEqual([e['nombre'] for e in first], ['Bulk Battle 4', 'Bulk Battle 1'])
+        self.assertEqual(set(first[0]), {'id', 'nombre', 'fecha'})
+        
+        last = first[-1]
+        rest = self.db.query_events(limit=10, after=(last['fecha'], last['id']))
+        self.assertEqual([e['nombre'] for e in rest], ['Bulk Battle 2', 'Bulk Battle 3'])
+        
+        with self.assertRaises(ValueError):
+            self.db.query_events(fields=['nombre', 'password'])
+    
+    def test_query_events_uses_indexes(self):
+        """Test that the filter queries are backed by indexes"""
+        conn = sqlite3.connect(self.temp_db.name)
+        plans = {
+            'pais': "SELECT * FROM eventos WHERE pais IN ('x') ORDER BY fecha, id",
+            'organizador': "SELECT * FROM eventos WHERE organizador IN ('x', 'y') ORDER BY fecha, id",
+            'fecha': "SELECT * FROM eventos WHERE fecha >= '2025-01-01' ORDER BY fecha, id",
+            'distinct': "SELECT valor FROM eventos_stats WHERE dimension = 'pais' AND valor != '' ORDER BY valor",
+        }
+        for name, sql in plans.items():
+            with self.subTest(filter=name):
+                plan = ' '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql))
+                self.assertRegex(plan, 'INDEX idx_eventos_|PRIMARY KEY')
+        conn.close()
+    
+    def test_filtered_queries_do_not_scan(self):
+        """Test that every statement run for a filtered query is an index search"""
+        self.db.insert_events([
+            self._make_event(i, pais=('España', 'México', 'Chile')[i % 3],
+                             organizador=('Red Bull', 'FMS World Series')[i % 2])
+            for i in range(300)
+        ])
+        
+        for filters in ({'pais': 'españa'}, {'organizador': 'fms'},
+                        {'pais': 'MÉXICO', 'organizador': 'red bull'}):
+            with self.subTest(**filters):
+                statements = []
+                with self.db._connection() as conn:
+                    conn.set_trace_callback(statements.append)
+                try:
+                    events = self.db.query_events(limit=10, **filters)
+                finally:
+                    with self.db._connection() as conn:
+                        conn.set_trace_callback(None)
+                
+                self.assertEqual(len(events), 10)
+                selects = [sql for sql in statements if sql.lstrip().upper().startswith('SELECT')]
+                self.assertTrue(selects)
+                with self.db._connection() as conn:
+                    for sql in selects:
+                        details = [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+                        self.assertFalse([d for d in details if d.startswith('SCAN')], sql)
+    
+    def test_connections_are_reused(self):
+        """Test that operations reuse pooled connections configured once"""
+        self.db.insert_events([self._make_event(i) for i in range(5)])
+        for _ in range(20):
+            self.db.get_all_events()
+            self.db.query_events(pais='España')
+        
+        self.assertEqual(self.db._open_connections, 1)
+        with self.db._connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+        
+        self.db.close()
+        self.assertEqual(self.db._open_connections, 0)
+        self.assertEqual(len(self.db.get_all_events()), 5)
+    
+    def test_generation_changes_only_on_writes(self):
+        """Test that the data generation moves only when events change"""
+        start = self.db.get_generation()
+        
+        self.db.insert_events([self._make_event(1), self._make_event(2)])
+        after_insert = self.db.get_generation()
+        self.assertGreater(after_insert, start)
+        
+        self.db.insert_events([self._make_event(1), self._make_event(2)])
+        self.assertEqual(self.db.get_generation(), after_insert)
+        
+        self.db.insert_events([self._make_event(1, hora='21:00')])
+        self.assertGreater(self.db.get_generation(), after_insert)
+    
+    def _python_stats(self, today):
+        """Stats computed the old way, from every event"""
+        events = self.db.get_all_events()
+        stats = {'total_eventos': len(events), 'por_organizador': {}, 'por_pais': {}, 'proximos_eventos': 0}
+        for event in events:
+            stats['por_organizador'][event['organizador']] = stats['por_organizador'].get(event['organizador'], 0) + 1
+            stats['por_pais'][event['pais']] = stats['por_pais'].get(event['pais'], 0) + 1
+            if event['fecha'] >= today:
+                stats['proximos_eventos'] += 1
+        return stats
+    
+    def test_precomputed_stats_follow_writes(self):
+        """Test that eventos_stats stays equal to a full recount after inserts, updates and deletes"""
+        today = '2025-09-20'
+        self.db.insert_events([
+            self._make_event(i, pais='España' if i % 2 else 'México', organizador=f'Org {i % 3}',
+                             fecha=f'2025-09-{10 + i:02d}')
+            for i in range(10)
+        ])
+        self.assertEqual(self.db.get_stats(today), self._python_stats(today))
+        
+        # Cambio de país en sitio y en modo replace (borra y vuelve a insertar)
+        self.db.insert_events([self._make_event(1, pais='Chile', organizador='Org 1', fecha='2025-09-11')])
+        self.db.insert_events([self._make_event(2, pais='Perú', organizador='Org 2', fecha='2025-09-12')],
+                              mode='replace')
+        with self.db._connection() as conn:
+            conn.execute("DELETE FROM eventos WHERE nombre = 'Bulk Battle 3'")
+        
+        stats = self.db.get_stats(today)
+        self.assertEqual(stats, self._python_stats(today))
+        self.assertEqual(stats['total_eventos'], 9)
+        self.assertEqual(stats['por_pais']['Chile'], 1)
+    
+    def test_precomputed_stats_backfill(self):
+        """Test that a database created before eventos_stats gets its counts on open"""
+        self.db.insert_events([self._make_event(i) for i in range(4)])
+        with self.db._connection() as conn:
+            conn.execute('DROP TABLE eventos_stats')
+        self.db.close()
+        
+        db = EventDatabase(self.temp_db.name)
+        try:
+            self.assertEqual(db.get_stats()['por_organizador'], {'Test Org': 4})
+        finally:
+            db.close()
+    
+    def test_get_event_by_id(self):
+        """Test primary-key lookup of a single event"""
+        self.db.insert_events([self._make_event(1), self._make_event(2)])
+        stored = {e['nombre']: e['id'] for e in self.db.get_all_events()}
+        
+        event = self.db.get_event(stored['Bulk Battle 2'])
+        self.assertEqual(event['nombre'], 'Bulk Battle 2')
+        self.assertIsNone(self.db.get_event(999999))
+    
+    def test_insert_events_empty(self):
+        """Test that inserting nothing is a no-op"""
+        counts = self.db.insert_events([])
+        
+        self.assertEqual(counts['inserted'], 0)
+        self.assertEqual(self.db.get_all_events(), [])
+
+class TestLRUCache(unittest.TestCase):
+    """Test cases for the LRU response cache"""
+    
+    def test_entry_limit_evicts_least_recently_used(self):
+        """Test that the oldest unused entry is evicted first"""
+        cache = LRUCache(max_entries=2)
+        cache.set('a', b'1')
+        cache.set('b', b'2')
+        cache.get('a')
+        cache.set('c', b'3')
+        
+        self.assertEqual(cache.get('a'), b'1')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), b'3')
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+    
+    def test_byte_limit(self):
+        """Test that the total size stays within max_bytes"""
+        cache = LRUCache(max_entries=100, max_bytes=10)
+        cache.set('a', 'x' * 6)
+        cache.set('b', 'y' * 6)
+        cache.set('huge', 'z' * 11)
+        
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), b'yyyyyy')
+        self.assertIsNone(cache.get('huge'))
+        self.assertEqual(cache.get_stats()['bytes'], 6)
+    
+    def test_tiered_cache_shared_backend(self):
+        """Test that the shared backend fills the local cache and failures are tolerated"""
+        class DictBackend(dict):
+            def set(self, key, value, ex=None):
+                self[key] = value
+        
+        shared = DictBackend()
+        TieredCache(shared=shared).set('k', b'v')
+        other_process = TieredCache(shared=shared)
+        self.assertEqual(other_process.get('k'), b'v')
+        self.assertEqual(other_process.local.get('k'), b'v')
+        
+        class BrokenBackend:
+            def get(self, key):
+                raise ConnectionError('down')
+            def set(self, key, value, ex=None):
+                raise ConnectionError('down')
+        
+        cache = TieredCache(shared=BrokenBackend())
+        cache.set('k', b'v')
+        self.assertEqual(cache.get('k'), b'v')
+        self.assertIsNone(cache.get('missing'))
 
 class TestScrapingUtils(unittest.TestCase):
     """Test cases for ScrapingUtils class"""
@@ -142,6 +459,24 @@ class TestScrapingUtils(unittest.TestCase):
                 result = ScrapingUtils.parse_date(input_date)
                 self.assertEqual(result, expected)
     
+    def test_parse_date_listing_formats(self):
+        """Test Spanish/English month names, abbreviations, weekdays and ISO datetimes"""
+        test_cases = [
+            ("15 de marzo de 2025", "2025-03-15"),
+            ("Sábado, 15 de marzo de 2025", "2025-03-15"),
+            ("sáb 15 mar. 2025", "2025-03-15"),
+            ("15 de Septiembre del 2025", "2025-09-15"),
+            ("March 15, 2025", "2025-03-15"),
+            ("2025-10-12T20:00:00+02:00", "2025-10-12"),
+            ("  12   octubre 2025 ", "2025-10-12"),
+            ("31/02/2025", "31/02/2025"),  # Invalid day returns the original
+            ("12 octubre", "12 octubre")   # No year, nothing to guess
+        ]
+        
+        for input_date, expected in test_cases:
+            with self.subTest(input_date=input_date):
+                self.assertEqual(ScrapingUtils.parse_date(input_date), expected)
+    
     def test_get_headers(self):
         """Test HTTP headers generation"""
         headers = ScrapingUtils.get_headers()
@@ -224,6 +559,36 @@ class TestCSVExporter(unittest.TestCase):
             except Exception:
                 pass
 
+    def test_stream_writer(self):
+        """Test that batches are written to a temp file that replaces the CSV on close"""
+        temp_dir = tempfile.mkdtemp()
+        csv_path = os.path.join(temp_dir, 'eventos.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write('old\n')
+        
+        try:
+            writer = CSVStreamWriter(csv_path)
+            writer.write([{'nombre': 'Battle 1', 'fecha': '2025-09-15', 'organizador': 'Org'}])
+            writer.write([{'nombre': 'Battle 2', 'fecha': '2025-09-16', 'organizador': 'Org',
+                           'extra': 'ignored'}])
+            
+            # Readers keep seeing the previous file until the writer is closed
+            with open(csv_path, encoding='utf-8') as f:
+                self.assertEqual(f.read(), 'old\n')
+            writer.close()
+            
+            df = pd.read_csv(csv_path)
+            self.assertEqual(tuple(df.columns), EVENT_FIELDS)
+            self.assertEqual(list(df['nombre']), ['Battle 1', 'Battle 2'])
+            self.assertEqual(writer.rows, 2)
+            
+            # Without events the previous CSV is kept
+            CSVStreamWriter(csv_path).close()
+            self.assertEqual(len(pd.read_csv(csv_path)), 2)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
 
 class TestValidateEvent(unittest.TestCase):
     """Test cases for event validation"""
@@ -6,6 +6,8 @@ import tempfile
 import os
 import sys
 import json
+import time
+from datetime import datetime
 from unittest.mock import patch
 
 # Add the project root to the path
@@ -228,6 +230,176 @@ class TestFlaskApp(unittest.TestCase):
             self.assertIsInstance(data, list)
 
 
+class TestEventsAPIRoutes(unittest.TestCase):
+    """Test the API routes against a real temporary EventDatabase"""
+    
+    def setUp(self):
+        """Point the app at a temporary database with sample events"""
+        import webapp.app as webapp_module
+        
+        self.webapp = webapp_module
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_api = webapp_module.events_api
+        # Without a TTL every request sees the writes made by the test right away
+        webapp_module.events_api = EventsAPI(os.path.join(self.temp_dir.name, 'eventos.db'),
+                                             generation_ttl=0)
+        webapp_module.events_api.db.insert_events([
+            {'nombre': 'Battle España', 'fecha': '2030-09-15', 'pais': 'España',
+             'organizador': 'Red Bull', 'descripcion': 'A' * 200},
+            {'nombre': 'Battle México', 'fecha': '2030-09-16', 'pais': 'México',
+             'organizador': 'FMS World Series', 'descripcion': 'B' * 200},
+            {'nombre': 'Battle Chile', 'fecha': '2030-09-17', 'pais': 'Chile',
+             'organizador': 'FMS World Series', 'descripcion': 'C' * 200},
+        ])
+        
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+    
+    def tearDown(self):
+        """Restore the original API instance"""
+        self.webapp.events_api.db.close()
+        self.webapp.events_api = self.original_api
+        self.temp_dir.cleanup()
+    
+    def test_filters(self):
+        """Test that /api/eventos applies the filters in SQL"""
+        data = self.client.get('/api/eventos?organizador=fms&fecha_desde=2030-09-17').get_json()
+        
+        self.assertTrue(data['success'])
+        self.assertEqual([e['nombre'] for e in data['eventos']], ['Battle Chile'])
+        
+        data = self.client.get('/api/eventos?pais=ESPAÑA').get_json()
+        self.assertEqual([e['nombre'] for e in data['eventos']], ['Battle España'])
+        
+        # The organizer select sends an exact name, not a substring
+        data = self.client.get('/api/eventos?organizador_exacto=fms world series').get_json()
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(self.client.get('/api/eventos?organizador_exacto=FMS').get_json()['total'], 0)
+    
+    def test_cursor_pagination(self):
+        """Test that limit/cursor walk every event exactly once"""
+        names = []
+        cursor = None
+        while True:
+            url = '/api/eventos?limit=2&fields=nombre,pais'
+            if cursor:
+                url += f'&cursor={cursor}'
+            data = self.client.get(url).get_json()
+            for event in data['eventos']:
+                self.assertEqual(set(event), {'nombre', 'pais'})
+            names.extend(e['nombre'] for e in data['eventos'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        
+        self.assertEqual(names, ['Battle España', 'Battle México', 'Battle Chile'])
+        
+        data = self.client.get('/api/eventos').get_json()
+        self.assertEqual(data['total'], 3)
+        self.assertIsNone(data['next_cursor'])
+    
+    def test_responses_cached_until_data_changes(self):
+        """Test that repeated requests skip the database until a write happens"""
+        api = self.webapp.events_api
+        with patch.object(api.db, 'query_events', wraps=api.db.query_events) as query:
+            first = self.client.get('/api/eventos?pais=Chile').get_json()
+            second = self.client.get('/api/eventos?pais=Chile').get_json()
+            self.assertEqual(first, second)
+            self.assertEqual(query.call_count, 1)
+            
+            api.db.insert_events([{'nombre': 'Battle Chile 2', 'fecha': '2030-10-01',
+                                   'pais': 'Chile', 'organizador': 'Red Bull'}])
+            third = self.client.get('/api/eventos?pais=Chile').get_json()
+            self.assertEqual(third['total'], 2)
+            self.assertEqual(query.call_count, 2)
+    
+    def test_cache_hits_skip_the_database(self):
+        """Test that within the generation TTL a cached response makes no query at all"""
+        temp_api = self.webapp.events_api
+        api = self.webapp.events_api = EventsAPI(temp_api.db_path, generation_ttl=0.2)
+        try:
+            with patch.object(api.db, 'get_generation', wraps=api.db.get_generation) as generation:
+                for _ in range(3):
+                    self.assertEqual(self.client.get('/api/eventos?pais=Chile').status_code, 200)
+                self.assertEqual(generation.call_count, 1)
+                
+                api.db.insert_events([{'nombre': 'Battle Chile 2', 'fecha': '2030-10-01',
+                                       'pais': 'Chile', 'organizador': 'Red Bull'}])
+                time.sleep(0.3)
+                self.assertEqual(self.client.get('/api/eventos?pais=Chile').get_json()['total'], 2)
+                self.assertEqual(generation.call_count, 2)
+        finally:
+            api.db.close()
+            self.webapp.events_api = temp_api
+    
+    def test_etag_not_modified(self):
+        """Test that a matching If-None-Match gets an empty 304 until the data changes"""
+        for url in ('/', '/api/eventos?pais=Chile', '/api/stats'):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                etag = first.headers['ETag']
+                self.assertEqual(first.status_code, 200)
+                self.assertIn('no-cache', first.headers['Cache-Control'])
+                
+                repeat = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(repeat.status_code, 304)
+                self.assertEqual(repeat.data, b'')
+                self.assertEqual(repeat.headers['ETag'], etag)
+        
+        etag = self.client.get('/api/eventos?pais=Chile').headers['ETag']
+        self.assertNotEqual(self.client.get('/api/eventos?pais=México').headers['ETag'], etag)
+        
+        self.webapp.events_api.db.insert_events([{'nombre': 'Battle Chile 2', 'fecha': '2030-10-01',
+                                                  'pais': 'Chile', 'organizador': 'Red Bull'}])
+        changed = self.client.get('/api/eventos?pais=Chile', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.get_json()['total'], 2)
+    
+    def test_event_detail(self):
+        """Test the detail page by primary key, its 404 and the hot-event cache"""
+        api = self.webapp.events_api
+        event = api.db.query_events(pais='Chile')[0]
+        
+        with patch.object(api.db, 'get_all_events') as get_all, \
+             patch.object(api.db, 'get_event', wraps=api.db.get_event) as get_event:
+            for _ in range(3):
+                response = self.client.get(f"/evento/{event['id']}")
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Battle Chile', response.get_data(as_text=True))
+            self.assertEqual(get_event.call_count, 1)
+            
+            self.assertEqual(self.client.get('/evento/999999').status_code, 404)
+            get_all.assert_not_called()
+            
+            # A write empties the cache and the detail page shows the new data
+            api.db.insert_events([dict(event, descripcion='Updated')])
+            self.assertIn('Updated', self.client.get(f"/evento/{event['id']}").get_data(as_text=True))
+            self.assertEqual(get_event.call_count, 3)
+    
+    def test_index_does_not_load_every_event(self):
+        """Test that the home page reads filters and upcoming events through indexed queries"""
+        api = self.webapp.events_api
+        with patch.object(api.db, 'get_all_events') as get_all, \
+             patch.object(api.db, 'query_events', wraps=api.db.query_events) as query, \
+             patch('webapp.app.render_template', return_value='') as render:
+            self.assertEqual(self.client.get('/').status_code, 200)
+        
+        get_all.assert_not_called()
+        query.assert_called_once_with(None, None, datetime.now().strftime('%Y-%m-%d'), None)
+        context = render.call_args.kwargs
+        self.assertEqual(context['paises'], ['Chile', 'España', 'México'])
+        self.assertEqual(context['organizadores'], ['FMS World Series', 'Red Bull'])
+        self.assertEqual(len(context['events']), 3)
+    
+    def test_invalid_pagination_params(self):
+        """Test that bad limit, cursor or fields return 400"""
+        for query in ('limit=0', 'limit=100000', 'cursor=not-a-cursor', 'fields=nombre,secreto'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/eventos?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.get_json()['success'])
+
+
 class TestDatabaseOperations(unittest.TestCase):
     """Test database operations"""
     
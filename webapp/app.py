@@ -6,14 +6,20 @@ Desarrollado por Sergie Code
 from flask import Flask, render_template, jsonify, request, send_from_directory
 import sqlite3
 import json
+import base64
+import hashlib
 from datetime import datetime
+from urllib.parse import urlencode
 import os
 import sys
+import threading
+import time
 
 # Agregar el directorio padre al path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from scraper.utils import EventDatabase
+from scraper.utils import EventDatabase, EVENT_COLUMNS
+from scraper.lru import LRUCache, TieredCache
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'freestyle-events-sergie-code-2025'
@@ -21,90 +27,186 @@ app.config['SECRET_KEY'] = 'freestyle-events-sergie-code-2025'
 # Configuración de la base de datos
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'eventos.db')
 
+# Tamaño máximo de página en /api/eventos
+MAX_PAGE_SIZE = 500
+
+# Límites de la caché de respuestas
+RESPONSE_CACHE_ENTRIES = 256
+RESPONSE_CACHE_BYTES = 32 * 1024 * 1024
+
+# Límites de la caché de eventos individuales (páginas de detalle)
+EVENT_CACHE_ENTRIES = 512
+EVENT_CACHE_BYTES = 4 * 1024 * 1024
+
+# Segundos que se reutiliza la generación leída de la base de datos
+GENERATION_TTL = 1.0
+
+# Los clientes pueden guardar las respuestas pero deben revalidarlas (ETag)
+CACHE_CONTROL = 'public, no-cache'
+
 class EventsAPI:
     """Clase para manejar la API de eventos"""
     
-    def __init__(self, db_path):
+    def __init__(self, db_path, cache=None, generation_ttl=GENERATION_TTL):
         self.db_path = db_path
         self.db = EventDatabase(db_path)
+        # Respuestas ya generadas; solo cambian cuando cambian los datos o el día
+        self.cache = cache if cache is not None else TieredCache(
+            LRUCache(RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_BYTES))
+        self.event_cache = LRUCache(EVENT_CACHE_ENTRIES, EVENT_CACHE_BYTES)
+        self.generation_ttl = generation_ttl
+        self._generation = None
+        self._generation_read_at = 0.0
+        self._generation_lock = threading.Lock()
     
     def get_all_events(self):
         """Obtiene todos los eventos"""
         return self.db.get_all_events()
     
     def filter_events(self, pais=None, organizador=None, fecha_desde=None, fecha_hasta=None):
-        """Filtra eventos según criterios"""
-        events = self.get_all_events()
+        """Filtra eventos según criterios (ordenados por fecha)"""
+        return self.db.query_events(pais, organizador, fecha_desde, fecha_hasta)
+    
+    def get_distinct_values(self, column):
+        """Valores distintos de pais u organizador para los filtros"""
+        return self.db.get_distinct_values(column)
+    
+    @staticmethod
+    def encode_cursor(event):
+        """Token opaco con la posición (fecha, id) de un evento"""
+        raw = json.dumps([event['fecha'], event['id']]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(token):
+        """Recupera la posición (fecha, id) de un token de cursor"""
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            fecha, event_id = json.loads(raw)
+            if not isinstance(fecha, str) or not isinstance(event_id, int):
+                raise ValueError
+            return fecha, event_id
+        except Exception:
+            raise ValueError("Cursor inválido")
+    
+    def list_events(self, pais=None, organizador=None, fecha_desde=None, fecha_hasta=None,
+                    limit=None, cursor=None, fields=None, organizador_exacto=None):
+        """Página de eventos filtrados; devuelve (eventos, cursor siguiente o None)"""
+        after = self.decode_cursor(cursor) if cursor else None
         
-        if pais:
-            events = [e for e in events if e.get('pais', '').lower() == pais.lower()]
+        # fecha e id hacen falta para construir el cursor aunque no se pidan
+        query_fields = None
+        if fields:
+            query_fields = list(dict.fromkeys(list(fields) + ['fecha', 'id']))
         
-        if organizador:
-            events = [e for e in events if organizador.lower() in e.get('organizador', '').lower()]
+        events = self.db.query_events(pais, organizador, fecha_desde, fecha_hasta,
+                                      limit=limit + 1 if limit else None,
+                                      after=after, fields=query_fields,
+                                      organizador_exacto=organizador_exacto)
         
-        if fecha_desde:
-            events = [e for e in events if e.get('fecha', '') >= fecha_desde]
+        next_cursor = None
+        if limit and len(events) > limit:
+            events = events[:limit]
+            next_cursor = self.encode_cursor(events[-1])
         
-        if fecha_hasta:
-            events = [e for e in events if e.get('fecha', '') <= fecha_hasta]
+        if fields:
+            events = [{field: event[field] for field in fields} for event in events]
         
-        return events
+        return events, next_cursor
     
-    def get_stats(self):
-        """Obtiene estadísticas de los eventos"""
-        events = self.get_all_events()
+    def get_event(self, event_id):
+        """Obtiene un evento por id; los más consultados quedan en memoria
         
-        stats = {
-            'total_eventos': len(events),
-            'por_organizador': {},
-            'por_pais': {},
-            'proximos_eventos': 0
-        }
+        La caché se vacía cuando cambia la generación de los datos, así que
+        la clave es solo el id y un acierto no consulta la base de datos.
+        """
+        self.get_generation()
+        key = str(event_id)
+        cached = self.event_cache.get(key)
+        if cached is not None:
+            return json.loads(cached)
         
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        for event in events:
-            # Contar por organizador
-            org = event.get('organizador', 'Unknown')
-            stats['por_organizador'][org] = stats['por_organizador'].get(org, 0) + 1
-            
-            # Contar por país
-            pais = event.get('pais', 'Unknown')
-            stats['por_pais'][pais] = stats['por_pais'].get(pais, 0) + 1
-            
-            # Contar próximos eventos
-            if event.get('fecha', '') >= today:
-                stats['proximos_eventos'] += 1
+        event = self.db.get_event(event_id)
+        if event is not None:
+            self.event_cache.set(key, json.dumps(event))
+        return event
+    
+    def get_generation(self):
+        """Generación actual de los datos
         
-        return stats
+        Se guarda en memoria y solo se vuelve a leer de la base de datos
+        pasados ``generation_ttl`` segundos: una respuesta cacheada no hace
+        ninguna consulta, y los datos de un scrapeo nuevo se ven como mucho
+        ``generation_ttl`` segundos después.
+        """
+        with self._generation_lock:
+            now = time.monotonic()
+            if self._generation is None or now - self._generation_read_at >= self.generation_ttl:
+                generation = self.db.get_generation()
+                if generation != self._generation:
+                    self.event_cache.clear()
+                self._generation = generation
+                self._generation_read_at = now
+            return self._generation
+    
+    def get_stats(self):
+        """Obtiene estadísticas de los eventos"""
+        return self.db.get_stats()
+
+def create_shared_cache_backend():
+    """Backend compartido opcional (Redis) si EVENTS_CACHE_REDIS_URL está definido"""
+    url = os.environ.get('EVENTS_CACHE_REDIS_URL')
+    if not url:
+        return None
+    
+    try:
+        import redis
+    except ImportError:
+        print("⚠️ EVENTS_CACHE_REDIS_URL definido pero redis no está instalado, usando solo la caché local")
+        return None
+    
+    return redis.Redis.from_url(url)
 
 # Instanciar API
-events_api = EventsAPI(DB_PATH)
+events_api = EventsAPI(DB_PATH, cache=TieredCache(
+    LRUCache(RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_BYTES),
+    shared=create_shared_cache_backend()))
+
+def response_cache_key(route):
+    """Clave de caché: ruta, parámetros, generación de los datos y fecha de hoy"""
+    args = urlencode(sorted(request.args.items(multi=True)))
+    today = datetime.now().strftime('%Y-%m-%d')
+    return f"{route}?{args}#{events_api.get_generation()}@{today}"
+
+def cached_response(route, build, mimetype):
+    """Respuesta con ETag: 304 si el cliente ya la tiene, si no la cacheada o ``build()``
+    
+    El ETag se deriva de la misma clave que la caché, así que cambia solo
+    cuando cambian los datos, los parámetros o el día.
+    """
+    key = response_cache_key(route)
+    etag = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        body = events_api.cache.get(key)
+        if body is None:
+            body = build()
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            events_api.cache.set(key, body)
+        response = app.response_class(body, mimetype=mimetype)
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
 
 @app.route('/')
 def index():
     """Página principal con calendario de eventos"""
     try:
-        # Obtener eventos
-        events = events_api.get_all_events()
-        
-        # Obtener listas únicas para filtros
-        paises = sorted(set(e.get('pais', '') for e in events if e.get('pais')))
-        organizadores = sorted(set(e.get('organizador', '') for e in events if e.get('organizador')))
-        
-        # Filtrar eventos próximos (desde hoy)
-        today = datetime.now().strftime('%Y-%m-%d')
-        proximos_eventos = [e for e in events if e.get('fecha', '') >= today]
-        proximos_eventos.sort(key=lambda x: x.get('fecha', ''))
-        
-        # Obtener estadísticas
-        stats = events_api.get_stats()
-        
-        return render_template('index.html', 
-                             events=proximos_eventos,
-                             paises=paises,
-                             organizadores=organizadores,
-                             stats=stats)
+        return cached_response('index', render_index, 'text/html')
     
     except Exception as e:
         print(f"Error en index: {e}")
@@ -115,6 +217,25 @@ def index():
                              stats={'total_eventos': 0, 'proximos_eventos': 0},
                              error="Error cargando eventos")
 
+def render_index():
+    """Renderiza la página principal"""
+    # Listas únicas para filtros (de eventos_stats, sin recorrer la tabla)
+    paises = events_api.get_distinct_values('pais')
+    organizadores = events_api.get_distinct_values('organizador')
+    
+    # Eventos próximos (desde hoy), ya ordenados por fecha
+    today = datetime.now().strftime('%Y-%m-%d')
+    proximos_eventos = events_api.filter_events(fecha_desde=today)
+    
+    # Obtener estadísticas
+    stats = events_api.get_stats()
+    
+    return render_template('index.html', 
+                         events=proximos_eventos,
+                         paises=paises,
+                         organizadores=organizadores,
+                         stats=stats)
+
 @app.route('/test')
 def test_page():
     """Test page for API debugging"""
@@ -127,20 +248,41 @@ def api_eventos():
         # Obtener parámetros de filtro
         pais = request.args.get('pais')
         organizador = request.args.get('organizador')
+        organizador_exacto = request.args.get('organizador_exacto')
         fecha_desde = request.args.get('fecha_desde')
         fecha_hasta = request.args.get('fecha_hasta')
         
-        # Filtrar eventos
-        events = events_api.filter_events(pais, organizador, fecha_desde, fecha_hasta)
+        # Paginación y proyección de campos
+        limit = request.args.get('limit', type=int)
+        if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit debe estar entre 1 y {MAX_PAGE_SIZE}")
+        cursor = request.args.get('cursor')
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+        unknown = [f for f in fields if f not in EVENT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
         
-        # Ordenar por fecha
-        events.sort(key=lambda x: x.get('fecha', ''))
+        def build():
+            # Filtrar eventos (ya vienen ordenados por fecha)
+            events, next_cursor = events_api.list_events(pais, organizador, fecha_desde, fecha_hasta,
+                                                         limit=limit, cursor=cursor, fields=fields,
+                                                         organizador_exacto=organizador_exacto)
+            return app.json.dumps({
+                'success': True,
+                # Eventos devueltos (con limit, los de esta página); si hay más, next_cursor no es null
+                'total': len(events),
+                'eventos': events,
+                'next_cursor': next_cursor
+            })
         
+        return cached_response('api_eventos', build, 'application/json')
+    
+    except ValueError as e:
         return jsonify({
-            'success': True,
-            'total': len(events),
-            'eventos': events
-        })
+            'success': False,
+            'error': str(e),
+            'eventos': []
+        }), 400
     
     except Exception as e:
         return jsonify({
@@ -153,11 +295,13 @@ def api_eventos():
 def api_stats():
     """API para obtener estadísticas"""
     try:
-        stats = events_api.get_stats()
-        return jsonify({
-            'success': True,
-            'stats': stats
-        })
+        def build():
+            return app.json.dumps({
+                'success': True,
+                'stats': events_api.get_stats()
+            })
+        
+        return cached_response('api_stats', build, 'application/json')
     
     except Exception as e:
         return jsonify({
@@ -169,8 +313,7 @@ def api_stats():
 def evento_detalle(event_id):
     """Página de detalle de un evento específico"""
     try:
-        events = events_api.get_all_events()
-        event = next((e for e in events if e.get('id') == event_id), None)
+        event = events_api.get_event(event_id)
         
         if not event:
             return "Evento no encontrado", 404